@@ -1,38 +1,94 @@
 import pandas as pd
 import os
 
+from anomaly_detection import VolumeAnomalyDetector
+from calendar_dim import trip_keys
+from data_validation import DataValidator
+from ride_dedup import RideDeduplicator
+from station_dim import STATION_FILE, load_station_dimension
+from station_snap import COORD_FILE, StationCoordinates, StationGrid, snap_off_station
+from trip_features import OUTPUT_DIR as FEATURES_DIR, PLAUSIBILITY, DistanceStats, add_trip_features, filter_implausible
 
-def process(df):
-    # убираем строки в которых нет критически важных данных
-    df.dropna(subset=["started_at", "ended_at"], inplace=True)
-
-    df["started_at"] = pd.to_datetime(df["started_at"])
-    df["ended_at"] = pd.to_datetime(df["ended_at"])
 
+def process(df):
+    # время уже разобрано в DataValidator, строки без времени, с окончанием
+    # раньше начала и с невозможной длительностью лежат в карантине
     df["ride_length_seconds"] = (df["ended_at"] - df["started_at"]).dt.total_seconds()
 
-    # если станция не указана
-    df['start_station_name'].fillna('Вне станции')
-    df['end_station_name'].fillna('Вне станции')
-
-    # убираем невозможные длительности поездки и ложные старты
-    df = df[(df["ride_length_seconds"] >= 180) & (df["ride_length_seconds"] <= 86400)]
+    # пустые названия станций не заполняем: такие поездки получают ключ -1,
+    # а в отчетах справочник показывает их как "Вне станции"
     return df
 
 
-years_dfs = []
+# Поездки на стыке месяцев и перекачанные файлы дают повторы ride_id:
+# каждый файл сверяется со всем, что уже загружено
+dedup = RideDeduplicator()
+dedup_report = []
+# Схема, пропуски, время, длительность и повторы проверяются за один проход;
+# плохие строки уходят в data_quality/quarantine_modern.csv
+validator = DataValidator("modern", dedup)
+# Справочник станций общий с 2013-2019 (column_store.py): в поездках только int32 ключи
+stations = load_station_dimension()
+# Координаты станций по поездкам (считаются заново при каждой загрузке) -
+# для привязки поездок вне станций (e-bike)
+coordinates = StationCoordinates()
+# Расстояния и скорости по типам велосипедов и пользователей
+distance_stats = DistanceStats()
+# Аномалии дневных объемов и станций по дням: пересчитываются только дни нового файла
+anomalies = VolumeAnomalyDetector()
+header = True
 
 for year in ["2023", "2024", "2025"]:
-    list_dfs = []
-    for csv_file in os.listdir(year):
-        list_dfs.append(process(pd.read_csv(year + "/" + csv_file)))
-
-    year_df = pd.concat(list_dfs, ignore_index=True)
-    year_df["year"] = year
-    years_dfs.append(year_df)
-
-final_df = pd.concat(years_dfs, ignore_index=True)
-final_df.to_csv("2023-2025.csv", index=False)
+    # Файлы по порядку месяцев, чтобы оставалась первая выгрузка поездки
+    for csv_file in sorted(os.listdir(year)):
+        raw_df = pd.read_csv(year + "/" + csv_file)
+        month_df = process(validator.validate(raw_df, csv_file))
+        quality = validator.file_summary(csv_file)
+        month_df["year"] = year
+        # Расстояние и скорость по координатам; сбои GPS и невозможные поездки убираем
+        month_df, implausible = filter_implausible(add_trip_features(month_df), PLAUSIBILITY)
+        for side in ("start", "end"):
+            month_df[side + "_station_key"] = stations.encode(
+                month_df[side + "_station_name"], month_df[side + "_station_id"], "modern")
+            coordinates.update(month_df[side + "_station_key"], month_df[side + "_lat"], month_df[side + "_lng"])
 
+        # Поездки вне станций с точными координатами привязываем к ближайшей станции в радиусе;
+        # округленные до 2 знаков (~1 км) остаются без станции
+        grid = StationGrid(coordinates.to_frame())
+        snapped_count = rounded_count = 0
+        for side in ("start", "end"):
+            month_df[side + "_station_key"], month_df[side + "_station_snapped"], rounded = snap_off_station(
+                month_df[side + "_station_key"], month_df[side + "_lat"], month_df[side + "_lng"], grid)
+            snapped_count += int(month_df[side + "_station_snapped"].sum())
+            rounded_count += int(rounded.sum())
+        month_df = month_df.drop(columns=["start_station_name", "start_station_id",
+                                          "end_station_name", "end_station_id"])
+        distance_stats.update(month_df)
+        anomalies.update(trip_keys(month_df["started_at"])[0], month_df["start_station_key"])
+        new_anomalies = anomalies.detect()
+        dedup_report.append((csv_file, len(raw_df), quality.get("quarantined", 0), quality.get("duplicate_id", 0),
+                             snapped_count, rounded_count, implausible, new_anomalies))
 
+        # Пишем файл за файлом - вся история в памяти не держится
+        month_df.to_csv("2023-2025.csv", index=False, mode="w" if header else "a", header=header)
+        header = False
 
+print("Карантин, повторы ride_id, неправдоподобные поездки и привязка к станциям по файлам:")
+for csv_file, rows, quarantined, duplicates, snapped_count, rounded_count, implausible, new_anomalies in dedup_report:
+    print(f"  {csv_file}: {rows:,} строк, в карантине: {quarantined:,} (из них повторов: {duplicates:,}), "
+          f"неправдоподобных: {sum(implausible.values()):,} {implausible}, "
+          f"привязано к станциям концов поездок: {snapped_count:,} (не привязано из-за округленных координат: "
+          f"{rounded_count:,}), новых аномалий: {new_anomalies:,}")
+stations.save()
+coordinates.save()
+distance_stats.save()
+anomaly_report = anomalies.save("anomalies_2023_2025", stations.station_names)
+quality_report = validator.save_report()
+print(f"Станций в справочнике {STATION_FILE}: {len(stations):,}")
+print(f"Координаты станций: {COORD_FILE}")
+print(f"Расстояния и скорости: {FEATURES_DIR}/distance_summary.csv")
+print(f"Аномалии объемов: {anomaly_report} ({len(anomalies.daily_flags):,} дней, "
+      f"{len(anomalies.station_flags):,} станция-дней)")
+print(f"Качество данных: {quality_report}, карантин: {validator.quarantine_path}")
+print(f"Всего в карантине: {sum(r[2] for r in dedup_report):,}, из них повторов: {sum(r[3] for r in dedup_report):,}, "
+      f"уникальных поездок: {len(dedup):,}")
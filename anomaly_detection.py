@@ -0,0 +1,206 @@
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+OUTPUT_DIR = 'seasonality_analysis'
+
+# Окно - предыдущие 28 дней (4 полные недели, чтобы дни недели входили поровну);
+# день аномален, если отклоняется от медианы окна больше чем на THRESHOLD
+# робастных сигм (1.4826 × MAD) и больше чем на MIN_DEVIATION поездок
+WINDOW = 28
+THRESHOLD = 4.0
+MAD_TO_SIGMA = 1.4826
+MIN_DEVIATION = {'daily': 20, 'station': 5}
+# День оценивается, только если дни с поездками - хотя бы половина окна: иначе
+# медиана окна 0 (новая или долго закрытая станция), и каждый день с поездками
+# был бы всплеском
+MIN_ACTIVE_DAYS = WINDOW // 2
+# Станции считаются блоками: медиана окон блока (станции × дни × WINDOW) копирует
+# их в память - при 16 станциях и 6 годах это ~8 МБ на копию
+STATION_BLOCK = 16
+
+
+def _empty_flags(with_station=False):
+    columns = {'date': 'datetime64[s]', 'trips': np.int64, 'expected': float, 'score': float, 'kind': object}
+    if with_station:
+        columns = {'station_key': np.int32, **columns}
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in columns.items()})
+
+
+def rolling_median_mad(counts, window=WINDOW):
+    """Медиана и MAD предыдущих window дней для каждого дня каждого ряда
+
+    counts - (ряды × дни); для первых window дней результата нет (NaN).
+    Окна берутся представлением sliding_window_view, но np.median копирует
+    их (ряды × дни × window), поэтому ряды подаются блоками. Отклонения
+    для MAD считаются на месте в одном массиве того же размера.
+    """
+    counts = np.asarray(counts, dtype=float)
+    median = np.full(counts.shape, np.nan)
+    mad = np.full(counts.shape, np.nan)
+    if counts.shape[1] <= window:
+        return median, mad
+    windows = sliding_window_view(counts[:, :-1], window, axis=1)
+    median[:, window:] = np.median(windows, axis=2)
+    deviation = windows - median[:, window:, None]
+    np.abs(deviation, out=deviation)
+    mad[:, window:] = np.median(deviation, axis=2, overwrite_input=True)
+    return median, mad
+
+
+def rolling_active_days(counts, window=WINDOW):
+    """Число дней с поездками среди предыдущих window дней (накопленной суммой)"""
+    active = np.zeros(np.shape(counts), dtype=np.int64)
+    if active.shape[1] <= window:
+        return active
+    total = np.pad(np.cumsum(np.asarray(counts) > 0, axis=1), ((0, 0), (1, 0)))
+    active[:, window:] = total[:, window:-1] - total[:, :-window - 1]
+    return active
+
+
+def score_counts(counts, window=WINDOW, min_deviation=0):
+    """Робастные z-оценки дней и маска аномалий
+
+    Масштаб не меньше корня из медианы (пуассоновский шум): у тихих
+    станций MAD часто равен нулю, и любая поездка была бы выбросом.
+    Дни, в окне которых меньше MIN_ACTIVE_DAYS дней с поездками, не
+    оцениваются: медиана там 0, и выбросом оказался бы каждый день.
+    """
+    median, mad = rolling_median_mad(counts, window)
+    scale = np.maximum(MAD_TO_SIGMA * mad, np.sqrt(np.maximum(median, 1)))
+    deviation = counts - median
+    score = deviation / scale
+    scored = rolling_active_days(counts, window) >= MIN_ACTIVE_DAYS
+    flagged = scored & (np.abs(score) > THRESHOLD) & (np.abs(deviation) >= min_deviation)
+    return median, score, flagged
+
+
+def _kind(trips, expected):
+    return np.where(trips == 0, 'gap', np.where(trips > expected, 'spike', 'drop'))
+
+
+class VolumeAnomalyDetector:
+    """Аномалии дневного числа поездок и поездок со станций по дням
+
+    Счетчики копятся по файлам (update), оценки пересчитываются только для
+    дней, затронутых новыми файлами, и window дней перед ними (detect), так
+    что при загрузке очередного месяца старая история заново не оценивается.
+    Дни без единой поездки остаются в рядах нулями - так видны пропуски в файлах.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.origin = None                       # первый день рядов (дней с 1970-01-01)
+        self.daily = np.zeros(0)                 # все поездки по дням
+        self.stations = np.zeros((0, 0))         # станции × дни
+        self.dirty_from = None                   # первый день с новыми данными
+        self.scored_until = None                 # дни до этого уже оценены
+        self.daily_flags = _empty_flags()
+        self.station_flags = _empty_flags(with_station=True)
+
+    def _extend(self, first, last, n_stations):
+        if self.origin is None:
+            self.origin = first
+        shift = max(self.origin - first, 0)
+        self.origin -= shift
+        n_days = max(last - self.origin + 1, len(self.daily) + shift)
+        self.daily = np.pad(self.daily, (shift, n_days - len(self.daily) - shift))
+        self.stations = np.pad(self.stations, ((0, max(n_stations - len(self.stations), 0)),
+                                               (shift, n_days - self.stations.shape[1] - shift)))
+
+    def update(self, date_keys, station_keys):
+        """Добавляем поездки: ключи дат (дни с 1970-01-01) и ключи станций (-1 - вне станции)"""
+        days = np.asarray(date_keys, dtype=np.int64)
+        if len(days) == 0:
+            return
+        keys = np.asarray(station_keys, dtype=np.int64)
+        at_station = keys >= 0
+        first, last = int(days.min()), int(days.max())
+        self._extend(first, last, int(keys[at_station].max()) + 1 if at_station.any() else 0)
+
+        offsets = days - self.origin
+        self.daily += np.bincount(offsets, minlength=len(self.daily))
+        np.add.at(self.stations, (keys[at_station], offsets[at_station]), 1)
+        self.dirty_from = first if self.dirty_from is None else min(self.dirty_from, first)
+
+    def detect(self):
+        """Пересчитываем оценки дней с новыми данными; возвращает число новых аномалий"""
+        if self.dirty_from is None:
+            return 0
+        # Дни между прошлым и новым файлом (пропуск в данных) тоже оцениваются
+        if self.scored_until is not None:
+            self.dirty_from = min(self.dirty_from, self.scored_until)
+        start = self.dirty_from - self.origin
+        # Окну нужны window дней истории перед первым пересчитываемым днем
+        lo = max(start - self.window, 0)
+
+        def frames(counts, min_deviation):
+            median, score, flagged = score_counts(counts[:, lo:], self.window, min_deviation)
+            flagged[:, :start - lo] = False
+            rows, cols = np.nonzero(flagged)
+            trips = counts[:, lo:][rows, cols]
+            return rows, pd.DataFrame({
+                'date': (cols + lo + self.origin).astype('datetime64[D]'),
+                'trips': trips.astype(np.int64),
+                'expected': median[rows, cols].round(1),
+                'score': score[rows, cols].round(2),
+                'kind': _kind(trips, median[rows, cols]),
+            })
+
+        _, daily = frames(self.daily[None, :], MIN_DEVIATION['daily'])
+        parts = []
+        for block in range(0, len(self.stations), STATION_BLOCK):
+            rows, part = frames(self.stations[block:block + STATION_BLOCK], MIN_DEVIATION['station'])
+            part.insert(0, 'station_key', (rows + block).astype(np.int32))
+            parts.append(part)
+
+        since = np.datetime64(self.dirty_from, 'D')
+        self.daily_flags = pd.concat([self.daily_flags[self.daily_flags['date'] < since], daily],
+                                     ignore_index=True)
+        self.station_flags = pd.concat([self.station_flags[self.station_flags['date'] < since]] + parts,
+                                       ignore_index=True).sort_values(['date', 'station_key'], kind='stable')
+        self.dirty_from = None
+        self.scored_until = self.origin + len(self.daily)
+        return len(daily) + sum(len(part) for part in parts)
+
+    def daily_series(self):
+        return pd.Series(self.daily, index=pd.to_datetime(np.arange(self.origin, self.origin + len(self.daily)),
+                                                          unit='D'), name='trips')
+
+    def save(self, name, station_names=None, folder=OUTPUT_DIR):
+        """CSV с аномалиями и текстовый отчет рядом с seasonality_report.txt"""
+        os.makedirs(folder, exist_ok=True)
+        stations = self.station_flags.copy()
+        if station_names is not None:
+            stations.insert(1, 'station_name', station_names(stations['station_key'].to_numpy()))
+        self.daily_flags.to_csv(f'{folder}/{name}_daily.csv', index=False, encoding='utf-8-sig')
+        stations.to_csv(f'{folder}/{name}_stations.csv', index=False, encoding='utf-8-sig')
+
+        series = self.daily_series()
+        with open(f'{folder}/{name}_report.txt', 'w', encoding='utf-8') as f:
+            f.write("=" * 70 + "\n")
+            f.write("АНОМАЛИИ ЧИСЛА ПОЕЗДОК\n")
+            f.write("=" * 70 + "\n\n")
+            f.write(f"Период: {series.index.min():%Y-%m-%d} - {series.index.max():%Y-%m-%d} ({len(series):,} дней)\n")
+            f.write(f"Окно: {self.window} дней, порог: {THRESHOLD} робастных сигм (медиана/MAD)\n")
+            f.write(f"Дней без поездок: {int((series == 0).sum()):,}\n\n")
+
+            f.write(f"ДНИ ({len(self.daily_flags)}):\n")
+            f.write("-" * 50 + "\n")
+            for row in self.daily_flags.itertuples(index=False):
+                f.write(f"{row.date:%Y-%m-%d} {row.kind:5}: {row.trips:7,} поездок "
+                        f"(ожидалось ~{row.expected:,.0f}, z = {row.score:+.1f})\n")
+
+            f.write(f"\nСТАНЦИИ ({len(stations)} станция-дней):\n")
+            f.write("-" * 50 + "\n")
+            by_kind = stations.groupby('kind').size()
+            for kind, n in by_kind.items():
+                f.write(f"  {kind:5}: {n:,}\n")
+            top = stations.reindex(stations['score'].abs().sort_values(ascending=False).index).head(20)
+            for row in top.itertuples(index=False):
+                label = getattr(row, 'station_name', row.station_key)
+                f.write(f"{row.date:%Y-%m-%d} {label}: {row.trips:,} поездок "
+                        f"(ожидалось ~{row.expected:,.0f}, z = {row.score:+.1f}, {row.kind})\n")
+        return f'{folder}/{name}_report.txt'
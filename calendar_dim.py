@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import MO, TH, AbstractHolidayCalendar, Holiday, USFederalHolidayCalendar, nearest_workday
+from pandas.tseries.offsets import DateOffset, Day
+
+# Общие справочники подписей для скриптов сезонности
+days_ru = {
+    0: 'Понедельник', 1: 'Вторник', 2: 'Среда',
+    3: 'Четверг', 4: 'Пятница', 5: 'Суббота', 6: 'Воскресенье'
+}
+
+months_ru = {
+    1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
+    5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
+    9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
+}
+
+seasons_by_month = {12: 'Зима', 1: 'Зима', 2: 'Зима', 3: 'Весна', 4: 'Весна', 5: 'Весна',
+                    6: 'Лето', 7: 'Лето', 8: 'Лето', 9: 'Осень', 10: 'Осень', 11: 'Осень'}
+
+time_order = ['Утро (5:00-11:59)', 'День (12:00-16:59)', 'Вечер (17:00-21:59)', 'Ночь (22:00-4:59)']
+
+
+def get_time_period(hour):
+    if 5 <= hour < 12:
+        return time_order[0]
+    elif 12 <= hour < 17:
+        return time_order[1]
+    elif 17 <= hour < 22:
+        return time_order[2]
+    else:
+        return time_order[3]
+
+
+# Время суток по номеру часа - выбирается индексом, без apply по строкам
+TIME_PERIOD_BY_HOUR = np.array([get_time_period(hour) for hour in range(24)], dtype=object)
+
+
+class ChicagoHolidayCalendar(AbstractHolidayCalendar):
+    """Федеральные праздники США и праздники Иллинойса/Чикаго"""
+    rules = USFederalHolidayCalendar.rules + [
+        Holiday("Lincoln's Birthday", month=2, day=12, observance=nearest_workday),
+        Holiday('Casimir Pulaski Day', month=3, day=1, offset=DateOffset(weekday=MO(1))),
+        Holiday('Day after Thanksgiving', month=11, day=1, offset=[DateOffset(weekday=TH(4)), Day(1)]),
+    ]
+
+
+def date_keys(times):
+    """Ключ даты: int32 - число дней от 1970-01-01"""
+    return pd.Series(times).to_numpy(dtype='datetime64[D]').astype(np.int32)
+
+
+def trip_keys(times):
+    """Поездка хранит только ключ даты (int32) и час (uint8)"""
+    values = pd.Series(times).to_numpy(dtype='datetime64[s]')
+    days = values.astype('datetime64[D]')
+    hours = (values - days).astype(np.int64) // 3600
+    return days.astype(np.int32), hours.astype(np.uint8)
+
+
+def build_calendar(start, end):
+    """Календарь: одна строка на дату, индекс - ключ даты
+
+    Все календарные признаки считаются один раз на дату (несколько тысяч
+    строк) вместо пересчета .dt-атрибутов на каждой поездке.
+    """
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    holidays = ChicagoHolidayCalendar().holidays(dates[0], dates[-1])
+
+    calendar = pd.DataFrame({
+        'date': dates,
+        'year': dates.year.astype(np.int16),
+        'month': dates.month.astype(np.uint8),
+        'weekday': dates.dayofweek.astype(np.uint8),
+        'iso_week': dates.isocalendar().week.to_numpy().astype(np.uint8),
+    }, index=pd.Index(date_keys(dates), name='date_key'))
+    calendar['month_ru'] = calendar['month'].map(months_ru)
+    calendar['season_ru'] = calendar['month'].map(seasons_by_month)
+    calendar['day_of_week_ru'] = calendar['weekday'].map(days_ru)
+    calendar['is_weekend'] = calendar['weekday'] >= 5
+    calendar['is_holiday'] = dates.isin(holidays)
+    return calendar
+
+
+def gather(calendar, keys, column):
+    """Признак календаря для каждой поездки: выборка по позиции, без join"""
+    positions = np.asarray(keys, dtype=np.int64) - calendar.index[0]
+    return calendar[column].to_numpy()[positions]
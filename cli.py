@@ -0,0 +1,185 @@
+"""Единая точка запуска анализов
+
+    python cli.py ingest                      # 2023-2025.csv + колоночное хранилище 2013-2019
+    python cli.py seasonality [--no-plots]    # таблицы сезонности (--no-plots: базовые
+                                              # таблицы в seasonality_analysis_parallel/)
+    python cli.py economics [--no-plots] [--assumed-lifespan]  # юнит-экономика велосипедов
+    python cli.py sensitivity                 # анализ чувствительности
+    python cli.py export                      # Excel-дашборд из сохраненных таблиц
+
+Тяжелые библиотеки импортируются внутри подкоманд: pandas - только когда
+нужны данные, matplotlib/seaborn - только при построении графиков.
+"""
+import argparse
+import os
+import runpy
+import sys
+import time
+
+
+def _run_script(path, args):
+    """Запускаем исходный скрипт анализа с графиками без окон (headless)"""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    if args.sample:
+        os.environ['BIKE_SAMPLE'] = str(args.sample)
+    if getattr(args, 'assumed_lifespan', False):
+        os.environ['BIKE_ASSUMED_LIFESPAN'] = '1'
+    runpy.run_path(path, run_name='__main__')
+
+
+def cmd_ingest(args):
+    _run_script('2023-2025.py', args)
+    if not args.skip_store:
+        from column_store import STORE_DIR, build_column_store
+
+        meta = build_column_store(args.data)
+        print(f"✓ Колоночное хранилище {STORE_DIR}/: {meta['rows']:,} строк")
+
+
+def cmd_seasonality(args):
+    if not args.no_plots:
+        _run_script('seasons_till_2019.py', args)
+        return
+
+    # Без графиков: базовые таблицы по проверенным строкам колоночного хранилища
+    # во всех процессах; выборку по хранилищу не строим
+    if args.sample:
+        sys.exit("--sample нельзя использовать с --no-plots: хранилище обрабатывается целиком")
+
+    from parallel_seasonality import OUTPUT_DIR, run_parallel, save_tables
+
+    (monthly, seasonal, weekday, hourly, _), n_parts = run_parallel(args.store, 'year', args.workers)
+    save_tables(monthly, seasonal, weekday, hourly, OUTPUT_DIR)
+
+    print(f"Всего поездок: {monthly['total_trips'].sum():,} (частей: {n_parts})")
+    for season, row in seasonal.iterrows():
+        print(f"  {season:6}: {row['total_trips']:8,.0f} поездок, "
+              f"длительность: {row['avg_duration'] / 60:5.1f} мин, медиана {row['p50_duration'] / 60:5.1f} мин")
+    print(f"✓ Таблицы сохранены в {OUTPUT_DIR}/")
+
+
+def _bike_economics(args):
+    """Экономика велосипедов без графиков (выручка считается векторно)"""
+    import pandas as pd
+
+    from data_validation import load_validated
+    from sampling import bike_sample
+    from survival_analysis import measured_lifespans
+    from unit_economics import (calculate_bike_economics, calculate_trip_revenue_vectorized,
+                                category_prices, classify_bikes)
+
+    fleet_size = None
+    if args.sample:
+        df, fleet_size = bike_sample(args.data, args.sample)
+    else:
+        df = load_validated(args.data)
+    df['starttime'] = pd.to_datetime(df['starttime'])
+    df['trip_revenue'] = calculate_trip_revenue_vectorized(df)
+    bike_categories = classify_bikes(df)
+    lifespans = None if args.assumed_lifespan else measured_lifespans(df, bike_categories)
+    return calculate_bike_economics(df, bike_categories, category_prices, lifespans), fleet_size
+
+
+def cmd_economics(args):
+    if not args.no_plots:
+        _run_script('economy_till_2019.py', args)
+        return
+
+    from sampling import srs_ratio, srs_total
+    from unit_economics import build_category_metrics
+
+    bike_econ_df, fleet_size = _bike_economics(args)
+    model = build_category_metrics(bike_econ_df)
+    for category, row in model.iterrows():
+        print(f"  {category:30}: {row[('total_trips', 'count')]:5.0f} велосипедов, "
+              f"средняя прибыль ${row[('profit', 'mean')]:9.2f}, ROI {row[('roi_percent', 'mean')]:7.1f}%")
+
+    profit = bike_econ_df['profit'].sum()
+    roi = profit / bike_econ_df['bike_price'].sum() * 100
+    print(f"Общая прибыль: ${profit:,.2f}, общий ROI: {roi:.1f}%")
+    if fleet_size:
+        total, low, high = srs_total(bike_econ_df['profit'], fleet_size)
+        ratio, ratio_low, ratio_high = srs_ratio(bike_econ_df['profit'], bike_econ_df['bike_price'], fleet_size)
+        print(f"Оценка для парка ({fleet_size:,} велосипедов): прибыль ${total:,.2f} "
+              f"(${low:,.2f} - ${high:,.2f}), ROI {ratio * 100:.1f}% ({ratio_low * 100:.1f}% - {ratio_high * 100:.1f}%)")
+
+
+def cmd_sensitivity(args):
+    from sampling import output_folder
+    from unit_economics import sensitivity_analysis
+
+    bike_econ_df, _ = _bike_economics(args)
+    sensitivity_df = sensitivity_analysis(bike_econ_df)
+
+    print(f"Анализ чувствительности выполнен для {len(sensitivity_df)} сценариев")
+    print(f"Средняя прибыль в сценариях: ${sensitivity_df['profit'].mean():.2f}")
+    print(f"Диапазон ROI: {sensitivity_df['roi'].min():.1f}% - {sensitivity_df['roi'].max():.1f}%")
+
+    folder = output_folder('unit_economics_enhanced', args.sample)
+    os.makedirs(folder, exist_ok=True)
+    sensitivity_df.to_csv(f'{folder}/sensitivity_analysis.csv', index=False)
+    print(f"✓ {folder}/sensitivity_analysis.csv")
+
+
+def cmd_export(args):
+    """Дашборд из уже сохраненных таблиц - без повторного анализа"""
+    import pandas as pd
+
+    from dashboard_export import export_dashboard, load_economics_sheets, print_timings
+
+    sources = [
+        ('По месяцам', 'monthly_analysis.csv', False),
+        ('По сезонам', 'seasonal_analysis.csv', False),
+        ('По дням недели', 'weekday_analysis.csv', False),
+        ('По времени суток', 'hourly_analysis.csv', False),
+        ('Праздники', 'holiday_analysis.csv', False),
+    ]
+    sheets = [(name, pd.read_csv(os.path.join('seasonality_analysis', file_name), encoding='utf-8-sig'), index)
+              for name, file_name, index in sources
+              if os.path.exists(os.path.join('seasonality_analysis', file_name))]
+    sheets += load_economics_sheets()
+    if not sheets:
+        sys.exit("Нет сохраненных таблиц: сначала запустите seasonality или economics")
+
+    print_timings(export_dashboard(args.output, sheets, workers=args.workers))
+    print(f"✓ Excel-дашборд сохранен: {args.output}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Анализ велопроката: загрузка, сезонность, экономика, экспорт')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--no-plots', action='store_true', help='только таблицы и текст, без matplotlib')
+    common.add_argument('--sample', type=float, help='доля выборки для быстрого прогона (например, 0.02)')
+    common.add_argument('--workers', type=int, help='число процессов/потоков')
+    common.add_argument('--data', default='2013-2019.csv')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', parents=[common], help='загрузка 2023-2025 и колоночное хранилище')
+    ingest.add_argument('--skip-store', action='store_true')
+    ingest.set_defaults(func=cmd_ingest)
+
+    seasonality = commands.add_parser('seasonality', parents=[common], help='анализ сезонности')
+    seasonality.add_argument('--store', default='column_store')
+    seasonality.set_defaults(func=cmd_seasonality)
+
+    # Экономика считается по измеренному сроку службы; флаг возвращает константы BIKE_LIFESPAN
+    lifespan = argparse.ArgumentParser(add_help=False)
+    lifespan.add_argument('--assumed-lifespan', action='store_true',
+                          help='принятые сроки службы вместо измеренных по данным')
+
+    commands.add_parser('economics', parents=[common, lifespan], help='юнит-экономика велосипедов').set_defaults(
+        func=cmd_economics)
+    commands.add_parser('sensitivity', parents=[common, lifespan], help='анализ чувствительности').set_defaults(
+        func=cmd_sensitivity)
+
+    export = commands.add_parser('export', parents=[common], help='Excel-дашборд из сохраненных таблиц')
+    export.add_argument('--output', default='seasonality_analysis/seasonality_dashboard.xlsx')
+    export.set_defaults(func=cmd_export)
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    started = time.perf_counter()
+    args.func(args)
+    print(f"\n⏱  {args.command}: {time.perf_counter() - started:.1f} сек")
@@ -0,0 +1,172 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import read_validated
+from station_dim import STATION_FILE, load_station_dimension
+
+STORE_DIR = 'column_store'
+CHUNK_ROWS = 2_000_000
+
+# Столбцы хранилища: тип на диске и способ преобразования
+#   time  - int64 секунды от эпохи (datetime64[s] без копирования через view)
+#   int   - целые коды, -1 для пропусков
+#   float - вещественные значения, NaN для пропусков
+#   code  - словарные коды строк (uint8), словарь хранится в meta.json
+#   station - ключи справочника станций (station_dim.py) из названия и id станции
+COLUMNS = {
+    'trip_id': ('int64', 'int'),
+    'starttime': ('int64', 'time'),
+    'stoptime': ('int64', 'time'),
+    'bikeid': ('int32', 'int'),
+    'tripduration': ('float64', 'float'),
+    'from_station_key': ('int32', 'station'),
+    'to_station_key': ('int32', 'station'),
+    'usertype': ('uint8', 'code'),
+    'gender': ('uint8', 'code'),
+    'birthyear': ('float32', 'float'),
+}
+
+# Код 0 зарезервирован под пропуск
+MISSING_CODE = 0
+
+
+def _count_rows(csv_path):
+    """Быстрый подсчет строк файла без разбора CSV"""
+    lines = 0
+    last = b'\n'
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    # Последняя строка без перевода строки тоже считается
+    if last != b'\n':
+        lines += 1
+    return lines - 1
+
+
+def _encode(values, kind, vocab=None):
+    """Переводим столбец порции в массив хранилища"""
+    if kind == 'time':
+        return pd.to_datetime(values).to_numpy(dtype='datetime64[s]').view(np.int64)
+    if kind == 'int':
+        return pd.to_numeric(values, errors='coerce').fillna(-1).to_numpy()
+    if kind == 'float':
+        return pd.to_numeric(values, errors='coerce').to_numpy()
+    # Словарное кодирование: новые значения дописываются в конец словаря
+    for value in values.dropna().unique():
+        if value not in vocab:
+            vocab[value] = len(vocab) + 1
+    return values.map(vocab).fillna(MISSING_CODE).to_numpy()
+
+
+def _source_columns(col, kind):
+    """Столбцы CSV, из которых строится столбец хранилища"""
+    if kind == 'station':
+        prefix = col[:-len('_key')]
+        return [f'{prefix}_name', f'{prefix}_id']
+    return [col]
+
+
+def build_column_store(csv_path='2013-2019.csv', folder=STORE_DIR, chunk_rows=CHUNK_ROWS,
+                       station_file=STATION_FILE):
+    """Раскладываем очищенный CSV по столбцам в .npy файлы
+
+    Файлы создаются нужного размера заранее и заполняются порциями,
+    так что весь датасет в память не загружается.
+    """
+    os.makedirs(folder, exist_ok=True)
+    n_rows = _count_rows(csv_path)
+
+    arrays = {
+        col: np.lib.format.open_memmap(os.path.join(folder, f'{col}.npy'), mode='w+',
+                                       dtype=dtype, shape=(n_rows,))
+        for col, (dtype, _) in COLUMNS.items()
+    }
+    vocabs = {col: {} for col, (_, kind) in COLUMNS.items() if kind == 'code'}
+    # Справочник станций пополняется и сохраняется вместе с хранилищем
+    stations = load_station_dimension(station_file)
+
+    offset = 0
+    # Строки из карантина DataValidator в хранилище не попадают, поэтому
+    # файлы могут оказаться длиннее данных - читаются первые meta['rows'] строк
+    for chunk in read_validated(csv_path, 'legacy', chunk_rows):
+        stop = offset + len(chunk)
+        for col, (dtype, kind) in COLUMNS.items():
+            if kind == 'station':
+                name_col, id_col = _source_columns(col, kind)
+                values = stations.encode(chunk[name_col], chunk[id_col], 'legacy')
+            else:
+                values = _encode(chunk[col], kind, vocabs.get(col))
+            arrays[col][offset:stop] = values.astype(dtype)
+        offset = stop
+    stations.save(station_file)
+
+    for array in arrays.values():
+        array.flush()
+
+    meta = {
+        'rows': offset,
+        'source': csv_path,
+        'columns': {col: {'dtype': dtype, 'kind': kind} for col, (dtype, kind) in COLUMNS.items()},
+        'vocabularies': {col: list(vocab) for col, vocab in vocabs.items()},
+        'stations': station_file,
+    }
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def open_column_store(folder=STORE_DIR):
+    """Открываем столбцы только на чтение через mmap
+
+    Открытие почти мгновенное, а несколько процессов, открывших одно
+    хранилище, используют одну физическую копию данных в кэше ОС.
+    """
+    with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    # Если в CSV были строки с переводом строки внутри кавычек, файлы чуть длиннее данных
+    columns = {col: np.load(os.path.join(folder, f'{col}.npy'), mmap_mode='r')[:meta['rows']]
+               for col in meta['columns']}
+    return columns, meta
+
+
+def column_as_series(columns, meta, col, rows=slice(None)):
+    """Столбец хранилища в привычном pandas-виде (время, категории, NaN)"""
+    kind = meta['columns'][col]['kind']
+    values = columns[col][rows]
+    if kind == 'time':
+        return pd.Series(values.view('datetime64[s]'), name=col)
+    if kind == 'code':
+        categories = meta['vocabularies'][col]
+        return pd.Series(pd.Categorical.from_codes(values.astype(np.int16) - 1, categories), name=col)
+    return pd.Series(values, name=col)
+
+
+def load_frame(columns, meta, names=None, rows=slice(None)):
+    """Собираем DataFrame из нужных столбцов (и диапазона строк)"""
+    names = names or list(meta['columns'])
+    return pd.concat([column_as_series(columns, meta, col, rows) for col in names], axis=1)
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("КОЛОНОЧНОЕ ХРАНИЛИЩЕ ПОЕЗДОК (.npy + mmap)")
+    print("=" * 70)
+
+    meta = build_column_store()
+    columns, meta = open_column_store()
+
+    print(f"\nЗаписано строк: {meta['rows']:,}")
+    total_bytes = 0
+    for col, array in columns.items():
+        total_bytes += array.nbytes
+        print(f"  {col:16}: {str(array.dtype):8} {array.nbytes / 1024 ** 2:10,.1f} МБ")
+    print(f"  {'Итого':16}: {'':8} {total_bytes / 1024 ** 2:10,.1f} МБ")
+    for col, vocab in meta['vocabularies'].items():
+        print(f"Словарь {col}: {vocab}")
+    print(f"Станций в справочнике {meta['stations']}: {len(load_station_dimension(meta['stations'])):,}")
+
+    print(f"\n✓ Хранилище сохранено: {STORE_DIR}/")
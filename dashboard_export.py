@@ -0,0 +1,114 @@
+"""Excel-дашборд анализа сезонности
+
+Зависимость: xlsxwriter (pip install xlsxwriter) - pandas ее не тянет, а
+файла зависимостей в проекте нет. Импортируется только при записи дашборда.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Размер пачки строк, которую готовим в отдельном потоке
+BATCH_ROWS = 50_000
+
+# Ограничение Excel на длину имени листа
+MAX_SHEET_NAME = 31
+
+
+def _prepare_batch(frame):
+    """Переводим пачку строк в обычные Python-значения, понятные xlsxwriter"""
+    columns = []
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d %H:%M:%S')
+        # NaN xlsxwriter записать не может - заменяем пустыми ячейками
+        values = values.astype(object).where(values.notna(), None)
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def _write_rows(worksheet, row_num, rows):
+    """Пишем готовую пачку с строки row_num; возвращает номер следующей строки"""
+    for row in rows:
+        worksheet.write_row(row_num, 0, row)
+        row_num += 1
+    return row_num
+
+
+def load_economics_sheets(folder='unit_economics_enhanced'):
+    """Собираем листы с экономикой велосипедов, если они уже рассчитаны"""
+    sources = [
+        ('Экономика велосипедов', 'bike_economics_detailed.csv'),
+        ('Категории', 'category_summary.csv'),
+        ('Чувствительность', 'sensitivity_analysis.csv'),
+    ]
+    sheets = []
+    for sheet_name, file_name in sources:
+        path = os.path.join(folder, file_name)
+        if os.path.exists(path):
+            sheets.append((sheet_name, pd.read_csv(path), False))
+    return sheets
+
+
+def export_dashboard(path, sheets, batch_rows=BATCH_ROWS, workers=None):
+    """Записываем дашборд в Excel в режиме постоянной памяти
+
+    sheets - список кортежей (имя листа, DataFrame, писать ли индекс).
+    Строки каждого листа готовятся пачками в пуле потоков, пока уже
+    готовые пачки пишутся на диск. Вперед готовится не больше пачек, чем
+    потоков, так что в памяти не копится весь лист в виде Python-строк.
+    Возвращает таблицу времени по листам.
+    """
+    try:
+        import xlsxwriter
+    except ImportError as e:
+        raise ImportError("Для Excel-дашборда нужен xlsxwriter: pip install xlsxwriter") from e
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    timings = []
+    sheet_name = None
+    ahead = workers or os.cpu_count() or 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for sheet_name, frame, index in sheets:
+                start = time.perf_counter()
+                if index:
+                    frame = frame.reset_index()
+
+                worksheet = workbook.add_worksheet(sheet_name[:MAX_SHEET_NAME])
+                worksheet.write_row(0, 0, [str(col) for col in frame.columns], header_format)
+
+                # Готовим пачки параллельно окном из ahead штук, пишем строго по порядку строк
+                pending = deque()
+                row_num = 1
+                for i in range(0, len(frame), batch_rows):
+                    pending.append(executor.submit(_prepare_batch, frame.iloc[i:i + batch_rows]))
+                    if len(pending) >= ahead:
+                        row_num = _write_rows(worksheet, row_num, pending.popleft().result())
+                while pending:
+                    row_num = _write_rows(worksheet, row_num, pending.popleft().result())
+
+                timings.append({
+                    'sheet': sheet_name,
+                    'rows': len(frame),
+                    'columns': len(frame.columns),
+                    'seconds': round(time.perf_counter() - start, 3),
+                })
+    except Exception as e:
+        raise RuntimeError(f"Ошибка при записи листа '{sheet_name}': {e}") from e
+    finally:
+        workbook.close()
+
+    return pd.DataFrame(timings)
+
+
+def print_timings(timings):
+    """Печатаем время записи каждого листа"""
+    for _, row in timings.iterrows():
+        print(f"  {row['sheet']:25}: {row['rows']:8,} строк, {row['seconds']:6.2f} сек")
+    print(f"  {'Итого':25}: {timings['rows'].sum():8,} строк, {timings['seconds'].sum():6.2f} сек")
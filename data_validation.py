@@ -0,0 +1,225 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from ride_dedup import RideDeduplicator
+
+OUTPUT_DIR = 'data_quality'
+CHUNK_ROWS = 500_000
+
+# Правила наборов данных. Строка уходит в карантин, если:
+#   - пусто в обязательном столбце (required),
+#   - время не разбирается или окончание раньше начала,
+#   - длительность вне окна duration_range,
+#   - id уже встречался (в файле или, при общем дедупликаторе, в прошлых файлах).
+# Диапазоны (ranges) и допустимые значения (categories) только считаются
+# в отчете: такие строки анализы обрабатывают сами ("Неизвестно" и т.п.).
+SCHEMAS = {
+    'modern': {
+        'columns': ['ride_id', 'rideable_type', 'started_at', 'ended_at', 'start_station_name',
+                    'start_station_id', 'end_station_name', 'end_station_id', 'start_lat', 'start_lng',
+                    'end_lat', 'end_lng', 'member_casual'],
+        'id': 'ride_id',
+        'start': 'started_at',
+        'end': 'ended_at',
+        'required': ['ride_id', 'rideable_type', 'started_at', 'ended_at', 'member_casual'],
+        'duration_column': None,  # длительность считается по времени начала и окончания
+        # Короче 3 минут - ложные старты, длиннее суток - потерянные велосипеды
+        'duration_range': (180, 86400),
+        'ranges': {'start_lat': (-90, 90), 'end_lat': (-90, 90), 'start_lng': (-180, 180), 'end_lng': (-180, 180)},
+        'categories': {
+            'rideable_type': ['classic_bike', 'electric_bike', 'docked_bike'],
+            'member_casual': ['member', 'casual'],
+        },
+    },
+    'legacy': {
+        'columns': ['trip_id', 'starttime', 'stoptime', 'bikeid', 'tripduration', 'from_station_id',
+                    'from_station_name', 'to_station_id', 'to_station_name', 'usertype', 'gender', 'birthyear'],
+        'id': 'trip_id',
+        'start': 'starttime',
+        'end': 'stoptime',
+        'required': ['trip_id', 'starttime', 'stoptime', 'bikeid', 'tripduration'],
+        'duration_column': 'tripduration',
+        'duration_range': (60, 86400),
+        'ranges': {'birthyear': (1900, 2019)},
+        'categories': {
+            'usertype': ['Subscriber', 'Customer', 'Dependent'],
+            'gender': ['Male', 'Female'],
+        },
+    },
+}
+
+
+class DataValidator:
+    """Проверка порций одного набора данных за один проход по порции
+
+    Плохие строки дописываются в файл карантина (с файлом-источником и
+    причиной), хорошие возвращаются. Счетчики копятся по файлам и столбцам
+    и выдаются компактным отчетом в конце.
+    """
+
+    def __init__(self, schema_name, dedup=None, folder=OUTPUT_DIR):
+        self.schema_name = schema_name
+        self.schema = SCHEMAS[schema_name]
+        # Общий дедупликатор ловит повторы и между файлами
+        self.dedup = dedup
+        self.file_dedups = {}
+        self.folder = folder
+        self.quarantine_path = os.path.join(folder, f'quarantine_{schema_name}.csv')
+        self.quarantine_started = False
+        # Карантин прошлого запуска не смешиваем с новым
+        if os.path.exists(self.quarantine_path):
+            os.remove(self.quarantine_path)
+        self.counts = {}
+
+    def _count(self, source, column, check, n):
+        if n:
+            key = (source, column, check)
+            self.counts[key] = self.counts.get(key, 0) + int(n)
+
+    def validate(self, df, source):
+        """Проверяем порцию; возвращает хорошие строки с разобранным временем"""
+        schema = self.schema
+        self._count(source, '*', 'rows', len(df))
+        for col in schema['columns']:
+            if col not in df.columns:
+                # Столбца нет в файле - считаем его пустым, обязательный отправит строки в карантин
+                self._count(source, col, 'missing_column', len(df))
+                df[col] = np.nan
+            self._count(source, col, 'null', df[col].isna().sum())
+
+        for col, (low, high) in schema['ranges'].items():
+            values = pd.to_numeric(df[col], errors='coerce')
+            self._count(source, col, 'out_of_range', ((values < low) | (values > high)).sum())
+        for col, allowed in schema['categories'].items():
+            self._count(source, col, 'unexpected_value', (df[col].notna() & ~df[col].isin(allowed)).sum())
+
+        start = pd.to_datetime(df[schema['start']], errors='coerce')
+        end = pd.to_datetime(df[schema['end']], errors='coerce')
+        if schema['duration_column']:
+            duration = pd.to_numeric(df[schema['duration_column']], errors='coerce')
+        else:
+            duration = (end - start).dt.total_seconds()
+        low, high = schema['duration_range']
+
+        # Причины по порядку: у строки в карантине записывается первая
+        reasons = [('null_' + col, df[col].isna().to_numpy()) for col in schema['required']]
+        reasons += [
+            ('bad_timestamp', (start.isna() & df[schema['start']].notna()).to_numpy()
+             | (end.isna() & df[schema['end']].notna()).to_numpy()),
+            ('end_before_start', (end < start).to_numpy()),
+            ('duration_out_of_range', ((duration < low) | (duration > high)).to_numpy()),
+        ]
+        bad = np.logical_or.reduce([mask for _, mask in reasons])
+
+        # Повторы id - только среди остальных хороших строк, чтобы в
+        # справочнике встреченных id не оказались строки из карантина
+        duplicate = np.zeros(len(df), dtype=bool)
+        dedup = self.dedup if self.dedup is not None else self.file_dedups.setdefault(source, RideDeduplicator())
+        good_rows = df[~bad]
+        kept, _ = dedup.filter(good_rows, schema['id'])
+        duplicate[~bad] = ~good_rows.index.isin(kept.index)
+        reasons.append(('duplicate_id', duplicate))
+        bad |= duplicate
+
+        if bad.any():
+            reason = np.select([mask for _, mask in reasons], [name for name, _ in reasons], default='')
+            for name, mask in reasons:
+                self._count(source, '*', name, (reason == name).sum())
+            self._quarantine(df[bad], source, reason[bad])
+        self._count(source, '*', 'quarantined', bad.sum())
+        self._count(source, '*', 'kept', (~bad).sum())
+
+        df = df[~bad].copy()
+        df[schema['start']] = start[~bad]
+        df[schema['end']] = end[~bad]
+        return df
+
+    def _quarantine(self, rows, source, reason):
+        rows = rows.copy()
+        rows.insert(0, 'quarantine_reason', reason)
+        rows.insert(0, 'source_file', source)
+        os.makedirs(self.folder, exist_ok=True)
+        rows.to_csv(self.quarantine_path, index=False, mode='a' if self.quarantine_started else 'w',
+                    header=not self.quarantine_started)
+        self.quarantine_started = True
+
+    def file_summary(self, source):
+        """Счетчики одного файла: строки, оставлено, в карантине по причинам"""
+        return {check: n for (file, col, check), n in self.counts.items() if file == source and col == '*'}
+
+    def report(self):
+        """Отчет: файл × столбец × проверка -> число строк (нулевые не пишутся)"""
+        report = pd.DataFrame([(self.schema_name, file, col, check, n)
+                               for (file, col, check), n in self.counts.items()],
+                              columns=['dataset', 'file', 'column', 'check', 'rows'])
+        return report.sort_values(['file', 'column', 'check'], kind='stable').reset_index(drop=True)
+
+    def save_report(self):
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f'quality_report_{self.schema_name}.csv')
+        self.report().to_csv(path, index=False, encoding='utf-8-sig')
+        return path
+
+
+def read_validated(csv_path, schema_name='legacy', chunk_rows=CHUNK_ROWS, folder=OUTPUT_DIR):
+    """Порции файла после проверки: плохие строки уходят в карантин, отчет пишется в конце"""
+    validator = DataValidator(schema_name, folder=folder)
+    source = os.path.basename(csv_path)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        yield validator.validate(chunk, source)
+    validator.save_report()
+    quarantined = validator.file_summary(source).get('quarantined', 0)
+    if quarantined:
+        print(f"  ⚠️  В карантине {quarantined:,} строк {source}: {validator.quarantine_path}")
+
+
+def load_validated(csv_path, schema_name='legacy', chunk_rows=CHUNK_ROWS):
+    """Весь файл через DataValidator - вместо pd.read_csv в анализах"""
+    return pd.concat(read_validated(csv_path, schema_name, chunk_rows), ignore_index=True)
+
+
+def print_report(validator):
+    report = validator.report()
+    for source, part in report.groupby('file', sort=False):
+        summary = validator.file_summary(source)
+        reasons = {check: n for check, n in summary.items() if check not in ('rows', 'kept', 'quarantined')}
+        print(f"  {source}: {summary.get('rows', 0):,} строк, в карантине: {summary.get('quarantined', 0):,} "
+              f"{reasons}")
+        columns = part[part['column'] != '*']
+        for col, checks in columns.groupby('column', sort=False):
+            issues = ', '.join(f"{check}: {n:,}" for check, n in zip(checks['check'], checks['rows']))
+            print(f"      {col:20} {issues}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Проверка качества исходных данных без загрузки')
+    parser.add_argument('--modern', nargs='*', default=['2023', '2024', '2025'], help='папки помесячных файлов')
+    parser.add_argument('--legacy', default='2013-2019.csv')
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ПРОВЕРКА КАЧЕСТВА ДАННЫХ")
+    print("=" * 70)
+
+    datasets = [('modern', [os.path.join(folder, name) for folder in args.modern if os.path.isdir(folder)
+                            for name in sorted(os.listdir(folder))])]
+    if os.path.exists(args.legacy):
+        datasets.append(('legacy', [args.legacy]))
+
+    for schema_name, paths in datasets:
+        if not paths:
+            continue
+        # Помесячные файлы проверяются на повторы ride_id и между собой
+        validator = DataValidator(schema_name, RideDeduplicator(), args.output)
+        for path in paths:
+            for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS):
+                validator.validate(chunk, os.path.basename(path))
+        print(f"\n{schema_name}:")
+        print_report(validator)
+        print(f"✓ Отчет: {validator.save_report()}")
+        if validator.quarantine_started:
+            print(f"✓ Карантин: {validator.quarantine_path}")
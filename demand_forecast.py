@@ -0,0 +1,285 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calendar_dim import days_ru, trip_keys
+from station_dim import load_station_dimension
+
+OUTPUT_DIR = 'demand_forecast'
+CACHE_FILE = 'forecast_cache.npz'
+CHUNK_ROWS = 500_000
+FORECAST_DAYS = 7
+HOURS_PER_WEEK = 7 * 24
+
+# Статистики модели - суммы, которые складываются по месяцам; параметры
+# модели из них пересчитываются без повторного чтения поездок
+STAT_KEYS = ['months', 'month_days', 'weekday_days', 'last_day', 'slot_rides', 'month_rides',
+             'consumed_bytes', 'consumed_tail']
+# Сколько байт перед границей прочитанного сверяется, чтобы убедиться, что
+# начало файла с прошлого запуска не изменилось
+TAIL_BYTES = 4096
+PARAM_KEYS = ['profile', 'month_factor', 'level_a', 'level_b']
+
+
+def empty_statistics():
+    return {
+        'months': np.zeros(0, dtype=np.int64),          # месяцы (с 1970-01) в статистиках
+        'month_days': np.zeros(0),                       # дней с поездками в каждом месяце
+        'weekday_days': np.zeros(7),                     # дней каждого дня недели
+        'last_day': np.array(-1, dtype=np.int64),        # последний день данных (с 1970-01-01)
+        'slot_rides': np.zeros((0, HOURS_PER_WEEK)),     # поездки станции по (день недели × час)
+        'month_rides': np.zeros((0, 0)),                 # поездки станции по месяцам
+        'consumed_bytes': np.array(0, dtype=np.int64),   # прочитанное начало 2023-2025.csv
+        'consumed_tail': np.zeros(0, dtype=np.uint8),    # последние байты прочитанного начала
+    }
+
+
+def load_cache(path):
+    """Статистики и параметры прошлого запуска (или пустые статистики)"""
+    if not os.path.exists(path):
+        return empty_statistics(), None
+    stats = empty_statistics()
+    with np.load(path) as cache:
+        # В кэше старой версии границы прочитанного нет - файл читается целиком
+        stats.update({key: cache[key] for key in STAT_KEYS if key in cache})
+        params = {key: cache[key] for key in PARAM_KEYS} if 'profile' in cache else None
+    return stats, params
+
+
+def save_cache(path, stats, params):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(path, **stats, **params)
+
+
+def _pad_stations(array, n_stations):
+    return np.pad(array, ((0, n_stations - len(array)), (0, 0)))
+
+
+def _resume_offset(stats, csv_path):
+    """Граница прочитанного в прошлый раз, если начало файла с тех пор не изменилось
+
+    2023-2025.py переписывает файл целиком, но месяцы идут по порядку, так
+    что новые месяцы дописываются в конец. Если байты перед границей другие
+    (файл пересобран иначе или стал короче), читаем с начала.
+    """
+    offset = int(stats['consumed_bytes'])
+    tail = stats['consumed_tail'].tobytes()
+    if offset == 0 or os.path.getsize(csv_path) < offset:
+        return 0
+    with open(csv_path, 'rb') as f:
+        f.seek(offset - len(tail))
+        return offset if f.read(len(tail)) == tail else 0
+
+
+def _unread_chunks(stats, csv_path, usecols, chunk_rows=CHUNK_ROWS):
+    """Порции файла после границы прочитанного; в конце граница сдвигается на конец файла"""
+    offset = _resume_offset(stats, csv_path)
+    with open(csv_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not offset:
+            yield from pd.read_csv(f, usecols=usecols, chunksize=chunk_rows)
+        elif offset < size:
+            # Заголовок остался в начале файла - имена столбцов берем из него
+            names = pd.read_csv(csv_path, nrows=0).columns
+            f.seek(offset)
+            yield from pd.read_csv(f, header=None, names=names, usecols=usecols, chunksize=chunk_rows)
+        f.seek(max(size - TAIL_BYTES, 0))
+        tail = f.read(size - f.tell())
+
+    # Граница запоминается только после целой последней строки
+    complete = tail.endswith(b'\n')
+    stats['consumed_bytes'] = np.array(size if complete else 0, dtype=np.int64)
+    stats['consumed_tail'] = np.frombuffer(tail if complete else b'', dtype=np.uint8)
+
+
+def update_statistics(stats, csv_path, chunk_rows=CHUNK_ROWS):
+    """Добавляем к статистикам месяцы, которых в них еще нет
+
+    Месяц попадает в 2023-2025.csv целым файлом и дописывается в конец,
+    поэтому прочитанное в прошлый раз начало файла пропускается по байтовой
+    границе из кэша, а читаются только два столбца. Учтенные месяцы еще и
+    отсеиваются - на случай, если файл пересобран и читается с начала.
+    Возвращает новые месяцы.
+    """
+    known = stats['months']
+    slot_parts, month_parts, day_parts = [], [], []
+
+    for chunk in _unread_chunks(stats, csv_path, ['started_at', 'start_station_key'], chunk_rows):
+        days, hours = trip_keys(pd.to_datetime(chunk['started_at']))
+        month = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        new = ~np.isin(month, known)
+        if not new.any():
+            continue
+        days, hours, month = days[new], hours[new], month[new]
+        key = chunk['start_station_key'].to_numpy()[new]
+
+        # Календарь - по всем поездкам, дни без поездок станции тоже считаются
+        day_parts.append(np.unique(days))
+        at_station = key >= 0
+        slot = (days.astype(np.int64) + 3) % 7 * 24 + hours  # 1970-01-01 - четверг
+        ones = pd.Series(1, index=np.flatnonzero(at_station))
+        slot_parts.append(ones.groupby([key[at_station], slot[at_station]]).size())
+        month_parts.append(ones.groupby([key[at_station], month[at_station]]).size())
+
+    if not day_parts:
+        return np.zeros(0, dtype=np.int64)
+
+    new_days = np.unique(np.concatenate(day_parts)).astype(np.int64)
+    new_day_months = new_days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    new_months, month_days = np.unique(new_day_months, return_counts=True)
+
+    slot_rides = pd.concat(slot_parts).groupby(level=[0, 1]).sum()
+    month_rides = pd.concat(month_parts).groupby(level=[0, 1]).sum()
+    keys = np.concatenate([slot_rides.index.get_level_values(0), month_rides.index.get_level_values(0)])
+    n_stations = max(len(stats['slot_rides']), int(keys.max()) + 1 if len(keys) else 0)
+
+    stats['slot_rides'] = _pad_stations(stats['slot_rides'], n_stations)
+    np.add.at(stats['slot_rides'], (slot_rides.index.get_level_values(0), slot_rides.index.get_level_values(1)),
+              slot_rides.to_numpy())
+
+    new_columns = np.zeros((n_stations, len(new_months)))
+    np.add.at(new_columns, (month_rides.index.get_level_values(0),
+                            np.searchsorted(new_months, month_rides.index.get_level_values(1))),
+              month_rides.to_numpy())
+    stats['month_rides'] = np.hstack([_pad_stations(stats['month_rides'], n_stations), new_columns])
+    stats['months'] = np.concatenate([known, new_months])
+    stats['month_days'] = np.concatenate([stats['month_days'], month_days.astype(float)])
+    stats['weekday_days'] = stats['weekday_days'] + np.bincount((new_days + 3) % 7, minlength=7)
+    stats['last_day'] = np.array(max(int(stats['last_day']), int(new_days.max())), dtype=np.int64)
+    return new_months
+
+
+def fit_stations(task):
+    """Параметры модели для группы станций
+
+    Прогноз = уровень(тренд) × сезонный множитель месяца × профиль (день недели × час):
+      profile      - средние поездки в слот недели, деленные на средние поездки в день
+      month_factor - средние поездки в день месяца года относительно общего среднего
+      level_a/b    - линейный тренд очищенного от сезонности дневного уровня по годам
+    """
+    slot_rides, month_rides, months, month_days, weekday_days = task
+    mean_daily = month_rides.sum(axis=1) / month_days.sum()
+    safe_mean = np.where(mean_daily > 0, mean_daily, 1.0)
+
+    slot_days = np.repeat(weekday_days, 24)
+    profile = np.divide(slot_rides, slot_days, out=np.zeros_like(slot_rides), where=slot_days > 0)
+    profile /= safe_mean[:, None]
+
+    month_of_year = months % 12
+    moy_rides = np.stack([month_rides[:, month_of_year == m].sum(axis=1) for m in range(12)], axis=1)
+    moy_days = np.bincount(month_of_year, weights=month_days, minlength=12)
+    month_factor = np.ones_like(moy_rides)
+    observed = (moy_days > 0) & (mean_daily[:, None] > 0)
+    month_factor[observed] = (moy_rides / np.where(moy_days > 0, moy_days, 1) / safe_mean[:, None])[observed]
+
+    # Уровень года = поездки года / дни года, взвешенные сезонными множителями
+    years = months // 12
+    level_a = mean_daily.copy()
+    level_b = np.zeros(len(mean_daily))
+    unique_years = np.unique(years)
+    if len(unique_years) > 1:
+        x = np.array([np.average(months[years == y] + 0.5, weights=month_days[years == y])
+                      for y in unique_years]) / 12
+        w = np.array([month_days[years == y].sum() for y in unique_years])
+        expected = np.stack([(month_factor[:, month_of_year[years == y]] * month_days[years == y]).sum(axis=1)
+                             for y in unique_years], axis=1)
+        rides = np.stack([month_rides[:, years == y].sum(axis=1) for y in unique_years], axis=1)
+        level = rides / np.where(expected > 0, expected, 1)
+
+        # Взвешенная МНК-прямая по годам, сразу для всех станций группы
+        x_mean = np.average(x, weights=w)
+        y_mean = (level * w).sum(axis=1) / w.sum()
+        level_b = ((level - y_mean[:, None]) * w * (x - x_mean)).sum(axis=1) / (w * (x - x_mean) ** 2).sum()
+        level_a = y_mean - level_b * x_mean
+    return {'profile': profile, 'month_factor': month_factor, 'level_a': level_a, 'level_b': level_b}
+
+
+def fit(stats, workers=None):
+    """Подбираем параметры всех станций в пуле процессов, группами станций"""
+    n_stations = len(stats['slot_rides'])
+    n_parts = min(n_stations, workers or os.cpu_count() or 1) or 1
+    groups = np.array_split(np.arange(n_stations), n_parts)
+    tasks = [(stats['slot_rides'][g], stats['month_rides'][g], stats['months'], stats['month_days'],
+              stats['weekday_days']) for g in groups]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(fit_stations, tasks))
+    return {key: np.concatenate([part[key] for part in parts]) for key in PARAM_KEYS}
+
+
+def forecast(params, start_day, days=FORECAST_DAYS):
+    """Почасовой прогноз поездок со станций на days дней начиная с start_day"""
+    day = np.arange(start_day, start_day + days)
+    dates = day.astype('datetime64[D]')
+    month_of_year = dates.astype('datetime64[M]').astype(np.int64) % 12
+    slots = ((day + 3) % 7)[:, None] * 24 + np.arange(24)
+    # Время в годах с 1970 - в тех же единицах, что и тренд
+    x = (day + 0.5) / 365.25
+
+    level = np.maximum(params['level_a'][:, None] + params['level_b'][:, None] * x, 0)
+    daily = level * params['month_factor'][:, month_of_year]
+    hourly = daily[:, :, None] * params['profile'][:, slots]
+
+    n_stations = len(params['level_a'])
+    return pd.DataFrame({
+        'station_key': np.repeat(np.arange(n_stations, dtype=np.int32), days * 24),
+        'date': np.tile(np.repeat(dates, 24), n_stations),
+        'hour': np.tile(np.arange(24), n_stations * days),
+        'forecast_rides': hourly.ravel().round(3),
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Почасовой прогноз спроса по станциям')
+    parser.add_argument('--data', default='2023-2025.csv')
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--days', type=int, default=FORECAST_DAYS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--refit', action='store_true', help='пересчитать статистики с нуля, без кэша')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ПРОГНОЗ СПРОСА ПО СТАНЦИЯМ")
+    print("=" * 70)
+
+    cache_path = os.path.join(args.output, CACHE_FILE)
+    stats, params = (empty_statistics(), None) if args.refit else load_cache(cache_path)
+    cached_months = len(stats['months'])
+    consumed = int(stats['consumed_bytes'])
+    new_months = update_statistics(stats, args.data)
+    print(f"Месяцев из кэша: {cached_months}, новых: {len(new_months)}")
+    if not len(stats['months']):
+        raise SystemExit(f"Нет поездок в {args.data}")
+
+    if params is None or len(new_months):
+        params = fit(stats, args.workers)
+        save_cache(cache_path, stats, params)
+        print(f"Модель подобрана для {len(params['level_a']):,} станций")
+    else:
+        print("Новых месяцев нет - используются параметры из кэша")
+        # Файл пересобран без новых месяцев - запоминаем его новую границу
+        if int(stats['consumed_bytes']) != consumed:
+            save_cache(cache_path, stats, params)
+
+    start_day = int(stats['last_day']) + 1
+    result = forecast(params, start_day, args.days)
+    stations = load_station_dimension()
+    result.insert(1, 'station_name', stations.station_names(result['station_key'].to_numpy()))
+
+    by_station = result.groupby(['station_key', 'station_name'])['forecast_rides'].sum()
+    print(f"\nПрогноз с {np.datetime64(start_day, 'D')} на {args.days} дн.: "
+          f"{result['forecast_rides'].sum():,.0f} поездок")
+    print("Топ-5 станций по прогнозу:")
+    for (_, name), rides in by_station.nlargest(5).items():
+        print(f"  {name:30}: {rides:8,.1f} поездок")
+
+    by_slot = result.groupby([pd.to_datetime(result['date']).dt.dayofweek, 'hour'])['forecast_rides'].sum()
+    (weekday, hour), peak = by_slot.idxmax(), by_slot.max()
+    print(f"Пиковый час: {days_ru[weekday]} {hour:02d}:00 ({peak:,.1f} поездок по всем станциям)")
+
+    result.to_csv(f'{args.output}/station_hourly_forecast.csv', index=False, encoding='utf-8-sig')
+    print(f"\n✓ Результаты сохранены в {args.output}/:")
+    print("  - station_hourly_forecast.csv")
+    print(f"  - {CACHE_FILE}")
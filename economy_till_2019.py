@@ -5,6 +5,22 @@ import seaborn as sns
 import warnings
 import os
 
+from unit_economics import (
+    BIKE_PRICE_AVERAGE,
+    build_category_metrics,
+    calculate_bike_economics,
+    calculate_trip_revenue_vectorized,
+    categories_order,
+    category_box_stats,
+    category_prices,
+    classify_bikes,
+    fleet_means,
+    sensitivity_analysis,
+)
+from data_validation import load_validated
+from sampling import bike_sample, output_folder, sample_fraction, srs_mean, srs_ratio, srs_total
+from survival_analysis import ASSUMED_LIFESPAN_ENV, measured_lifespans
+
 warnings.filterwarnings('ignore')
 
 # Настройки визуализации
@@ -18,12 +34,21 @@ print("=" * 100)
 print("РАСШИРЕННЫЙ АНАЛИЗ ЮНИТ-ЭКОНОМИКИ: ОДИН ВЕЛОСИПЕД")
 print("=" * 100)
 
-# Загружаем очищенный датасет
-df = pd.read_csv('2013-2019.csv')
+# Загружаем очищенный датасет (BIKE_SAMPLE=0.05 - быстрый прогон на выборке велосипедов)
+fraction = sample_fraction()
+fleet_size = None
+# На выборке результаты пишутся в unit_economics_enhanced_sample/ - полные
+# таблицы читают tariff_plans.py и дашборд
+output_dir = output_folder('unit_economics_enhanced', fraction)
+if fraction:
+    df, fleet_size = bike_sample('2013-2019.csv', fraction)
+    print(f"РЕЖИМ ВЫБОРКИ: {fraction:.1%} велосипедов со всей историей поездок")
+else:
+    df = load_validated('2013-2019.csv')
 df['starttime'] = pd.to_datetime(df['starttime'])
 
 print(f"Всего поездок: {len(df):,}")
-print(f"Уникальных велосипедов: {df['bikeid'].nunique():,}")
+print(f"Уникальных велосипедов: {df['bikeid'].nunique():,}" + (f" из {fleet_size:,}" if fleet_size else ""))
 print(f"Период данных: {df['starttime'].min().date()} - {df['starttime'].max().date()}")
 
 # ========== 1. АРОМАТИЗАЦИЯ: ДОБАВЛЕНИЕ КАТЕГОРИЙ ВЕЛОСИПЕДОВ ==========
@@ -31,57 +56,6 @@ print("\n" + "=" * 100)
 print("1. АРОМАТИЗАЦИЯ: КЛАССИФИКАЦИЯ ВЕЛОСИПЕДОВ ПО КАТЕГОРИЯМ")
 print("=" * 100)
 
-
-def classify_bikes(df):
-    """Классифицируем велосипеды по категориям на основе их использования"""
-
-    # Собираем статистику по каждому велосипеду
-    bike_stats = df.groupby('bikeid').agg({
-        'trip_id': 'count',
-        'tripduration': ['mean', 'sum'],
-        'from_station_id': 'nunique',
-        'usertype': lambda x: (x == 'Subscriber').mean()
-    }).round(2)
-
-    bike_stats.columns = ['total_trips', 'avg_duration', 'total_duration', 'unique_stations', 'subscriber_ratio']
-    bike_stats = bike_stats.reset_index()
-
-    # Определяем категории велосипедов
-    def assign_category(row):
-        trips = row['total_trips']
-        duration = row['avg_duration'] / 60  # в минутах
-        stations = row['unique_stations']
-
-        if trips > bike_stats['total_trips'].quantile(0.75):
-            return 'Премиум (высокая нагрузка)'
-        elif trips > bike_stats['total_trips'].quantile(0.5):
-            return 'Стандарт (средняя нагрузка)'
-        elif trips > bike_stats['total_trips'].quantile(0.25):
-            return 'Эконом (низкая нагрузка)'
-        else:
-            return 'Низкоиспользуемый'
-
-    bike_stats['category'] = bike_stats.apply(assign_category, axis=1)
-
-    # Дополнительная классификация по "ароматам" (специализации)
-    def assign_flavor(row):
-        duration = row['avg_duration'] / 60
-        stations = row['unique_stations']
-
-        if duration > 30:
-            return 'Длинные поездки'
-        elif stations > bike_stats['unique_stations'].quantile(0.75):
-            return 'Межстанционный'
-        elif row['subscriber_ratio'] > 0.7:
-            return 'Подписочный'
-        else:
-            return 'Разнообразный'
-
-    bike_stats['flavor'] = bike_stats.apply(assign_flavor, axis=1)
-
-    return bike_stats
-
-
 bike_categories = classify_bikes(df)
 print(f"\nРаспределение велосипедов по категориям:")
 print(bike_categories['category'].value_counts())
@@ -93,220 +67,34 @@ print("\n" + "=" * 100)
 print("2. РАСЧЕТ ДОХОДОВ С РЕАЛЬНЫМИ ТАРИФАМИ")
 print("=" * 100)
 
-
-def calculate_trip_revenue_improved(row):
-    """Рассчитываем доход от поездки с учетом всех деталей"""
-    year = row['starttime'].year
-    duration_minutes = row['tripduration'] / 60
-    usertype = row['usertype']
-
-    # Определяем сезон для динамического ценообразования
-    month = row['starttime'].month
-    if month in [6, 7, 8]:  # Лето
-        season_factor = 1.2  # +20% летом
-    elif month in [12, 1, 2]:  # Зима
-        season_factor = 0.8  # -20% зимой
-    else:
-        season_factor = 1.0
-
-    # Определяем период
-    if 2013 <= year <= 2015:
-        if usertype == 'Customer':  # Без подписки
-            base_pass = 7
-            if duration_minutes <= 30:
-                extra = 0
-            elif duration_minutes <= 60:
-                extra = 2
-            elif duration_minutes <= 90:
-                extra = 6
-            else:
-                extra_blocks = np.ceil((duration_minutes - 90) / 30)
-                extra = 6 + extra_blocks * 8
-
-            return (base_pass + extra) * season_factor
-
-        else:  # Subscriber
-            # Годовая подписка $75 распределяется на поездки
-            # Базовый доход от подписки считается отдельно
-
-            if duration_minutes <= 30:
-                extra = 0
-            elif duration_minutes <= 60:
-                extra = 1.5
-            elif duration_minutes <= 90:
-                extra = 4.5
-            else:
-                extra_blocks = np.ceil((duration_minutes - 90) / 30)
-                extra = 4.5 + extra_blocks * 6
-
-            return extra * season_factor
-
-    else:  # 2016-2019
-        if usertype == 'Customer':
-            base_pass = 9.95
-            if duration_minutes <= 30:
-                extra = 0
-            else:
-                extra_blocks = np.ceil((duration_minutes - 30) / 30)
-                extra = extra_blocks * 3
-
-            return (base_pass + extra) * season_factor
-
-        else:  # Subscriber
-            # Месячная подписка $9.95 распределяется на поездки
-
-            if duration_minutes <= 180:
-                extra = 0
-            else:
-                extra_blocks = np.ceil((duration_minutes - 180) / 30)
-                extra = extra_blocks * 3
-
-            return extra * season_factor
-
-
 print("Расчет доходов с учетом сезонности и категорий...")
-df['trip_revenue'] = df.apply(calculate_trip_revenue_improved, axis=1)
+df['trip_revenue'] = calculate_trip_revenue_vectorized(df)
 
 # ========== 3. ЦЕНА ВЕЛОСИПЕДА: СРЕДНЕЕ ЗНАЧЕНИЕ ==========
 print("\n" + "=" * 100)
 print("3. РАСЧЕТ СТОИМОСТИ ВЕЛОСИПЕДОВ")
 print("=" * 100)
 
-# Берем среднюю цену велосипеда
-BIKE_PRICE_AVERAGE = (210.00 + 899.99) / 2
+# Средняя цена и вариация по категориям - в unit_economics.py
 print(f"Средняя цена велосипеда: ${BIKE_PRICE_AVERAGE:.2f}")
 
-# Но добавим вариацию в зависимости от категории
-category_prices = {
-    'Премиум (высокая нагрузка)': BIKE_PRICE_AVERAGE * 1.2,  # +20% для премиум
-    'Стандарт (средняя нагрузка)': BIKE_PRICE_AVERAGE,
-    'Эконом (низкая нагрузка)': BIKE_PRICE_AVERAGE * 0.8,  # -20% для эконом
-    'Низкоиспользуемый': BIKE_PRICE_AVERAGE * 0.6  # -40% для низкоиспользуемых
-}
+# Срок службы по категориям - измеренный по данным (Каплан-Мейер, survival_analysis.py);
+# BIKE_ASSUMED_LIFESPAN=1 - принятые константы BIKE_LIFESPAN
+if os.environ.get(ASSUMED_LIFESPAN_ENV):
+    lifespans = None
+    print("Срок службы: принятые константы BIKE_LIFESPAN")
+else:
+    lifespans = measured_lifespans(df, bike_categories)
+    print("Срок службы по категориям (измерен по данным, лет):")
+    for category, years in lifespans.items():
+        print(f"  {category:30}: {years:.2f}")
 
 # ========== 4. РАСЧЕТ ЭКОНОМИКИ ПО КАТЕГОРИЯМ ==========
 print("\n" + "=" * 100)
 print("4. РАСЧЕТ ЭКОНОМИКИ ПО КАТЕГОРИЯМ ВЕЛОСИПЕДОВ")
 print("=" * 100)
 
-
-def calculate_bike_economics(df, bike_categories, category_prices):
-    """Расчет экономики для каждого велосипеда с учетом категорий"""
-
-    bike_economics = []
-
-    for bike_id in df['bikeid'].unique():
-        bike_data = df[df['bikeid'] == bike_id]
-
-        # Основные метрики
-        total_trips = len(bike_data)
-        first_trip = bike_data['starttime'].min()
-        last_trip = bike_data['starttime'].max()
-        active_days = (last_trip - first_trip).days + 1
-
-        # Доходы
-        trip_revenue_total = bike_data['trip_revenue'].sum()
-
-        # Доходы от подписок (распределяем на велосипеды пропорционально поездкам)
-        subscriber_data = bike_data[bike_data['usertype'] == 'Subscriber']
-        subscription_revenue = 0
-
-        if len(subscriber_data) > 0:
-            # Для периода 2013-2015: годовая плата $75
-            early_years = subscriber_data[subscriber_data['starttime'].dt.year.between(2013, 2015)]
-            if len(early_years) > 0:
-                years_used = early_years['starttime'].dt.year.nunique()
-                # Распределяем годовую плату пропорционально поездкам
-                early_ratio = len(early_years) / total_trips if total_trips > 0 else 0
-                subscription_revenue += 75 * years_used * early_ratio
-
-            # Для периода 2016-2019: месячная плата $9.95
-            late_years = subscriber_data[subscriber_data['starttime'].dt.year.between(2016, 2019)]
-            if len(late_years) > 0:
-                months_used = late_years['starttime'].dt.to_period('M').nunique()
-                late_ratio = len(late_years) / total_trips if total_trips > 0 else 0
-                subscription_revenue += 9.95 * months_used * late_ratio
-
-        total_revenue = trip_revenue_total + subscription_revenue
-
-        # Определяем категорию велосипеда
-        category_info = bike_categories[bike_categories['bikeid'] == bike_id]
-        if len(category_info) > 0:
-            category = category_info.iloc[0]['category']
-            flavor = category_info.iloc[0]['flavor']
-            bike_price = category_prices.get(category, BIKE_PRICE_AVERAGE)
-        else:
-            category = 'Неизвестно'
-            flavor = 'Неизвестно'
-            bike_price = BIKE_PRICE_AVERAGE
-
-        # Срок службы в зависимости от нагрузки
-        if category == 'Премиум (высокая нагрузка)':
-            bike_lifespan = 1.5  # года
-        elif category == 'Стандарт (средняя нагрузка)':
-            bike_lifespan = 2.0  # года
-        else:
-            bike_lifespan = 3.0  # года
-
-        # Расходы
-        years_active = active_days / 365.25
-        depreciation_cost = (bike_price / bike_lifespan) * years_active
-
-        # Обслуживание: зависит от категории
-        if category == 'Премиум (высокая нагрузка)':
-            maintenance_per_trip = 0.20  # $ за поездку
-        elif category == 'Стандарт (средняя нагрузка)':
-            maintenance_per_trip = 0.15
-        else:
-            maintenance_per_trip = 0.10
-
-        maintenance_cost = total_trips * maintenance_per_trip
-
-        # Страховка и хранение
-        insurance_cost = 5 * (active_days / 30)  # $5 в месяц
-        storage_cost = 3 * (active_days / 30)  # $3 в месяц
-
-        # Маркетинг и прочие расходы (10% от дохода)
-        marketing_cost = total_revenue * 0.10
-
-        total_costs = (depreciation_cost + maintenance_cost +
-                       insurance_cost + storage_cost + marketing_cost)
-
-        # Прибыль
-        profit = total_revenue - total_costs
-        profit_margin = (profit / total_revenue * 100) if total_revenue > 0 else 0
-
-        # ROI (Return on Investment)
-        roi = (profit / bike_price * 100) if bike_price > 0 else 0
-
-        bike_economics.append({
-            'bike_id': bike_id,
-            'category': category,
-            'flavor': flavor,
-            'total_trips': total_trips,
-            'active_days': active_days,
-            'bike_price': bike_price,
-            'bike_lifespan': bike_lifespan,
-            'trip_revenue': trip_revenue_total,
-            'subscription_revenue': subscription_revenue,
-            'total_revenue': total_revenue,
-            'depreciation_cost': depreciation_cost,
-            'maintenance_cost': maintenance_cost,
-            'insurance_cost': insurance_cost,
-            'storage_cost': storage_cost,
-            'marketing_cost': marketing_cost,
-            'total_costs': total_costs,
-            'profit': profit,
-            'profit_margin': profit_margin,
-            'roi_percent': roi,
-            'trips_per_day': total_trips / active_days if active_days > 0 else 0,
-            'revenue_per_trip': total_revenue / total_trips if total_trips > 0 else 0
-        })
-
-    return pd.DataFrame(bike_economics)
-
-
-bike_econ_df = calculate_bike_economics(df, bike_categories, category_prices)
+bike_econ_df = calculate_bike_economics(df, bike_categories, category_prices, lifespans)
 
 print(f"\nАнализ по категориям велосипедов:")
 category_summary = bike_econ_df.groupby('category').agg({
@@ -327,7 +115,10 @@ print("5. ВИЗУАЛИЗАЦИЯ: ПРАВИЛЬНЫЕ ДИАГРАММЫ ДЛ
 print("=" * 100)
 
 # Создаем директорию для графиков
-os.makedirs('unit_economics_enhanced', exist_ok=True)
+os.makedirs(output_dir, exist_ok=True)
+
+# Модель категорий: считается один раз, диаграммы и выводы читают из нее
+category_metrics = build_category_metrics(bike_econ_df)
 
 # 5.1. Тепловая карта корреляции между метриками
 plt.figure(figsize=(14, 10))
@@ -343,14 +134,12 @@ plt.tight_layout()
 
 # 5.2. Box plot распределения прибыли по категориям
 plt.subplot(2, 2, 2)
-categories_order = ['Премиум (высокая нагрузка)', 'Стандарт (средняя нагрузка)',
-                    'Эконом (низкая нагрузка)', 'Низкоиспользуемый']
-box_data = [bike_econ_df[bike_econ_df['category'] == cat]['profit'] for cat in categories_order]
+box_stats = category_box_stats(bike_econ_df, category_metrics, 'profit')
 
-bp = plt.boxplot(box_data, labels=categories_order, patch_artist=True)
+bp = plt.gca().bxp(box_stats, patch_artist=True)
 colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
-for patch, color in zip(bp['boxes'], colors):
-    patch.set_facecolor(color)
+for i, patch in enumerate(bp['boxes']):
+    patch.set_facecolor(colors[i % len(colors)])
     patch.set_alpha(0.7)
 
 plt.title('Распределение прибыли по категориям', fontsize=14, fontweight='bold')
@@ -379,7 +168,7 @@ plt.legend(handles=legend_elements, title='Категории', bbox_to_anchor=(
 
 # 5.4. Waterfall chart для структуры доходов и расходов (средний велосипед)
 plt.subplot(2, 2, 4)
-avg_bike = bike_econ_df.mean(numeric_only=True)
+avg_bike = fleet_means(category_metrics)
 
 waterfall_data = {
     'Начальная стоимость': -avg_bike['bike_price'],
@@ -413,77 +202,34 @@ plt.xticks(rotation=45, ha='right')
 plt.grid(True, alpha=0.3, axis='y')
 
 plt.tight_layout()
-plt.savefig('unit_economics_enhanced/advanced_analysis.png', dpi=300, bbox_inches='tight')
+plt.savefig(f'{output_dir}/advanced_analysis.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # 5.5. Radar chart для сравнения категорий
 fig = plt.figure(figsize=(10, 8))
 ax = fig.add_subplot(111, projection='polar')
 
-categories_for_radar = ['Премиум', 'Стандарт', 'Эконом']
-metrics = ['Прибыль', 'ROI', 'Загрузка', 'Доход/поездка', 'Маржа']
-
-
-# Нормализуем данные для radar chart
-def normalize_data(data, min_val, max_val):
-    return (data - min_val) / (max_val - min_val) if max_val > min_val else 0.5
-
-
-premium_data = [
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Премиум (высокая нагрузка)']['profit'].mean(),
-                   bike_econ_df['profit'].min(), bike_econ_df['profit'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Премиум (высокая нагрузка)']['roi_percent'].mean(),
-                   bike_econ_df['roi_percent'].min(), bike_econ_df['roi_percent'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Премиум (высокая нагрузка)']['trips_per_day'].mean(),
-                   bike_econ_df['trips_per_day'].min(), bike_econ_df['trips_per_day'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Премиум (высокая нагрузка)']['revenue_per_trip'].mean(),
-                   bike_econ_df['revenue_per_trip'].min(), bike_econ_df['revenue_per_trip'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Премиум (высокая нагрузка)']['profit_margin'].mean(),
-                   bike_econ_df['profit_margin'].min(), bike_econ_df['profit_margin'].max())
-]
-
-standard_data = [
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Стандарт (средняя нагрузка)']['profit'].mean(),
-                   bike_econ_df['profit'].min(), bike_econ_df['profit'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Стандарт (средняя нагрузка)']['roi_percent'].mean(),
-                   bike_econ_df['roi_percent'].min(), bike_econ_df['roi_percent'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Стандарт (средняя нагрузка)']['trips_per_day'].mean(),
-                   bike_econ_df['trips_per_day'].min(), bike_econ_df['trips_per_day'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Стандарт (средняя нагрузка)']['revenue_per_trip'].mean(),
-                   bike_econ_df['revenue_per_trip'].min(), bike_econ_df['revenue_per_trip'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Стандарт (средняя нагрузка)']['profit_margin'].mean(),
-                   bike_econ_df['profit_margin'].min(), bike_econ_df['profit_margin'].max())
-]
-
-economy_data = [
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Эконом (низкая нагрузка)']['profit'].mean(),
-                   bike_econ_df['profit'].min(), bike_econ_df['profit'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Эконом (низкая нагрузка)']['roi_percent'].mean(),
-                   bike_econ_df['roi_percent'].min(), bike_econ_df['roi_percent'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Эконом (низкая нагрузка)']['trips_per_day'].mean(),
-                   bike_econ_df['trips_per_day'].min(), bike_econ_df['trips_per_day'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Эконом (низкая нагрузка)']['revenue_per_trip'].mean(),
-                   bike_econ_df['revenue_per_trip'].min(), bike_econ_df['revenue_per_trip'].max()),
-    normalize_data(bike_econ_df[bike_econ_df['category'] == 'Эконом (низкая нагрузка)']['profit_margin'].mean(),
-                   bike_econ_df['profit_margin'].min(), bike_econ_df['profit_margin'].max())
-]
-
-# Закрываем данные для radar chart
-premium_data += premium_data[:1]
-standard_data += standard_data[:1]
-economy_data += economy_data[:1]
+radar_metrics = {
+    'Прибыль': 'profit',
+    'ROI': 'roi_percent',
+    'Загрузка': 'trips_per_day',
+    'Доход/поездка': 'revenue_per_trip',
+    'Маржа': 'profit_margin'
+}
+metrics = list(radar_metrics)
 
 angles = np.linspace(0, 2 * np.pi, len(metrics), endpoint=False).tolist()
 angles += angles[:1]
 
-ax.plot(angles, premium_data, 'o-', linewidth=2, label='Премиум', color='#FF6B6B')
-ax.fill(angles, premium_data, alpha=0.25, color='#FF6B6B')
-
-ax.plot(angles, standard_data, 'o-', linewidth=2, label='Стандарт', color='#4ECDC4')
-ax.fill(angles, standard_data, alpha=0.25, color='#4ECDC4')
-
-ax.plot(angles, economy_data, 'o-', linewidth=2, label='Эконом', color='#45B7D1')
-ax.fill(angles, economy_data, alpha=0.25, color='#45B7D1')
+# Нормированные оценки уже посчитаны в модели категорий
+radar_scores = category_metrics.xs('score', axis=1, level=1)[list(radar_metrics.values())]
+for i, (category, scores) in enumerate(radar_scores.iterrows()):
+    radar_data = scores.tolist()
+    # Закрываем данные для radar chart
+    radar_data += radar_data[:1]
+    label = category.split(' (')[0]
+    ax.plot(angles, radar_data, 'o-', linewidth=2, label=label, color=colors[i % len(colors)])
+    ax.fill(angles, radar_data, alpha=0.25, color=colors[i % len(colors)])
 
 ax.set_xticks(angles[:-1])
 ax.set_xticklabels(metrics, fontsize=10)
@@ -493,7 +239,7 @@ ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.0))
 ax.grid(True)
 
 plt.tight_layout()
-plt.savefig('unit_economics_enhanced/radar_comparison.png', dpi=300, bbox_inches='tight')
+plt.savefig(f'{output_dir}/radar_comparison.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # 5.6. Treemap для визуализации структуры парка
@@ -506,17 +252,18 @@ category_data = bike_econ_df.groupby(['category', 'flavor']).agg({
 }).reset_index()
 
 # Простая визуализация вместо сложного treemap
-category_summary_simple = bike_econ_df.groupby('category').agg({
-    'bike_id': 'count',
-    'profit': 'mean'
-}).reset_index()
+category_summary_simple = pd.DataFrame({
+    'category': category_metrics.index,
+    'bike_id': category_metrics[('total_trips', 'count')].to_numpy(),
+    'profit': category_metrics[('profit', 'mean')].to_numpy()
+})
 
 # Создаем bubble chart
 scatter = ax.scatter(category_summary_simple['bike_id'],
                      category_summary_simple['profit'],
                      s=category_summary_simple['bike_id'] * 10,  # Размер по количеству
                      alpha=0.7,
-                     c=[0, 1, 2, 3],
+                     c=np.arange(len(category_summary_simple)),
                      cmap='viridis')
 
 ax.set_xlabel('Количество велосипедов в категории')
@@ -533,7 +280,7 @@ for i, row in category_summary_simple.iterrows():
                 fontsize=9, fontweight='bold')
 
 plt.tight_layout()
-plt.savefig('unit_economics_enhanced/bubble_categories.png', dpi=300, bbox_inches='tight')
+plt.savefig(f'{output_dir}/bubble_categories.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # ========== 6. АНАЛИЗ ЧУВСТВИТЕЛЬНОСТИ ==========
@@ -541,52 +288,7 @@ print("\n" + "=" * 100)
 print("6. АНАЛИЗ ЧУВСТВИТЕЛЬНОСТИ")
 print("=" * 100)
 
-
-def sensitivity_analysis(base_params):
-    """Анализ чувствительности к ключевым параметрам"""
-
-    results = []
-
-    # Вариации ключевых параметров
-    price_variations = [BIKE_PRICE_AVERAGE * 0.7, BIKE_PRICE_AVERAGE, BIKE_PRICE_AVERAGE * 1.3]
-    trips_variations = [0.7, 1.0, 1.3]  # Коэффициент нагрузки
-    maintenance_variations = [0.10, 0.15, 0.20]  # Стоимость обслуживания за поездку
-
-    for price in price_variations:
-        for trips_factor in trips_variations:
-            for maintenance in maintenance_variations:
-                # Упрощенный расчет для анализа чувствительности
-                avg_trips = bike_econ_df['total_trips'].mean() * trips_factor
-                avg_revenue = bike_econ_df['revenue_per_trip'].mean() * avg_trips
-
-                # Предполагаемый срок службы
-                lifespan = 2.0  # года
-
-                # Расходы
-                depreciation = price / lifespan
-                maintenance_cost = avg_trips * maintenance
-                other_costs = 12 * (5 + 3)  # Страховка + хранение ($ в месяц)
-
-                total_costs = depreciation + maintenance_cost + other_costs
-                profit = avg_revenue - total_costs
-                roi = (profit / price) * 100 if price > 0 else 0
-
-                results.append({
-                    'price': price,
-                    'trips_factor': trips_factor,
-                    'maintenance_cost_per_trip': maintenance,
-                    'profit': profit,
-                    'roi': roi
-                })
-
-    return pd.DataFrame(results)
-
-
-sensitivity_df = sensitivity_analysis({
-    'base_price': BIKE_PRICE_AVERAGE,
-    'base_trips': bike_econ_df['total_trips'].mean(),
-    'base_maintenance': 0.15
-})
+sensitivity_df = sensitivity_analysis(bike_econ_df)
 
 print(f"Анализ чувствительности выполнен для {len(sensitivity_df)} сценариев")
 print(f"Средняя прибыль в сценариях: ${sensitivity_df['profit'].mean():.2f}")
@@ -599,18 +301,13 @@ print("=" * 100)
 
 print("\n📊 СВОДКА ПО КАТЕГОРИЯМ:")
 print("-" * 60)
-for category in categories_order:
-    if category in bike_econ_df['category'].unique():
-        cat_data = bike_econ_df[bike_econ_df['category'] == category]
-        count = len(cat_data)
-        avg_profit = cat_data['profit'].mean()
-        avg_roi = cat_data['roi_percent'].mean()
-        print(f"{category}:")
-        print(f"  • Количество: {count} велосипедов")
-        print(f"  • Средняя прибыль: ${avg_profit:.2f}")
-        print(f"  • Средний ROI: {avg_roi:.1f}%")
-        print(f"  • Доля от общего парка: {(count / len(bike_econ_df) * 100):.1f}%")
-        print()
+for category, cat_metrics in category_metrics.iterrows():
+    print(f"{category}:")
+    print(f"  • Количество: {cat_metrics[('total_trips', 'count')]:.0f} велосипедов")
+    print(f"  • Средняя прибыль: ${cat_metrics[('profit', 'mean')]:.2f}")
+    print(f"  • Средний ROI: {cat_metrics[('roi_percent', 'mean')]:.1f}%")
+    print(f"  • Доля от общего парка: {cat_metrics[('fleet', 'share_pct')]:.1f}%")
+    print()
 
 print("\n💰 ФИНАНСОВЫЕ ИТОГИ:")
 print("-" * 60)
@@ -625,6 +322,19 @@ print(f"• Общая прибыль: ${total_profit:,.2f}")
 print(f"• Общий ROI: {overall_roi:.1f}%")
 print(f"• Прибыльных велосипедов: {profitable_bikes} из {len(bike_econ_df)} ({profitability_rate:.1f}%)")
 
+if fleet_size:
+    # Оценки для всего парка по выборке велосипедов
+    investment_est = srs_total(bike_econ_df['bike_price'], fleet_size)
+    profit_est = srs_total(bike_econ_df['profit'], fleet_size)
+    roi_est = srs_ratio(bike_econ_df['profit'], bike_econ_df['bike_price'], fleet_size)
+    profitable_est = srs_mean(bike_econ_df['profit'] > 0, fleet_size)
+    print(f"\nОценка для всего парка ({fleet_size:,} велосипедов, 95% ДИ):")
+    print(f"• Общие инвестиции: ${investment_est[0]:,.2f} (${investment_est[1]:,.2f} - ${investment_est[2]:,.2f})")
+    print(f"• Общая прибыль: ${profit_est[0]:,.2f} (${profit_est[1]:,.2f} - ${profit_est[2]:,.2f})")
+    print(f"• Общий ROI: {roi_est[0] * 100:.1f}% ({roi_est[1] * 100:.1f}% - {roi_est[2] * 100:.1f}%)")
+    print(f"• Доля прибыльных: {profitable_est[0] * 100:.1f}% "
+          f"({profitable_est[1] * 100:.1f}% - {profitable_est[2] * 100:.1f}%)")
+
 print("\n🎯 РЕКОМЕНДАЦИИ:")
 print("-" * 60)
 print("1. 📈 ФОКУС НА ПРЕМИУМ-КАТЕГОРИЮ:")
@@ -653,12 +363,13 @@ print("8. СОХРАНЕНИЕ РЕЗУЛЬТАТОВ")
 print("=" * 100)
 
 # Сохраняем все данные
-bike_econ_df.to_csv('unit_economics_enhanced/bike_economics_detailed.csv', index=False)
-category_summary.to_csv('unit_economics_enhanced/category_summary.csv')
-sensitivity_df.to_csv('unit_economics_enhanced/sensitivity_analysis.csv', index=False)
+bike_econ_df.to_csv(f'{output_dir}/bike_economics_detailed.csv', index=False)
+category_summary.to_csv(f'{output_dir}/category_summary.csv')
+category_metrics.to_csv(f'{output_dir}/category_metrics.csv')
+sensitivity_df.to_csv(f'{output_dir}/sensitivity_analysis.csv', index=False)
 
 # Создаем отчет
-with open('unit_economics_enhanced/comprehensive_report.txt', 'w', encoding='utf-8') as f:
+with open(f'{output_dir}/comprehensive_report.txt', 'w', encoding='utf-8') as f:
     f.write("=" * 70 + "\n\n")
 
     f.write("ОБЩАЯ СТАТИСТИКА:\n")
@@ -670,10 +381,8 @@ with open('unit_economics_enhanced/comprehensive_report.txt', 'w', encoding='utf
 
     f.write("РАСПРЕДЕЛЕНИЕ ПО КАТЕГОРИЯМ:\n")
     f.write("-" * 40 + "\n")
-    for category in categories_order:
-        if category in bike_econ_df['category'].unique():
-            cat_data = bike_econ_df[bike_econ_df['category'] == category]
-            f.write(f"{category}:\n")
-            f.write(f"  Количество: {len(cat_data)}\n")
-            f.write(f"  Средняя прибыль: ${cat_data['profit'].mean():.2f}\n")
-            f.write(f"  Средний ROI: {cat_data['roi_percent'].mean():.1f}%\n\n")
\ No newline at end of file
+    for category, cat_metrics in category_metrics.iterrows():
+        f.write(f"{category}:\n")
+        f.write(f"  Количество: {cat_metrics[('total_trips', 'count')]:.0f}\n")
+        f.write(f"  Средняя прибыль: ${cat_metrics[('profit', 'mean')]:.2f}\n")
+        f.write(f"  Средний ROI: {cat_metrics[('roi_percent', 'mean')]:.1f}%\n\n")
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import read_validated
+
+# Источники поездок: файл, столбцы начала/конца поездки и схема DataValidator
+# (2023-2025.csv уже проверен при сборке в 2023-2025.py)
+SOURCES = [
+    ('2013-2019.csv', 'starttime', 'stoptime', 'legacy'),
+    ('2023-2025.csv', 'started_at', 'ended_at', None),
+]
+
+CHUNK_ROWS = 2_000_000
+
+
+def trip_events(starts, ends):
+    """Переводим поездки в события +1/-1 по минутам
+
+    Велосипед занят с минуты начала до минуты окончания (не включая ее);
+    поездка короче минуты занимает одну минуту.
+    """
+    start_min = starts.to_numpy(dtype='datetime64[m]').astype(np.int64)
+    end_min = ends.to_numpy(dtype='datetime64[m]').astype(np.int64)
+    end_min = np.maximum(end_min, start_min + 1)
+
+    keys = np.concatenate([start_min, end_min])
+    deltas = np.concatenate([np.ones(len(start_min), np.int64), -np.ones(len(end_min), np.int64)])
+    return merge_events(keys, deltas)
+
+
+def merge_events(keys, deltas, *more):
+    """Сливаем события по одинаковым минутам: ключи уникальны и отсортированы
+
+    Принимает пары (ключи, приращения); память зависит только от числа
+    различных минут, а не от числа поездок.
+    """
+    keys = np.concatenate([keys] + list(more[0::2]))
+    deltas = np.concatenate([deltas] + list(more[1::2]))
+    merged, inverse = np.unique(keys, return_inverse=True)
+    return merged, np.bincount(inverse, weights=deltas, minlength=len(merged)).astype(np.int64)
+
+
+def accumulate_events(sources=SOURCES, chunk_rows=CHUNK_ROWS):
+    """Один проход по всем источникам порциями с накоплением событий"""
+    keys = np.empty(0, np.int64)
+    deltas = np.empty(0, np.int64)
+    trips = 0
+
+    for path, start_col, end_col, schema_name in sources:
+        if not os.path.exists(path):
+            print(f"  ⚠️  {path} не найден, пропускаем")
+            continue
+        if schema_name:
+            chunks = read_validated(path, schema_name, chunk_rows)
+        else:
+            chunks = pd.read_csv(path, usecols=[start_col, end_col], chunksize=chunk_rows)
+        for chunk in chunks:
+            starts = pd.to_datetime(chunk[start_col], errors='coerce')
+            ends = pd.to_datetime(chunk[end_col], errors='coerce')
+            valid = starts.notna() & ends.notna()
+            chunk_keys, chunk_deltas = trip_events(starts[valid], ends[valid])
+            keys, deltas = merge_events(keys, deltas, chunk_keys, chunk_deltas)
+            trips += int(valid.sum())
+        print(f"  {path}: накоплено {len(keys):,} минут с событиями")
+
+    return keys, deltas, trips
+
+
+def concurrency_by_hour(keys, deltas):
+    """Пиковое число одновременно занятых велосипедов в каждом часе
+
+    К событиям добавляются нулевые события на границах часов, чтобы
+    уровень, перешедший из предыдущего часа, тоже учитывался в максимуме.
+    """
+    first_hour = keys[0] // 60 * 60
+    hour_marks = np.arange(first_hour, keys[-1] + 1, 60, dtype=np.int64)
+    keys, deltas = merge_events(keys, deltas, hour_marks, np.zeros(len(hour_marks), np.int64))
+
+    # Бегущая сумма по отсортированным событиям - число велосипедов в пути
+    in_use = np.cumsum(deltas)
+    hours = keys // 60 * 60
+
+    peak = pd.Series(in_use).groupby(hours).max()
+    peak.index = pd.to_datetime(peak.index * 60, unit='s')
+    peak.index.name = 'hour'
+    return peak.rename('peak_bikes')
+
+
+def concurrency_by_day(peak_by_hour):
+    """Дневной пик и час, в котором он достигнут"""
+    days = peak_by_hour.index.floor('D')
+    grouped = peak_by_hour.groupby(days)
+    by_day = pd.DataFrame({
+        'peak_bikes': grouped.max(),
+        'peak_hour': grouped.idxmax().dt.hour,
+    })
+    by_day.index.name = 'date'
+    return by_day
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("ОДНОВРЕМЕННО ЗАНЯТЫЕ ВЕЛОСИПЕДЫ (SWEEP-LINE)")
+    print("=" * 70)
+
+    keys, deltas, trips = accumulate_events()
+    print(f"\nОбработано поездок: {trips:,}")
+
+    peak_by_hour = concurrency_by_hour(keys, deltas)
+    peak_by_hour = peak_by_hour[peak_by_hour > 0]
+    peak_by_day = concurrency_by_day(peak_by_hour)
+
+    hour_profile = peak_by_hour.groupby(peak_by_hour.index.hour).agg(['mean', 'max']).round(1)
+    hour_profile.index.name = 'hour_of_day'
+    hour_profile.columns = ['avg_peak_bikes', 'max_peak_bikes']
+
+    top = peak_by_day['peak_bikes'].idxmax()
+    print(f"Максимум одновременно в пути: {peak_by_day['peak_bikes'].max():,} велосипедов "
+          f"({top.date()}, {peak_by_day.loc[top, 'peak_hour']}:00)")
+    print(f"Средний дневной пик: {peak_by_day['peak_bikes'].mean():,.0f} велосипедов")
+    print(f"95-й перцентиль дневного пика: {peak_by_day['peak_bikes'].quantile(0.95):,.0f} велосипедов")
+
+    os.makedirs('fleet_concurrency', exist_ok=True)
+    peak_by_hour.to_csv('fleet_concurrency/peak_by_hour.csv')
+    peak_by_day.to_csv('fleet_concurrency/peak_by_day.csv')
+    hour_profile.to_csv('fleet_concurrency/peak_by_hour_of_day.csv')
+
+    print("\n✓ Результаты сохранены:")
+    print("  - fleet_concurrency/peak_by_hour.csv")
+    print("  - fleet_concurrency/peak_by_day.csv")
+    print("  - fleet_concurrency/peak_by_hour_of_day.csv")
@@ -0,0 +1,197 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from station_dim import load_station_dimension
+
+CHUNK_ROWS = 500_000
+OUTPUT_DIR = 'unit_economics_modern'
+
+MEMBER_TYPES = ['casual', 'member']
+RIDEABLE_TYPES = ['classic_bike', 'electric_bike']
+# docked_bike в выгрузках 2023 года - тот же классический велосипед
+RIDEABLE_ALIASES = {'docked_bike': 'classic_bike'}
+
+# Тарифы Divvy по годам: (тип пользователя, тип велосипеда) ->
+#   unlock       - плата за разблокировку
+#   free_minutes - минуты, включенные в поездку
+#   per_minute   - цена минуты сверх включенных
+TARIFFS = {
+    2023: {
+        ('casual', 'classic_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.18},
+        ('casual', 'electric_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.42},
+        ('member', 'classic_bike'): {'unlock': 0.00, 'free_minutes': 45, 'per_minute': 0.18},
+        ('member', 'electric_bike'): {'unlock': 0.00, 'free_minutes': 0, 'per_minute': 0.17},
+    },
+    2024: {
+        ('casual', 'classic_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.18},
+        ('casual', 'electric_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.44},
+        ('member', 'classic_bike'): {'unlock': 0.00, 'free_minutes': 45, 'per_minute': 0.18},
+        ('member', 'electric_bike'): {'unlock': 0.00, 'free_minutes': 0, 'per_minute': 0.18},
+    },
+    2025: {
+        ('casual', 'classic_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.19},
+        ('casual', 'electric_bike'): {'unlock': 1.00, 'free_minutes': 0, 'per_minute': 0.44},
+        ('member', 'classic_bike'): {'unlock': 0.00, 'free_minutes': 45, 'per_minute': 0.19},
+        ('member', 'electric_bike'): {'unlock': 0.00, 'free_minutes': 0, 'per_minute': 0.19},
+    },
+}
+
+# Годовой абонемент: ID пользователей в данных нет, поэтому плата
+# распределяется на поездки по предполагаемому числу поездок участника в год
+MEMBERSHIP_FEE = 143.90
+MEMBER_RIDES_PER_YEAR = 100
+
+# Расходы на поездку по типу велосипеда (обслуживание, зарядка/замена батарей)
+RIDE_COSTS = {
+    'classic_bike': {'maintenance_per_trip': 0.10, 'energy_per_minute': 0.00},
+    'electric_bike': {'maintenance_per_trip': 0.25, 'energy_per_minute': 0.01},
+}
+
+SUM_COLUMNS = ['rides', 'minutes', 'usage_revenue', 'membership_revenue', 'total_revenue',
+               'maintenance_cost', 'energy_cost', 'total_costs', 'profit', 'unpriced_rides']
+
+
+def tariff_arrays(tariffs=TARIFFS):
+    """Тарифы в массивах [год, тип пользователя, тип велосипеда] для выборки по индексу"""
+    years = sorted(tariffs)
+    shape = (len(years), len(MEMBER_TYPES), len(RIDEABLE_TYPES))
+    arrays = {name: np.zeros(shape) for name in ('unlock', 'free_minutes', 'per_minute')}
+    for y, year in enumerate(years):
+        for (member, rideable), tariff in tariffs[year].items():
+            for name in arrays:
+                arrays[name][y, MEMBER_TYPES.index(member), RIDEABLE_TYPES.index(rideable)] = tariff[name]
+    arrays['years'] = np.array(years)
+    return arrays
+
+
+def _codes(values, known):
+    """Индексы значений в списке known; -1 - значение, для которого нет тарифа"""
+    return pd.Index(known).get_indexer(values)
+
+
+def ride_economics(chunk, arrays):
+    """Доходы и расходы каждой поездки порции - целыми столбцами
+
+    Поездки на типе велосипеда или с типом пользователя без тарифа
+    (например, electric_scooter) не оцениваются по чужому тарифу: у них
+    нулевые суммы, и они считаются в unpriced_rides.
+    """
+    rideable = chunk['rideable_type'].replace(RIDEABLE_ALIASES)
+    r = _codes(rideable, RIDEABLE_TYPES)
+    m = _codes(chunk['member_casual'], MEMBER_TYPES)
+    priced = (r >= 0) & (m >= 0)
+    r, m = np.maximum(r, 0), np.maximum(m, 0)
+    # Годы вне таблицы тарифов считаются по ближайшему году
+    year = chunk['started_at'].astype(str).str[:4].astype(int).to_numpy()
+    y = np.clip(np.searchsorted(arrays['years'], year), 0, len(arrays['years']) - 1)
+
+    # Минуты тарифицируются с округлением вверх
+    minutes = np.ceil(chunk['ride_length_seconds'].to_numpy(dtype=float) / 60)
+    billable = np.maximum(minutes - arrays['free_minutes'][y, m, r], 0)
+    usage = arrays['unlock'][y, m, r] + billable * arrays['per_minute'][y, m, r]
+    membership = np.where(m == 1, MEMBERSHIP_FEE / MEMBER_RIDES_PER_YEAR, 0.0)
+
+    maintenance = np.array([RIDE_COSTS[t]['maintenance_per_trip'] for t in RIDEABLE_TYPES])[r]
+    energy = np.array([RIDE_COSTS[t]['energy_per_minute'] for t in RIDEABLE_TYPES])[r] * minutes
+
+    rides = pd.DataFrame({
+        'rides': 1,
+        'minutes': minutes,
+        'usage_revenue': usage,
+        'membership_revenue': membership,
+        'maintenance_cost': maintenance,
+        'energy_cost': energy,
+    }, index=chunk.index)
+    rides['total_revenue'] = rides['usage_revenue'] + rides['membership_revenue']
+    rides['total_costs'] = rides['maintenance_cost'] + rides['energy_cost']
+    rides['profit'] = rides['total_revenue'] - rides['total_costs']
+    rides[~priced] = 0
+    rides['unpriced_rides'] = (~priced).astype(np.int64)
+    return rides[SUM_COLUMNS]
+
+
+def modern_economics(csv_path='2023-2025.csv', tariffs=TARIFFS, chunk_rows=CHUNK_ROWS):
+    """Один проход по поездкам 2023-2025: суммы по типу велосипеда, станции и месяцу"""
+    arrays = tariff_arrays(tariffs)
+    parts = {'rideable_type': [], 'member_casual': [], 'station': [], 'month': []}
+
+    usecols = ['started_at', 'rideable_type', 'member_casual', 'ride_length_seconds', 'start_station_key']
+    for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunk_rows):
+        rides = ride_economics(chunk, arrays)
+        keys = {
+            'rideable_type': chunk['rideable_type'].replace(RIDEABLE_ALIASES),
+            'member_casual': chunk['member_casual'],
+            'station': chunk['start_station_key'],
+            'month': chunk['started_at'].astype(str).str[:7],
+        }
+        for dim, key in keys.items():
+            parts[dim].append(rides.groupby(key.to_numpy()).sum())
+
+    result = {}
+    for dim, tables in parts.items():
+        table = pd.concat(tables).groupby(level=0).sum()
+        table[['rides', 'unpriced_rides']] = table[['rides', 'unpriced_rides']].astype(np.int64)
+        table['revenue_per_ride'] = table['total_revenue'] / table['rides']
+        table['profit_margin'] = table['profit'] / table['total_revenue'] * 100
+        table.index.name = dim
+        result[dim] = table.round(2)
+    return result
+
+
+def with_station_names(by_station, stations):
+    """Названия станций подставляются только в отчет"""
+    by_station = by_station.copy()
+    by_station.insert(0, 'station_name', stations.station_names(by_station.index.to_numpy()))
+    return by_station
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Юнит-экономика поездок 2023-2025')
+    parser.add_argument('--data', default='2023-2025.csv')
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("=" * 100)
+    print("ЮНИТ-ЭКОНОМИКА 2023-2025: УЧАСТНИКИ/РАЗОВЫЕ, КЛАССИЧЕСКИЕ/ЭЛЕКТРО")
+    print("=" * 100)
+
+    result = modern_economics(args.data)
+    total = result['rideable_type'][SUM_COLUMNS].sum()
+
+    print(f"\nПоездок: {total['rides']:,.0f}, минут: {total['minutes']:,.0f}")
+    print(f"Доход от поездок: ${total['usage_revenue']:,.2f}")
+    print(f"Доля абонементов: ${total['membership_revenue']:,.2f}")
+    print(f"Расходы: ${total['total_costs']:,.2f}")
+    print(f"Прибыль: ${total['profit']:,.2f} ({total['profit'] / total['total_revenue'] * 100:.1f}% маржа)")
+    if total['unpriced_rides']:
+        print(f"⚠️  Без тарифа (неизвестный тип велосипеда или пользователя): {total['unpriced_rides']:,.0f} поездок "
+              f"- в суммы не вошли")
+
+    for dim, title in (('rideable_type', 'По типу велосипеда'), ('member_casual', 'По типу пользователя')):
+        print(f"\n{title}:")
+        for key, row in result[dim].iterrows():
+            if row['rides'] == 0:
+                print(f"  {key:14}: {row['unpriced_rides']:10,.0f} поездок без тарифа")
+                continue
+            print(f"  {key:14}: {row['rides']:10,.0f} поездок, ${row['revenue_per_ride']:5.2f} за поездку, "
+                  f"прибыль ${row['profit']:12,.2f} ({row['profit_margin']:.1f}%)")
+
+    by_station = with_station_names(result['station'], load_station_dimension())
+    print("\nТоп-5 станций по прибыли:")
+    for _, row in by_station.nlargest(5, 'profit').iterrows():
+        print(f"  {row['station_name']:30}: {row['rides']:8,.0f} поездок, прибыль ${row['profit']:10,.2f}")
+
+    os.makedirs(args.output, exist_ok=True)
+    result['rideable_type'].to_csv(f'{args.output}/by_rideable_type.csv')
+    result['member_casual'].to_csv(f'{args.output}/by_member_casual.csv')
+    by_station.to_csv(f'{args.output}/by_station.csv', encoding='utf-8-sig')
+    result['month'].to_csv(f'{args.output}/by_month.csv')
+
+    print(f"\n✓ Результаты сохранены в {args.output}/:")
+    print("  - by_rideable_type.csv")
+    print("  - by_member_casual.csv")
+    print("  - by_station.csv")
+    print("  - by_month.csv")
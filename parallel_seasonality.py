@@ -0,0 +1,212 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calendar_dim import TIME_PERIOD_BY_HOUR, days_ru, months_ru, seasons_by_month, time_order
+from column_store import STORE_DIR, open_column_store
+from quantile_sketches import build_sketches, merge_sketches, sketch_quantiles
+
+# Отдельная папка: здесь только четыре базовые таблицы, без праздников, куба и
+# квантилей по типам пользователей, и их нельзя смешивать с полным набором
+# seasons_till_2019.py в seasonality_analysis/
+OUTPUT_DIR = 'seasonality_analysis_parallel'
+
+# Счетчики, из которых собираются все таблицы: складываются между частями
+COUNTERS = ['rows', 'trips', 'durations', 'duration_sum', 'subscribers']
+
+
+def _partition_rows(columns, by):
+    """Делим строки хранилища на части по году или месяцу
+
+    Если поездки отсортированы по времени, части - непрерывные срезы
+    (без копирования); иначе каждая часть отбирается маской в процессе.
+    """
+    start = columns['starttime']
+    dt = start.view('datetime64[s]')
+    unit = 'datetime64[Y]' if by == 'year' else 'datetime64[M]'
+    periods = np.unique(dt.astype(unit))
+
+    if np.all(start[1:] >= start[:-1]):
+        bounds = np.searchsorted(dt, periods.astype('datetime64[s]'))
+        bounds = np.r_[bounds, len(start)]
+        return [('slice', int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+    return [('period', unit, int(p.astype(np.int64))) for p in periods]
+
+
+def partial_aggregates(task):
+    """Частичные агрегаты одной части: по месяцам и по (день недели × час)
+
+    Каждый процесс сам открывает хранилище через mmap - данные между
+    процессами не пересылаются.
+    """
+    folder, part = task
+    columns, meta = open_column_store(folder)
+
+    if part[0] == 'slice':
+        rows = slice(part[1], part[2])
+    else:
+        dt = columns['starttime'].view('datetime64[s]')
+        rows = np.flatnonzero(dt.astype(part[1]).astype(np.int64) == part[2])
+
+    start = np.asarray(columns['starttime'][rows])
+    duration = np.asarray(columns['tripduration'][rows])
+    has_trip_id = np.asarray(columns['trip_id'][rows]) >= 0
+    subscriber_code = meta['vocabularies']['usertype'].index('Subscriber') + 1
+    is_subscriber = np.asarray(columns['usertype'][rows]) == subscriber_code
+
+    dt = start.view('datetime64[s]')
+    month = dt.astype('datetime64[M]').astype(np.int64) % 12
+    weekday = (dt.astype('datetime64[D]').astype(np.int64) + 3) % 7  # 1970-01-01 - четверг
+    hour = start // 3600 % 24
+    has_duration = ~np.isnan(duration)
+
+    def counters(keys, size):
+        return {
+            'rows': np.bincount(keys, minlength=size),
+            'trips': np.bincount(keys, weights=has_trip_id, minlength=size),
+            'durations': np.bincount(keys, weights=has_duration, minlength=size),
+            'duration_sum': np.bincount(keys, weights=np.where(has_duration, duration, 0), minlength=size),
+            'subscribers': np.bincount(keys, weights=is_subscriber, minlength=size),
+        }
+
+    result = {
+        'month': counters(month, 12),
+        'weekday_hour': counters(weekday * 24 + hour, 7 * 24),
+        # Скетчи длительности для p50/p90/p99 - тоже складываются между частями
+        'month_sketch': build_sketches(month, duration, 12),
+        'weekday_hour_sketch': build_sketches(weekday * 24 + hour, duration, 7 * 24),
+        'first_start': np.full(12, np.iinfo(np.int64).max),
+        'last_start': np.full(12, np.iinfo(np.int64).min),
+    }
+    np.minimum.at(result['first_start'], month, start)
+    np.maximum.at(result['last_start'], month, start)
+    return result
+
+
+def combine(partials):
+    """Сливаем частичные агрегаты: суммы и скетчи складываются, границы - min/max"""
+    total = partials[0]
+    for part in partials[1:]:
+        for dim in ('month', 'weekday_hour'):
+            for name in COUNTERS:
+                total[dim][name] = total[dim][name] + part[dim][name]
+            total[f'{dim}_sketch'] = total[f'{dim}_sketch'] + part[f'{dim}_sketch']
+        total['first_start'] = np.minimum(total['first_start'], part['first_start'])
+        total['last_start'] = np.maximum(total['last_start'], part['last_start'])
+    return total
+
+
+def _summary(counts):
+    """Метрики таблиц сезонности из счетчиков (как в seasons_till_2019.py)"""
+    counts = {name: pd.Series(values) for name, values in counts.items()}
+    return pd.DataFrame({
+        'total_trips': counts['trips'].astype(np.int64),
+        'avg_duration': counts['duration_sum'] / counts['durations'],
+        'subscriber_pct': counts['subscribers'] / counts['rows'] * 100,
+    })
+
+
+def _grouped(counts, keys):
+    """Складываем счетчики по произвольному ключу (месяц -> сезон и т.п.)"""
+    return {name: pd.Series(values).groupby(keys).sum() for name, values in counts.items()}
+
+
+def build_tables(total):
+    """Таблицы monthly/seasonal/weekday/hourly в том же виде, что и однопоточные"""
+    month_counts = total['month']
+    present = month_counts['rows'] > 0
+
+    # Пустые группы groupby не создает - оставляем только встречающиеся
+    months = pd.DataFrame({'month_num': np.arange(1, 13)})
+    months['month_ru'] = months['month_num'].map(months_ru)
+    months['season_ru'] = months['month_num'].map(seasons_by_month)
+    monthly = pd.concat([months, _summary(month_counts)], axis=1)[present]
+    monthly = monthly.sort_values(['month_num', 'month_ru', 'season_ru']).round(2).reset_index(drop=True)
+    monthly = monthly.sort_values('month_num')
+    month_quantiles = sketch_quantiles(total['month_sketch']).round(2)
+    month_quantiles.index = months['month_num']
+    monthly = monthly.join(month_quantiles, on='month_num')
+
+    seasons = months['season_ru'][present].to_numpy()
+    season_counts = {name: values[present] for name, values in month_counts.items()}
+    seasonal = _summary(_grouped(season_counts, seasons))
+    first = pd.Series(total['first_start'][present]).groupby(seasons).min()
+    last = pd.Series(total['last_start'][present]).groupby(seasons).max()
+    seasonal['days_in_data'] = ((last - first) // 86400).astype(np.int64)
+    seasonal = seasonal.sort_index().round(2)
+    seasonal.index.name = 'season_ru'
+    seasonal['avg_daily_trips'] = (seasonal['total_trips'] / seasonal['days_in_data']).round(0)
+    seasonal = seasonal.sort_values('total_trips', ascending=False)
+    season_sketch = merge_sketches(total['month_sketch'][present], seasons)
+    seasonal = seasonal.join(sketch_quantiles(season_sketch).round(2).set_index(season_sketch.index))
+
+    weekday_hour = total['weekday_hour']
+    weekday_keys = np.repeat(np.arange(7), 24)
+    weekday_counts = _grouped(weekday_hour, weekday_keys)
+    weekday = pd.DataFrame({
+        'day_of_week_ru': [days_ru[d] for d in range(7)],
+        'is_weekend': [d in (5, 6) for d in range(7)],
+    })
+    weekday = pd.concat([weekday, _summary(weekday_counts)], axis=1)[weekday_counts['rows'].to_numpy() > 0]
+    weekday = weekday.sort_values(['day_of_week_ru', 'is_weekend']).round(2).reset_index(drop=True)
+    weekday = weekday.sort_values('total_trips', ascending=False)
+    weekday_sketch = merge_sketches(total['weekday_hour_sketch'], weekday_keys)
+    weekday_quantiles = sketch_quantiles(weekday_sketch).round(2)
+    weekday_quantiles.index = [days_ru[d] for d in weekday_sketch.index]
+    weekday = weekday.join(weekday_quantiles, on='day_of_week_ru')
+
+    periods = np.tile(TIME_PERIOD_BY_HOUR, 7)
+    hourly = _summary(_grouped(weekday_hour, periods))
+    hourly = hourly[_grouped(weekday_hour, periods)['rows'] > 0].sort_index().round(2)
+    hourly.index.name = 'time_period'
+    hourly = hourly.reindex(time_order)
+    period_sketch = merge_sketches(total['weekday_hour_sketch'], periods)
+    hourly = hourly.join(sketch_quantiles(period_sketch).round(2).set_index(period_sketch.index))
+
+    heatmap = pd.DataFrame(weekday_hour['rows'].reshape(7, 24), index=[days_ru[i] for i in range(7)])
+    return monthly, seasonal, weekday, hourly, heatmap
+
+
+def run_parallel(folder=STORE_DIR, by='year', workers=None):
+    """Разбиваем данные на части, считаем их в пуле процессов и сливаем"""
+    columns, _ = open_column_store(folder)
+    parts = _partition_rows(columns, by)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partials = list(executor.map(partial_aggregates, [(folder, part) for part in parts]))
+    return build_tables(combine(partials)), len(parts)
+
+
+def save_tables(monthly, seasonal, weekday, hourly, folder=OUTPUT_DIR):
+    """Сохраняем таблицы в те же файлы и в том же формате, что seasons_till_2019.py"""
+    os.makedirs(folder, exist_ok=True)
+    monthly.to_csv(f'{folder}/monthly_analysis.csv', index=False, encoding='utf-8-sig')
+    seasonal.to_csv(f'{folder}/seasonal_analysis.csv', encoding='utf-8-sig')
+    weekday.to_csv(f'{folder}/weekday_analysis.csv', index=False, encoding='utf-8-sig')
+    hourly.to_csv(f'{folder}/hourly_analysis.csv', encoding='utf-8-sig')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Параллельный расчет таблиц сезонности')
+    parser.add_argument('--store', default=STORE_DIR)
+    parser.add_argument('--by', choices=['year', 'month'], default='year')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ПАРАЛЛЕЛЬНЫЙ АНАЛИЗ СЕЗОННОСТИ")
+    print("=" * 70)
+
+    (monthly, seasonal, weekday, hourly, heatmap), n_parts = run_parallel(args.store, args.by, args.workers)
+    save_tables(monthly, seasonal, weekday, hourly, args.output)
+
+    print(f"Частей ({args.by}): {n_parts}, процессов: {args.workers or os.cpu_count()}")
+    print(f"Всего поездок: {monthly['total_trips'].sum():,}")
+    print(f"\n✓ Таблицы сохранены в {args.output}/:")
+    print("  - monthly_analysis.csv")
+    print("  - seasonal_analysis.csv")
+    print("  - weekday_analysis.csv")
+    print("  - hourly_analysis.csv")
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import load_validated
+from unit_economics import (
+    BIKE_PRICE_AVERAGE,
+    DEFAULT_MAINTENANCE,
+    INSURANCE_PER_MONTH,
+    MAINTENANCE_PER_TRIP,
+    MARKETING_SHARE,
+    STORAGE_PER_MONTH,
+    calculate_trip_revenue_vectorized,
+    categories_order,
+    category_prices,
+    classify_bikes,
+)
+
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def calculate_payback(df, bike_categories):
+    """Срок окупаемости каждого велосипеда
+
+    Поездки сортируются один раз по (bikeid, starttime). Накопленный
+    доход за вычетом текущих расходов (обслуживание, маркетинг, страховка
+    и хранение) считается групповым cumsum; точка безубыточности - первая
+    поездка, на которой баланс покрыл цену велосипеда. Доход от подписок
+    не распределяется по поездкам, поэтому оценка консервативная.
+    """
+    trips = df[['bikeid', 'starttime', 'tripduration', 'usertype']].sort_values(
+        ['bikeid', 'starttime'], kind='stable', ignore_index=True)
+
+    categories = bike_categories.set_index('bikeid')
+    category = trips['bikeid'].map(categories['category'])
+    bike_price = category.map(category_prices).fillna(BIKE_PRICE_AVERAGE).to_numpy()
+    maintenance = category.map(MAINTENANCE_PER_TRIP).fillna(DEFAULT_MAINTENANCE).to_numpy()
+
+    # Чистый доход поездки: выручка минус маркетинг и обслуживание
+    revenue = calculate_trip_revenue_vectorized(trips).to_numpy()
+    net_trip = revenue * (1 - MARKETING_SHARE) - maintenance
+
+    bikes = trips['bikeid'].to_numpy()
+    starts = trips['starttime'].to_numpy()
+    cumulative_net = pd.Series(net_trip).groupby(bikes, sort=False).cumsum().to_numpy()
+
+    # Страховка и хранение начисляются по дням с первой поездки велосипеда
+    first_trip = pd.Series(starts).groupby(bikes, sort=False).transform('first').to_numpy()
+    days_active = (starts - first_trip) / np.timedelta64(1, 'D')
+    fixed_costs = (INSURANCE_PER_MONTH + STORAGE_PER_MONTH) * days_active / 30
+    balance = cumulative_net - fixed_costs
+
+    # Векторный поиск: первая позиция каждого велосипеда, где баланс >= цены
+    reached = np.flatnonzero(balance >= bike_price)
+    _, first_reached = np.unique(bikes[reached], return_index=True)
+    break_even_rows = reached[first_reached]
+
+    # Итог по каждому велосипеду берем с последней поездки
+    last_rows = np.flatnonzero(np.r_[bikes[1:] != bikes[:-1], True])
+    result = pd.DataFrame({
+        'bike_id': bikes[last_rows],
+        'first_trip': first_trip[last_rows],
+        'last_trip': starts[last_rows],
+        'bike_price': bike_price[last_rows],
+        'final_balance': balance[last_rows],
+    })
+    result['category'] = result['bike_id'].map(categories['category']).fillna('Неизвестно')
+    result['flavor'] = result['bike_id'].map(categories['flavor']).fillna('Неизвестно')
+
+    break_even = pd.Series(starts[break_even_rows], index=bikes[break_even_rows])
+    result['break_even_date'] = result['bike_id'].map(break_even)
+    result['paid_back'] = result['break_even_date'].notna()
+    result['payback_days'] = (result['break_even_date'] - result['first_trip']).dt.days
+    result['payback_months'] = (result['payback_days'] / DAYS_PER_MONTH).round(1)
+
+    return result
+
+
+def payback_distribution(payback_df, by):
+    """Распределение срока окупаемости по категориям или ароматам"""
+    grouped = payback_df.groupby(by)
+    distribution = pd.DataFrame({
+        'bikes': grouped.size(),
+        'paid_back_pct': grouped['paid_back'].mean() * 100,
+        'mean_months': grouped['payback_months'].mean(),
+        'p25_months': grouped['payback_months'].quantile(0.25),
+        'median_months': grouped['payback_months'].median(),
+        'p75_months': grouped['payback_months'].quantile(0.75),
+    }).round(1)
+    return distribution
+
+
+if __name__ == '__main__':
+    print("=" * 100)
+    print("АНАЛИЗ СРОКА ОКУПАЕМОСТИ ВЕЛОСИПЕДОВ")
+    print("=" * 100)
+
+    df = load_validated('2013-2019.csv')
+    df['starttime'] = pd.to_datetime(df['starttime'])
+    print(f"Всего поездок: {len(df):,}")
+
+    bike_categories = classify_bikes(df)
+    payback_df = calculate_payback(df, bike_categories)
+
+    by_category = payback_distribution(payback_df, 'category').reindex(
+        [c for c in categories_order if c in payback_df['category'].unique()])
+    by_flavor = payback_distribution(payback_df, 'flavor')
+
+    paid_back = payback_df[payback_df['paid_back']]
+    print(f"\nОкупились: {len(paid_back):,} из {len(payback_df):,} велосипедов "
+          f"({len(paid_back) / len(payback_df) * 100:.1f}%)")
+    print(f"Средний срок окупаемости: {paid_back['payback_months'].mean():.1f} месяцев")
+    print(f"Медианный срок окупаемости: {paid_back['payback_months'].median():.1f} месяцев")
+
+    print("\nПо категориям:")
+    print(by_category)
+    print("\nПо ароматам:")
+    print(by_flavor)
+
+    os.makedirs('unit_economics_v2', exist_ok=True)
+    payback_df.to_csv('unit_economics_v2/payback_by_bike.csv', index=False)
+    by_category.to_csv('unit_economics_v2/payback_by_category.csv')
+    by_flavor.to_csv('unit_economics_v2/payback_by_flavor.csv')
+
+    print("\n✓ Результаты сохранены:")
+    print("  - unit_economics_v2/payback_by_bike.csv")
+    print("  - unit_economics_v2/payback_by_category.csv")
+    print("  - unit_economics_v2/payback_by_flavor.csv")
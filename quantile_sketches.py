@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Скетч квантилей с логарифмическими корзинами (DDSketch): каждое значение
+# попадает в корзину ceil(log_gamma(x)), оценка квантиля отличается от точной
+# не более чем на RELATIVE_ACCURACY. Скетч - просто вектор счетчиков корзин,
+# поэтому скетчи частей данных и процессов сливаются обычным сложением.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+# Диапазон длительностей: от 1 секунды до ~3 лет, все корзины фиксированы
+MIN_VALUE = 1.0
+MAX_VALUE = 1e8
+N_BUCKETS = int(np.ceil(np.log(MAX_VALUE) / np.log(GAMMA))) + 1
+
+QUANTILES = {'p50_duration': 0.50, 'p90_duration': 0.90, 'p99_duration': 0.99}
+
+
+def bucket_index(values):
+    """Номер корзины для каждого значения (NaN -> -1)"""
+    values = np.asarray(values, dtype=float)
+    clipped = np.clip(values, MIN_VALUE, MAX_VALUE)
+    index = np.ceil(np.log(clipped) / np.log(GAMMA)).astype(np.int64)
+    return np.where(np.isnan(values), -1, index)
+
+
+def build_sketches(keys, values, n_segments, weights=None):
+    """Скетчи для n_segments сегментов за один проход: матрица сегмент × корзина
+
+    keys - номер сегмента каждой строки (0..n_segments-1).
+    weights - вес строки (на выборке - вес страты), тогда в корзинах суммы весов.
+    """
+    keys = np.asarray(keys)
+    buckets = bucket_index(values)
+    valid = (buckets >= 0) & (keys >= 0)
+    flat = keys[valid] * N_BUCKETS + buckets[valid]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[valid]
+    return np.bincount(flat, weights, minlength=n_segments * N_BUCKETS).reshape(n_segments, N_BUCKETS)
+
+
+def merge_sketches(sketches, groups):
+    """Сливаем скетчи сегментов в группы (месяцы -> сезоны и т.п.)"""
+    return pd.DataFrame(sketches).groupby(groups).sum()
+
+
+def sketch_quantiles(sketches, quantiles=QUANTILES):
+    """Оценки квантилей по матрице скетчей, векторно для всех сегментов"""
+    sketches = np.asarray(sketches)
+    cumulative = np.cumsum(sketches, axis=1)
+    totals = cumulative[:, -1]
+    # Середина корзины в смысле относительной ошибки
+    bucket_values = 2 * GAMMA ** np.arange(N_BUCKETS) / (GAMMA + 1)
+
+    result = {}
+    for name, q in quantiles.items():
+        rank = q * (totals - 1)
+        bucket = (cumulative > rank[:, None]).argmax(axis=1)
+        result[name] = np.where(totals > 0, bucket_values[bucket], np.nan)
+    return pd.DataFrame(result)
+
+
+def segment_quantiles(keys, values, quantiles=QUANTILES, weights=None):
+    """p50/p90/p99 по произвольному ключу сегмента; индекс - значения ключа"""
+    codes, uniques = pd.factorize(pd.Series(keys), sort=True)
+    sketches = build_sketches(codes, values, len(uniques), weights)
+    result = sketch_quantiles(sketches, quantiles).round(2)
+    result.index = uniques
+    return result
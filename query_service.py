@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from calendar_dim import gather
+
+# Предагрегированные таблицы, которые сервис загружает при старте
+TABLE_FILES = {
+    'cube': 'seasonality_analysis/seasonality_cube.csv',
+    'monthly': 'seasonality_analysis/monthly_analysis.csv',
+    'seasonal': 'seasonality_analysis/seasonal_analysis.csv',
+    'weekday': 'seasonality_analysis/weekday_analysis.csv',
+    'hourly': 'seasonality_analysis/hourly_analysis.csv',
+    'bikes': 'unit_economics_enhanced/bike_economics_detailed.csv',
+    'categories': 'unit_economics_enhanced/category_summary.csv',
+}
+
+# Служебные параметры запроса; все остальные считаются фильтрами по столбцам
+RESERVED_PARAMS = {'table', 'group_by', 'metrics', 'agg'}
+AGGREGATIONS = {'sum', 'mean', 'median', 'min', 'max', 'count'}
+# Агрегации, которые имеют смысл и для текстовых столбцов
+TEXT_AGGREGATIONS = {'min', 'max', 'count'}
+
+CACHE_SIZE = 256
+LATENCY_WINDOW = 10_000
+
+
+def build_cube(df, calendar=None):
+    """Куб поездок: год × месяц × день недели × час × тип пользователя
+
+    Из него сервис отвечает на срезы вроде "один месяц по типам
+    пользователей" без повторного прохода по исходным поездкам.
+    С календарем (calendar_dim.py) признаки берутся по ключу даты.
+    """
+    if calendar is not None:
+        keys = [pd.Series(gather(calendar, df['date_key'], col), index=df.index, name=name)
+                for col, name in (('year', 'year'), ('month', 'month'), ('weekday', 'weekday'))]
+        keys.append(df['hour'].rename('hour'))
+    else:
+        keys = [
+            df['starttime'].dt.year.rename('year'),
+            df['starttime'].dt.month.rename('month'),
+            df['starttime'].dt.dayofweek.rename('weekday'),
+            df['starttime'].dt.hour.rename('hour'),
+        ]
+    if 'sample_weight' in df:
+        # Выборка (sampling.stratified_sample): поездки и длительность - оценки по совокупности
+        weighted = pd.DataFrame({'trips': df['sample_weight'], 'duration_sum': df['tripduration'] * df['sample_weight']})
+        cube = weighted.groupby(keys + [df['usertype']]).sum()
+    else:
+        cube = df.groupby(keys + [df['usertype']]).agg(trips=('tripduration', 'size'), duration_sum=('tripduration', 'sum'))
+    return cube.reset_index()
+
+
+def load_tables(files=TABLE_FILES):
+    """Загружаем все доступные таблицы один раз"""
+    tables = {}
+    for name, path in files.items():
+        if os.path.exists(path):
+            tables[name] = pd.read_csv(path, encoding='utf-8-sig')
+    return tables
+
+
+class LRUCache:
+    """Ограниченный кэш результатов: при переполнении вытесняется самый старый запрос"""
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+
+def _coerce(values, series):
+    """Приводим значения фильтра из URL к типу столбца"""
+    if pd.api.types.is_bool_dtype(series):
+        return [v.lower() in ('1', 'true', 'yes') for v in values]
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(values).tolist()
+    return values
+
+
+def run_query(tables, params):
+    """Фильтр + группировка по одной таблице
+
+    params: table, group_by (через запятую), metrics (через запятую),
+    agg (sum/mean/median/min/max/count), остальные - фильтры column=v1,v2.
+    """
+    name = params.get('table', 'cube')
+    if name not in tables:
+        raise ValueError(f"Неизвестная таблица: {name}. Доступны: {', '.join(sorted(tables))}")
+    frame = tables[name]
+
+    mask = np.ones(len(frame), dtype=bool)
+    for col, raw in params.items():
+        if col in RESERVED_PARAMS:
+            continue
+        if col not in frame.columns:
+            raise ValueError(f"Нет столбца '{col}' в таблице {name}")
+        mask &= frame[col].isin(_coerce(raw.split(','), frame[col])).to_numpy()
+    frame = frame[mask]
+
+    group_by = [c for c in params.get('group_by', '').split(',') if c]
+    agg = params.get('agg', 'sum')
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Неизвестная агрегация: {agg}")
+
+    metrics = [c for c in params.get('metrics', '').split(',') if c]
+    if not metrics:
+        metrics = [c for c in frame.select_dtypes('number').columns if c not in group_by]
+    missing = [c for c in group_by + metrics if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Нет столбцов {missing} в таблице {name}")
+    if agg not in TEXT_AGGREGATIONS:
+        text = [c for c in metrics if not pd.api.types.is_numeric_dtype(frame[c])]
+        if text:
+            raise ValueError(f"Агрегация {agg} только для числовых столбцов, а {text} - текстовые")
+
+    if group_by:
+        result = frame.groupby(group_by)[metrics].agg(agg).reset_index()
+    else:
+        result = frame[metrics].agg(agg).to_frame().T
+
+    # Средняя длительность по кубу считается из сумм, а не усреднением средних
+    if name == 'cube' and agg == 'sum' and {'trips', 'duration_sum'} <= set(result.columns):
+        result['avg_duration'] = (result['duration_sum'] / result['trips']).round(2)
+
+    return json.loads(result.to_json(orient='records', force_ascii=False))
+
+
+class QueryService:
+    """Таблицы, кэш и статистика задержек одного процесса"""
+
+    def __init__(self, tables, cache_size=CACHE_SIZE):
+        self.tables = tables
+        self.cache = LRUCache(cache_size)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+
+    def query(self, params):
+        start = time.perf_counter()
+        key = tuple(sorted(params.items()))
+        rows = self.cache.get(key)
+        cached = rows is not None
+        if not cached:
+            rows = run_query(self.tables, params)
+            self.cache.put(key, rows)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies.append(elapsed_ms)
+        return {'rows': rows, 'cached': cached, 'elapsed_ms': round(elapsed_ms, 3)}
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+        return {
+            'queries': int(len(latencies)),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            'cache_size': len(self.cache.items),
+            'cache_max_size': self.cache.max_size,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+        }
+
+    def describe(self):
+        return {name: list(frame.columns) for name, frame in self.tables.items()}
+
+
+def make_handler(service):
+    """HTTP-обработчик: /query, /stats, /tables"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # Кириллица без %-кодирования приходит как latin-1 - восстанавливаем UTF-8
+            url = urlparse(self.path.encode('iso-8859-1').decode('utf-8', errors='replace'))
+            params = dict(parse_qsl(url.query))
+            try:
+                if url.path == '/query':
+                    self._reply(200, service.query(params))
+                elif url.path == '/stats':
+                    self._reply(200, service.stats())
+                elif url.path == '/tables':
+                    self._reply(200, service.describe())
+                else:
+                    self._reply(404, {'error': f'Неизвестный путь: {url.path}'})
+            except (ValueError, TypeError, KeyError) as e:
+                # Любая ошибка разбора запроса - ответ 400, а не оборванное соединение
+                self._reply(400, {'error': str(e)})
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Локальный сервис запросов к агрегатам')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    tables = load_tables()
+    if not tables:
+        raise SystemExit("Нет ни одной таблицы: сначала запустите seasons_till_2019.py и economy_till_2019.py")
+
+    service = QueryService(tables, cache_size=args.cache_size)
+    print("=" * 70)
+    print("СЕРВИС ЗАПРОСОВ К АГРЕГАТАМ")
+    print("=" * 70)
+    for name, frame in tables.items():
+        print(f"  {name:12}: {len(frame):8,} строк")
+    print(f"\nАдрес: http://{args.host}:{args.port}")
+    print("Пример: /query?table=cube&month=7&group_by=usertype&metrics=trips,duration_sum")
+    print("Задержки и кэш: /stats")
+
+    ThreadingHTTPServer((args.host, args.port), make_handler(service)).serve_forever()
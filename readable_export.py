@@ -0,0 +1,65 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Сколько строк конвертируем и пишем за один раз
+CHUNK_ROWS = 500_000
+
+# BOM в начале файла, как у encoding='utf-8-sig', чтобы Excel понимал кириллицу
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+def _schema(df, columns):
+    """Arrow-схема по dtypes столбцов, а не по значениям первой порции
+
+    object-столбец, пустой в первой порции, получил бы тип null, и следующая
+    порция с текстом не записалась бы. Поэтому object всегда пишется строкой.
+    """
+    schema = pa.Schema.from_pandas(df.head(0)[columns], preserve_index=False).remove_metadata()
+    for i, col in enumerate(columns):
+        if pd.api.types.is_object_dtype(df[col].dtype):
+            schema = schema.set(i, pa.field(col, pa.string()))
+    return schema
+
+
+def _to_batch(df, columns, start, stop, schema):
+    """Собираем Arrow-пачку из среза столбцов без копирования всего DataFrame"""
+    arrays = [pa.array(df[col].iloc[start:stop], type=schema.field(i).type, from_pandas=True)
+              for i, col in enumerate(columns)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_readable(df, columns, csv_path, parquet_path=None, compression=None,
+                    chunk_rows=CHUNK_ROWS):
+    """Пишем читаемый датасет в CSV (и при желании в Parquet) по частям
+
+    compression - кодек для CSV ('gzip', 'bz2', 'zstd' и т.д.) или None.
+    Столбцы берутся из df напрямую, без df[columns].copy(); форматирование
+    строк CSV выполняет многопоточный писатель Arrow.
+    Возвращает количество записанных строк.
+    """
+    if compression:
+        sink = pa.CompressedOutputStream(csv_path, compression)
+    else:
+        sink = pa.OSFile(csv_path, 'wb')
+    sink.write(UTF8_BOM)
+
+    schema = _schema(df, columns)
+
+    csv_writer = pa_csv.CSVWriter(sink, schema)
+    parquet_writer = pq.ParquetWriter(parquet_path, schema, compression='zstd') if parquet_path else None
+
+    try:
+        for start in range(0, len(df), chunk_rows):
+            batch = _to_batch(df, columns, start, start + chunk_rows, schema)
+            csv_writer.write_batch(batch)
+            if parquet_writer is not None:
+                parquet_writer.write_batch(batch)
+    finally:
+        csv_writer.close()
+        sink.close()
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    return len(df)
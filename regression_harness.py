@@ -0,0 +1,387 @@
+"""Проверка, что ускорения не меняют результаты и не замедляют этапы
+
+    python regression_harness.py                     # сравнить с эталонами и базовым временем
+    python regression_harness.py --update-golden     # пересохранить эталонные таблицы
+    python regression_harness.py --update-baseline   # пересохранить базовое время и память
+    python regression_harness.py --stages bike_economics --max-slowdown 50
+
+Каждый этап запускается на фиксированном синтетическом наборе поездок
+(regression/fixtures/), его таблицы сравниваются с regression/golden/
+с допуском, а время и пиковая память - с regression/baseline.json.
+Время - медиана нескольких запусков, и сравнивается оно не в секундах, а в
+долях эталонной нагрузки, измеренной в том же запуске: так проверка не
+зависит от машины и ее загрузки. Короткие этапы на время не проверяются.
+Память считается tracemalloc в основном процессе: выделения рабочих
+процессов пула (parallel_seasonality) в пик не попадают.
+
+В фикстуре есть строки, которые DataValidator отправляет в карантин; все
+этапы читают ее через проверку, а таблицы parallel_seasonality сверяются
+с таблицами seasons_till_2019.py того же запуска.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+REGRESSION_DIR = os.path.join(REPO_DIR, 'regression')
+FIXTURE = os.path.join(REGRESSION_DIR, 'fixtures', 'trips_2013_2019.csv')
+GOLDEN_DIR = os.path.join(REGRESSION_DIR, 'golden')
+BASELINE = os.path.join(REGRESSION_DIR, 'baseline.json')
+
+FIXTURE_ROWS = 3000
+FIXTURE_SEED = 2019
+
+# Допуски сравнения чисел и порог замедления (в процентах)
+RTOL = 1e-6
+ATOL = 1e-6
+MAX_SLOWDOWN_PCT = 50
+# Этапы короче этого порога не проверяются на замедление: у этапов в десятки
+# миллисекунд разброс между запусками сам доходит до 50%
+MIN_CHECKED_SECONDS = 0.5
+REPEATS = 5
+# Рост пиковой памяти: в процентах от базы, но не меньше MIN_MEMORY_GROWTH_MB
+MAX_MEMORY_GROWTH_PCT = 25
+MIN_MEMORY_GROWTH_MB = 1.0
+# Запись базы с временем эталонной нагрузки
+REFERENCE = '_reference'
+
+# Таблицы, которые должны совпадать у двух этапов одного запуска (если запущены оба)
+EQUIVALENT = [
+    ('parallel_seasonality', 'seasonality_script',
+     ['monthly_analysis', 'seasonal_analysis', 'weekday_analysis', 'hourly_analysis']),
+]
+
+
+def make_fixture(rows=FIXTURE_ROWS, seed=FIXTURE_SEED):
+    """Синтетические поездки в схеме 2013-2019.csv и в конце - строки для карантина"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2013-06-27') + pd.to_timedelta(rng.integers(0, 6 * 365 * 86400, rows), unit='s')
+    start = start.sort_values()
+    duration = np.round(rng.lognormal(6.5, 0.8, rows).clip(61, 86_000), 1)
+    from_station = rng.integers(1, 41, rows)
+    to_station = rng.integers(1, 41, rows)
+    trips = pd.DataFrame({
+        'trip_id': np.arange(1, rows + 1),
+        'starttime': start.strftime('%Y-%m-%d %H:%M:%S'),
+        'stoptime': (start + pd.to_timedelta(duration, unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+        'bikeid': rng.integers(1, 121, rows),
+        'tripduration': duration,
+        'from_station_id': from_station,
+        'from_station_name': [f'Station {i}' for i in from_station],
+        'to_station_id': to_station,
+        'to_station_name': [f'Station {i}' for i in to_station],
+        'usertype': rng.choice(['Subscriber', 'Customer'], rows, p=[0.75, 0.25]),
+        'gender': rng.choice(['Male', 'Female'], rows, p=[0.7, 0.3]),
+        'birthyear': rng.integers(1950, 2002, rows).astype(float),
+    })
+    return pd.concat([trips, quarantined_rows(trips)], ignore_index=True)
+
+
+def quarantined_rows(trips):
+    """По строке на каждое правило карантина 'legacy' (копии настоящих поездок)"""
+    # Int64, чтобы пустой bikeid не превратил весь столбец в float
+    bad = trips.iloc[[10, 20, 30, 40, 50]].astype({'bikeid': 'Int64'})
+    bad['trip_id'] = np.arange(len(trips) + 1, len(trips) + 1 + len(bad))
+    bad.iloc[0, bad.columns.get_loc('tripduration')] = 30.0                    # короче 60 сек
+    bad.iloc[1, bad.columns.get_loc('tripduration')] = 100_000.0               # длиннее суток
+    bad.iloc[2, bad.columns.get_loc('bikeid')] = pd.NA                         # пустой обязательный столбец
+    bad.iloc[3, bad.columns.get_loc('stoptime')] = '2013-01-01 00:00:00'       # окончание раньше начала
+    bad.iloc[4, bad.columns.get_loc('trip_id')] = trips['trip_id'].iloc[0]     # повтор trip_id
+    return bad
+
+
+@contextlib.contextmanager
+def _quiet_in(folder):
+    """Шаг в папке folder без вывода: отчеты и карантин DataValidator не пишутся в репозиторий"""
+    previous = os.getcwd()
+    os.chdir(folder)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.chdir(previous)
+
+
+@functools.lru_cache(maxsize=None)
+def _validated_fixture():
+    from data_validation import load_validated
+
+    if not os.path.exists(FIXTURE):
+        os.makedirs(os.path.dirname(FIXTURE), exist_ok=True)
+        make_fixture().to_csv(FIXTURE, index=False)
+    workdir = tempfile.mkdtemp(prefix='regression_')
+    try:
+        with _quiet_in(workdir):
+            return load_validated(FIXTURE)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def load_fixture():
+    """Фикстура после DataValidator - как ее читают скрипты анализа"""
+    return _validated_fixture().copy()
+
+
+# ---------- Этапы: каждый возвращает {имя таблицы: DataFrame} ----------
+
+def stage_trip_revenue():
+    from unit_economics import calculate_trip_revenue_improved, calculate_trip_revenue_vectorized
+
+    df = load_fixture()
+    return {'trip_revenue': pd.DataFrame({
+        'trip_id': df['trip_id'],
+        'revenue': df.apply(calculate_trip_revenue_improved, axis=1),
+        'revenue_vectorized': calculate_trip_revenue_vectorized(df),
+    })}
+
+
+def stage_classify_bikes():
+    from unit_economics import classify_bikes
+
+    return {'bike_categories': classify_bikes(load_fixture())}
+
+
+def stage_bike_economics():
+    from unit_economics import (build_category_metrics, calculate_bike_economics,
+                                calculate_trip_revenue_vectorized, category_prices, classify_bikes)
+
+    df = load_fixture()
+    df['trip_revenue'] = calculate_trip_revenue_vectorized(df)
+    bike_econ_df = calculate_bike_economics(df, classify_bikes(df), category_prices)
+    return {
+        'bike_economics': bike_econ_df,
+        'category_metrics': build_category_metrics(bike_econ_df).reset_index(),
+    }
+
+
+def _run_in_sandbox(script, folder, files):
+    """Запускаем скрипт анализа во временной папке на фикстуре и читаем его CSV"""
+    workdir = tempfile.mkdtemp(prefix='regression_')
+    previous = os.getcwd()
+    try:
+        shutil.copy(FIXTURE, os.path.join(workdir, '2013-2019.csv'))
+        os.chdir(workdir)
+        os.environ['MPLBACKEND'] = 'Agg'
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(os.path.join(REPO_DIR, script), run_name='__main__')
+            import matplotlib.pyplot as plt
+            plt.close('all')
+        return {name: pd.read_csv(os.path.join(folder, name + '.csv'), encoding='utf-8-sig') for name in files}
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def stage_seasonality_script():
+    return _run_in_sandbox('seasons_till_2019.py', 'seasonality_analysis', [
+        'monthly_analysis', 'seasonal_analysis', 'weekday_analysis', 'hourly_analysis',
+        'usertype_duration_quantiles', 'holiday_analysis', 'seasonality_cube',
+    ])
+
+
+def stage_economy_script():
+    return _run_in_sandbox('economy_till_2019.py', 'unit_economics_enhanced', [
+        'bike_economics_detailed', 'category_summary', 'category_metrics', 'sensitivity_analysis',
+    ])
+
+
+def stage_parallel_seasonality():
+    from column_store import build_column_store
+    from parallel_seasonality import run_parallel
+
+    folder = tempfile.mkdtemp(prefix='regression_store_')
+    try:
+        with _quiet_in(folder):
+            build_column_store(FIXTURE, folder, station_file=os.path.join(folder, 'stations.csv'))
+        (monthly, seasonal, weekday, hourly, _), _ = run_parallel(folder, 'year', 2)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return {
+        'monthly_analysis': monthly,
+        'seasonal_analysis': seasonal.reset_index(),
+        'weekday_analysis': weekday,
+        'hourly_analysis': hourly.reset_index(),
+    }
+
+
+STAGES = {
+    'trip_revenue': stage_trip_revenue,
+    'classify_bikes': stage_classify_bikes,
+    'bike_economics': stage_bike_economics,
+    'seasonality_script': stage_seasonality_script,
+    'economy_script': stage_economy_script,
+    'parallel_seasonality': stage_parallel_seasonality,
+}
+
+
+# ---------- Сравнение с эталоном ----------
+
+def _normalize(frame):
+    """Таблица в том виде, в каком она хранится в эталоне (через CSV)"""
+    return pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+
+
+def compare_frames(actual, expected, rtol=RTOL, atol=ATOL):
+    """Список расхождений (пустой - таблицы совпадают)"""
+    actual = _normalize(actual)
+    problems = []
+    if list(actual.columns) != list(expected.columns):
+        return [f"столбцы {list(actual.columns)} != {list(expected.columns)}"]
+    if len(actual) != len(expected):
+        return [f"строк {len(actual)} != {len(expected)}"]
+
+    for col in expected.columns:
+        a, e = actual[col], expected[col]
+        if pd.api.types.is_numeric_dtype(e) and pd.api.types.is_numeric_dtype(a):
+            close = np.isclose(a.to_numpy(dtype=float), e.to_numpy(dtype=float), rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            close = ((a.astype(str) == e.astype(str)) | (a.isna() & e.isna())).to_numpy().copy()
+            # Столбцы с многострочным заголовком (describe по категориям) читаются
+            # как строки - числовые ячейки все равно сравниваем с допуском
+            a_num = pd.to_numeric(a, errors='coerce').to_numpy(dtype=float)
+            e_num = pd.to_numeric(e, errors='coerce').to_numpy(dtype=float)
+            numeric = ~np.isnan(a_num) & ~np.isnan(e_num)
+            close[numeric] = np.isclose(a_num[numeric], e_num[numeric], rtol=rtol, atol=atol)
+        if not close.all():
+            row = int(np.flatnonzero(~close)[0])
+            problems.append(f"{col}: {int((~close).sum())} расхождений, первое в строке {row}: "
+                            f"{a.iloc[row]!r} != {e.iloc[row]!r}")
+    return problems
+
+
+def reference_workload():
+    """Эталонная нагрузка: группировка, сортировка и запись CSV, как в этапах"""
+    rng = np.random.default_rng(FIXTURE_SEED)
+    frame = pd.DataFrame({'key': rng.integers(0, 1000, 200_000), 'value': rng.random(200_000)})
+    frame.groupby('key')['value'].agg(['sum', 'median'])
+    frame.sort_values('value').to_csv(io.StringIO(), index=False)
+    return {}
+
+
+def _median_seconds(stage, repeats):
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        tables = stage()
+        seconds.append(time.perf_counter() - started)
+    return tables, float(np.median(seconds))
+
+
+def measure(stage, repeats=REPEATS):
+    """Медиана времени нескольких запусков и пиковая память отдельным запуском"""
+    tables, seconds = _median_seconds(stage, repeats)
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tables, seconds, peak / 1024 ** 2
+
+
+def check_baseline(name, seconds, peak_mb, reference, base, base_reference, max_slowdown=MAX_SLOWDOWN_PCT):
+    """Сравнение с базой: (строка статуса, список проблем)
+
+    Время сравнивается в долях эталонной нагрузки этого запуска и базы.
+    """
+    problems = []
+    slowdown = (seconds / reference) / (base['seconds'] / base_reference) * 100 - 100
+    growth = peak_mb - base['peak_mb']
+    status = f"{slowdown:+.0f}% ко времени, память {growth:+.1f} МБ"
+    if seconds < MIN_CHECKED_SECONDS and base['seconds'] < MIN_CHECKED_SECONDS:
+        status += ", время не проверяется"
+    elif slowdown > max_slowdown:
+        problems.append(f"{name}: медленнее базы на {slowdown:.0f}% с поправкой на эталон "
+                        f"({seconds:.3f} сек против {base['seconds']:.3f} сек)")
+    if growth > max(base['peak_mb'] * MAX_MEMORY_GROWTH_PCT / 100, MIN_MEMORY_GROWTH_MB):
+        problems.append(f"{name}: пик памяти {peak_mb:.1f} МБ против {base['peak_mb']:.1f} МБ в базе")
+    return status, problems
+
+
+def run(stages, update_golden=False, update_baseline=False, max_slowdown=MAX_SLOWDOWN_PCT, repeats=REPEATS):
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    failures = []
+    results = {}
+    _, reference = _median_seconds(reference_workload, repeats)
+    base_reference = baseline.get(REFERENCE, {}).get('seconds')
+    if update_baseline or base_reference is None:
+        baseline[REFERENCE] = {'seconds': round(reference, 4)}
+        base_reference = reference
+    print(f"  {'эталонная нагрузка':22}: {reference:8.3f} сек (в базе {base_reference:.3f} сек)")
+
+    for name in stages:
+        tables, seconds, peak_mb = measure(STAGES[name], repeats)
+        results[name] = tables
+        status = []
+
+        for table_name, frame in tables.items():
+            path = os.path.join(GOLDEN_DIR, name, table_name + '.csv')
+            if update_golden or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _normalize(frame).to_csv(path, index=False)
+                status.append(f"эталон {table_name} сохранен")
+                continue
+            for problem in compare_frames(frame, pd.read_csv(path)):
+                failures.append(f"{name}/{table_name}: {problem}")
+
+        base = baseline.get(name)
+        if update_baseline or base is None:
+            baseline[name] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 2)}
+            status.append("базовое время сохранено")
+        else:
+            message, problems = check_baseline(name, seconds, peak_mb, reference, base, base_reference,
+                                               max_slowdown)
+            status.append(message)
+            failures.extend(problems)
+
+        print(f"  {name:22}: {seconds:8.3f} сек, пик памяти {peak_mb:8.1f} МБ  ({'; '.join(status)})")
+
+    for stage, reference, table_names in EQUIVALENT:
+        if stage not in results or reference not in results:
+            continue
+        for table_name in table_names:
+            for problem in compare_frames(results[stage][table_name], _normalize(results[reference][table_name])):
+                failures.append(f"{stage}/{table_name} != {reference}/{table_name}: {problem}")
+
+    if update_baseline or any(name not in baseline for name in [*stages, REFERENCE]) or not os.path.exists(BASELINE):
+        os.makedirs(REGRESSION_DIR, exist_ok=True)
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Регрессионная проверка результатов и скорости этапов')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--update-golden', action='store_true')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--max-slowdown', type=float, default=MAX_SLOWDOWN_PCT, help='допустимое замедление, %%')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("РЕГРЕССИОННАЯ ПРОВЕРКА")
+    print("=" * 70)
+
+    failures = run(args.stages, args.update_golden, args.update_baseline, args.max_slowdown, args.repeats)
+
+    if failures:
+        print(f"\n✗ Проблем: {len(failures)}")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✓ Результаты совпадают с эталоном, замедлений и роста памяти нет")
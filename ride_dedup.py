@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+HEX_ID = r'[0-9A-Fa-f]{1,16}'
+# ASCII-код -> значение шестнадцатеричной цифры
+_HEX_DIGITS = np.zeros(256, dtype=np.uint64)
+_HEX_DIGITS[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10, dtype=np.uint64)
+_HEX_DIGITS[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16, dtype=np.uint64)
+_HEX_DIGITS[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16, dtype=np.uint64)
+
+
+def hash_ride_ids(ride_ids):
+    """64-битные хеши id - только для id, которые нельзя перевести в число без потерь"""
+    return pd.util.hash_pandas_object(pd.Series(ride_ids, dtype=object), index=False).to_numpy()
+
+
+def _parse_hex(ids):
+    """16 шестнадцатеричных символов -> uint64 целыми столбцами"""
+    raw = np.array([s.zfill(16) for s in ids], dtype='S16').view(np.uint8).reshape(-1, 16)
+    shifts = np.arange(60, -4, -4, dtype=np.uint64)
+    return np.bitwise_or.reduce(_HEX_DIGITS[raw] << shifts, axis=1)
+
+
+def encode_ride_ids(ride_ids):
+    """Точные 8-байтовые ключи id: (ключи, маска точных ключей)
+
+    ride_id Divvy - 16 шестнадцатеричных символов, т.е. ровно 64 бита;
+    trip_id 2013-2019 - целое число. Такие id переводятся в uint64 без
+    потерь. Остальные получают хеш и маску False: совпадение хешей у них
+    подтверждается сравнением самих id.
+    """
+    ids = pd.Series(ride_ids)
+    keys = np.zeros(len(ids), dtype=np.uint64)
+    exact = np.zeros(len(ids), dtype=bool)
+    present = ids.notna().to_numpy()
+
+    if pd.api.types.is_numeric_dtype(ids):
+        values = ids.to_numpy(dtype=float)
+        exact = present & (values >= 0) & (values == np.floor(values))
+        keys[exact] = values[exact].astype(np.uint64)
+    else:
+        text = ids.astype(str)
+        exact = present & text.str.fullmatch(HEX_ID).fillna(False).to_numpy(dtype=bool)
+        if exact.any():
+            keys[exact] = _parse_hex(text[exact])
+    other = present & ~exact
+    if other.any():
+        keys[other] = hash_ride_ids(ids[other])
+    return keys, exact
+
+
+class RideDeduplicator:
+    """Множество уже встреченных ride_id для потоковой загрузки помесячных файлов
+
+    Хранит отсортированный массив точных uint64 ключей: каждый новый файл
+    проверяется по нему бинарным поиском, вся история в память не грузится.
+    id, которые в число не переводятся, хранятся отдельно хешами вместе с
+    самими id, и каждое совпадение хеша проверяется по id - разные поездки
+    с одинаковым хешем не теряются.
+    """
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.seen_hashed = np.empty(0, dtype=np.uint64)
+        self.hashed_ids = {}  # хеш -> id с этим хешем (только для нечисловых id)
+
+    def __len__(self):
+        return len(self.seen) + len(self.seen_hashed)
+
+    @staticmethod
+    def _in_sorted(sorted_keys, keys):
+        if len(sorted_keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return sorted_keys[positions] == keys
+
+    @staticmethod
+    def _merge(sorted_keys, new_keys):
+        """Вставляем новые ключи в отсортированный массив без полной пересортировки"""
+        new_keys = np.sort(new_keys)
+        return np.insert(sorted_keys, np.searchsorted(sorted_keys, new_keys), new_keys)
+
+    def is_seen(self, keys, exact=None, ids=None):
+        """Маска поездок, которые уже встречались в предыдущих файлах"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        exact = np.ones(len(keys), dtype=bool) if exact is None else exact
+        seen = np.zeros(len(keys), dtype=bool)
+        seen[exact] = self._in_sorted(self.seen, keys[exact])
+
+        # Совпавший хеш - только кандидат: подтверждаем по самому id
+        candidates = np.flatnonzero(~exact)[self._in_sorted(self.seen_hashed, keys[~exact])]
+        for row in candidates:
+            seen[row] = ids is not None and ids[row] in self.hashed_ids.get(keys[row], ())
+        return seen
+
+    def filter(self, df, column='ride_id'):
+        """Убираем из порции повторы - внутри нее и относительно всех прошлых порций
+
+        Возвращает (порция без повторов, число удаленных строк).
+        """
+        ids = df[column]
+        keys, exact = encode_ride_ids(ids)
+        missing = ids.isna().to_numpy()
+        raw = ids.to_numpy(dtype=object)
+
+        # Внутри порции: точные ключи сравниваются как есть, нечисловые - по самим id
+        repeated = np.zeros(len(ids), dtype=bool)
+        repeated[exact] = pd.Series(keys[exact]).duplicated().to_numpy()
+        other = ~exact & ~missing
+        repeated[other] = ids[other].duplicated().to_numpy()
+        keep = ~repeated & ~self.is_seen(keys, exact, raw)
+        # Строки без ride_id сравнить не с чем - оставляем их как есть
+        keep |= missing
+
+        new = keep & ~missing
+        self.seen = self._merge(self.seen, keys[new & exact])
+        hashed = new & ~exact
+        if hashed.any():
+            self.seen_hashed = self._merge(self.seen_hashed, keys[hashed])
+            for key, ride_id in zip(keys[hashed], raw[hashed]):
+                self.hashed_ids.setdefault(key, set()).add(ride_id)
+        return df[keep], int((~keep).sum())
@@ -0,0 +1,196 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import read_validated
+
+# Режим выборки включается переменной окружения: BIKE_SAMPLE=0.02 - доля поездок
+SAMPLE_ENV = 'BIKE_SAMPLE'
+SEED = 42
+CHUNK_ROWS = 500_000
+
+# 95% доверительный интервал
+Z_95 = 1.96
+
+
+def sample_fraction():
+    """Доля выборки из BIKE_SAMPLE или None для полного прогона"""
+    value = os.environ.get(SAMPLE_ENV)
+    if not value:
+        return None
+    fraction = float(value)
+    if not 0 < fraction <= 1:
+        raise ValueError(f"{SAMPLE_ENV} должна быть в интервале (0, 1], получено {value}")
+    return fraction
+
+
+def output_folder(folder, fraction=None):
+    """Папка результатов: на выборке - отдельная <folder>_sample
+
+    Таблицы выборки не должны затирать полные: их читают query_service.py,
+    tariff_plans.py и дашборд.
+    """
+    return f'{folder}_sample' if fraction else folder
+
+
+def _trip_strata(chunk):
+    """Страта поездки: год-месяц начала и тип пользователя (без разбора дат)"""
+    return chunk['starttime'].astype(str).str[:7] + '|' + chunk['usertype'].fillna('Неизвестно')
+
+
+def stratified_sample(csv_path, fraction, seed=SEED, chunk_rows=CHUNK_ROWS):
+    """Стратифицированная выборка поездок по году, месяцу и типу пользователя
+
+    Файл читается порциями через DataValidator('legacy'), в память попадает
+    только выборка из строк, прошедших проверку. Каждая строка
+    берется с вероятностью fraction (воспроизводимо при том же seed), а
+    численность страт считается по всему файлу, так что веса страт
+    N_h / n_h точно возвращают выборку к генеральной совокупности.
+    Возвращает (выборка, численность страт).
+    """
+    rng = np.random.default_rng(seed)
+    population = []
+    parts = []
+
+    for chunk in read_validated(csv_path, 'legacy', chunk_rows):
+        strata = _trip_strata(chunk)
+        population.append(strata.value_counts())
+        keep = rng.random(len(chunk)) < fraction
+        parts.append(chunk[keep].assign(sample_stratum=strata[keep]))
+
+    population = pd.concat(population).groupby(level=0).sum()
+    sample = pd.concat(parts, ignore_index=True)
+    sample_sizes = sample['sample_stratum'].value_counts()
+    sample['sample_weight'] = sample['sample_stratum'].map(population / sample_sizes)
+
+    empty = population.index.difference(sample_sizes.index)
+    if len(empty):
+        print(f"  ⚠️  {len(empty)} страт не попали в выборку ({population[empty].sum():,} поездок)")
+    return sample, population
+
+
+def bike_sample(csv_path, fraction, seed=SEED, chunk_rows=CHUNK_ROWS):
+    """Выборка велосипедов: все поездки случайной доли bikeid
+
+    Экономика велосипеда считается по всей его истории, поэтому выбираются
+    велосипеды, а не поездки. Выбор по хешу bikeid не зависит от порядка
+    строк. Строки из карантина DataValidator не участвуют. Возвращает
+    (поездки выбранных велосипедов, всего велосипедов).
+    """
+    threshold = int(fraction * 2 ** 32)
+    all_bikes = np.empty(0, np.int64)
+    parts = []
+
+    for chunk in read_validated(csv_path, 'legacy', chunk_rows):
+        bikes = chunk['bikeid'].to_numpy(dtype=np.int64)
+        all_bikes = np.union1d(all_bikes, bikes)
+        hashed = (bikes * 2654435761 + seed) % 2 ** 32
+        parts.append(chunk[hashed < threshold])
+
+    return pd.concat(parts, ignore_index=True), len(all_bikes)
+
+
+def estimate_totals(sample, population, domain=None, value=None, z=Z_95):
+    """Оценка числа поездок (или суммы value) по доменам с доверительным интервалом
+
+    domain - столбец выборки или массив ключей (месяц, сезон, ...).
+    Дисперсия стратифицированной оценки: sum N_h^2 (1 - n_h/N_h) s_h^2 / n_h,
+    где s_h^2 - дисперсия y * [строка в домене] внутри страты.
+    """
+    strata = sample['sample_stratum'].to_numpy()
+    if domain is None:
+        keys = np.full(len(sample), 'Всего', dtype=object)
+    else:
+        keys = sample[domain].to_numpy() if isinstance(domain, str) else np.asarray(domain)
+    y = np.ones(len(sample)) if value is None else sample[value].fillna(0).to_numpy(dtype=float)
+
+    sums = pd.DataFrame({'stratum': strata, 'domain': keys, 'y': y, 'y2': y ** 2})
+    sums = sums.groupby(['stratum', 'domain']).sum()
+    stratum = sums.index.get_level_values('stratum')
+
+    n = sample['sample_stratum'].value_counts().reindex(stratum).to_numpy(dtype=float)
+    N = population.reindex(stratum).to_numpy(dtype=float)
+    mean = sums['y'].to_numpy() / n
+    var = np.where(n > 1, (sums['y2'].to_numpy() - n * mean ** 2) / np.maximum(n - 1, 1), 0)
+
+    parts = pd.DataFrame({
+        'estimate': N * mean,
+        'variance': N ** 2 * (1 - n / N) * var / n,
+    }, index=sums.index.get_level_values('domain'))
+    totals = parts.groupby(level=0).sum()
+
+    margin = z * np.sqrt(totals['variance'])
+    return pd.DataFrame({
+        'estimate': totals['estimate'],
+        'ci_low': totals['estimate'] - margin,
+        'ci_high': totals['estimate'] + margin,
+    })
+
+
+def rescale_counts(table, estimates, on=None, column='total_trips'):
+    """Заменяем счетчик выборки оценкой по совокупности и добавляем границы ДИ"""
+    keys = table[on] if on else table.index.to_series(index=table.index)
+    table = table.copy()
+    table[column] = keys.map(estimates['estimate']).round(0)
+    table[f'{column}_ci_low'] = keys.map(estimates['ci_low']).round(0)
+    table[f'{column}_ci_high'] = keys.map(estimates['ci_high']).round(0)
+    return table
+
+
+def rescale_means(table, sample, domain, on=None):
+    """Заменяем средние выборки (avg_duration, subscriber_pct) оценками с весами страт
+
+    Строки берутся с одной вероятностью, но объем выборки в страте случаен,
+    и веса N_h / n_h различаются - простое среднее по выборке не совпадает
+    с оценкой по совокупности.
+    """
+    keys = table[on] if on else table.index.to_series(index=table.index)
+    domain = sample[domain] if isinstance(domain, str) else domain
+    weights = sample['sample_weight']
+    sums = pd.DataFrame({
+        'domain': np.asarray(domain),
+        'weight': weights.to_numpy(),
+        'duration': (weights * sample['tripduration']).to_numpy(),
+        'subscribers': (weights * (sample['usertype'] == 'Subscriber')).to_numpy(),
+    }).groupby('domain').sum()
+
+    table = table.copy()
+    table['avg_duration'] = keys.map(sums['duration'] / sums['weight']).round(2)
+    table['subscriber_pct'] = keys.map(sums['subscribers'] / sums['weight'] * 100).round(2)
+    return table
+
+
+def ci_suffix(row, column='total_trips'):
+    """Текст интервала для вывода рядом с метрикой ('' при полном прогоне)"""
+    if f'{column}_ci_low' not in row:
+        return ''
+    return f" (95% ДИ {row[f'{column}_ci_low']:,.0f}-{row[f'{column}_ci_high']:,.0f})"
+
+
+def srs_mean(values, population_size, z=Z_95):
+    """Среднее по простой случайной выборке (велосипедов) с ДИ и поправкой на конечность"""
+    values = pd.Series(values, dtype=float).dropna()
+    n = len(values)
+    mean = values.mean()
+    se = values.std(ddof=1) / np.sqrt(n) * np.sqrt(max(1 - n / population_size, 0)) if n > 1 else 0.0
+    return mean, mean - z * se, mean + z * se
+
+
+def srs_total(values, population_size, z=Z_95):
+    """Сумма по совокупности из простой случайной выборки: N * среднее"""
+    mean, low, high = srs_mean(values, population_size, z)
+    return mean * population_size, low * population_size, high * population_size
+
+
+def srs_ratio(numerator, denominator, population_size, z=Z_95):
+    """Отношение сумм (например, прибыль / инвестиции) с ДИ методом линеаризации"""
+    y = pd.Series(numerator, dtype=float).to_numpy()
+    x = pd.Series(denominator, dtype=float).to_numpy()
+    n = len(y)
+    ratio = y.sum() / x.sum()
+    residual = y - ratio * x
+    se = 0.0
+    if n > 1:
+        se = residual.std(ddof=1) / np.sqrt(n) * np.sqrt(max(1 - n / population_size, 0)) / x.mean()
+    return ratio, ratio - z * se, ratio + z * se
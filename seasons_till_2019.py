@@ -5,6 +5,16 @@ import seaborn as sns
 from datetime import datetime
 import os
 
+from anomaly_detection import VolumeAnomalyDetector
+from calendar_dim import TIME_PERIOD_BY_HOUR, build_calendar, days_ru, gather, time_order, trip_keys
+from dashboard_export import export_dashboard, load_economics_sheets, print_timings
+from data_validation import load_validated
+from quantile_sketches import segment_quantiles
+from query_service import build_cube
+from readable_export import export_readable
+from sampling import (ci_suffix, estimate_totals, output_folder, rescale_counts, rescale_means, sample_fraction,
+                      stratified_sample)
+
 # Настройки для красивого отображения
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
@@ -15,9 +25,20 @@ print("=" * 70)
 print("УЛУЧШЕНИЕ ЧИТАЕМОСТИ ДАННЫХ И АНАЛИЗ СЕЗОННОСТИ")
 print("=" * 70)
 
-# Загружаем очищенный датасет
-df = pd.read_csv('2013-2019.csv')
-print(f"Загружено записей: {len(df):,}")
+# Загружаем очищенный датасет (BIKE_SAMPLE=0.02 - быстрый прогон на выборке)
+fraction = sample_fraction()
+population = None
+# На выборке результаты пишутся в seasonality_analysis_sample/
+output_dir = output_folder('seasonality_analysis', fraction)
+if fraction:
+    df, population = stratified_sample('2013-2019.csv', fraction)
+    print(f"РЕЖИМ ВЫБОРКИ: {fraction:.1%} поездок, страты год × месяц × тип пользователя")
+    print(f"Загружено записей: {len(df):,} из {population.sum():,}")
+else:
+    df = load_validated('2013-2019.csv')
+    print(f"Загружено записей: {len(df):,}")
+# Веса строк для средних и квантилей (None при полном прогоне)
+weights = df['sample_weight'] if population is not None else None
 print(f"Столбцов: {len(df.columns)}")
 
 # ========== 1. УЛУЧШЕНИЕ ЧИТАЕМОСТИ ДАННЫХ ==========
@@ -55,57 +76,29 @@ def format_duration(seconds):
 
 df['duration_readable'] = df['tripduration'].apply(format_duration)
 
-# Возраст в годах
-df['age_years'] = (datetime.now().year - df['birthyear']).astype(int)
-
-# День недели русскими названиями
-days_ru = {
-    0: 'Понедельник', 1: 'Вторник', 2: 'Среда',
-    3: 'Четверг', 4: 'Пятница', 5: 'Суббота', 6: 'Воскресенье'
-}
-df['day_of_week_ru'] = df['starttime'].dt.dayofweek.map(days_ru)
+# Возраст в годах (год рождения указан не у всех - пропуски остаются пустыми)
+df['age_years'] = (datetime.now().year - df['birthyear']).astype('Int64')
 
-# Месяц русскими названиями
-months_ru = {
-    1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-    5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-    9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-}
-df['month_ru'] = df['starttime'].dt.month.map(months_ru)
+# Календарные признаки: у поездки только ключ даты (int32) и час (uint8),
+# месяц, день недели, сезон и праздники берутся из календаря по индексу
+df['date_key'], df['hour'] = trip_keys(df['starttime'])
+calendar = build_calendar(df['starttime'].min(), df['starttime'].max())
 
+# День недели и месяц русскими названиями
+df['day_of_week_ru'] = gather(calendar, df['date_key'], 'day_of_week_ru')
+df['month_ru'] = gather(calendar, df['date_key'], 'month_ru')
 
 # Время суток с описанием
-def get_time_period(hour):
-    if 5 <= hour < 12:
-        return 'Утро (5:00-11:59)'
-    elif 12 <= hour < 17:
-        return 'День (12:00-16:59)'
-    elif 17 <= hour < 22:
-        return 'Вечер (17:00-21:59)'
-    else:
-        return 'Ночь (22:00-4:59)'
-
-
-df['time_period'] = df['starttime'].dt.hour.apply(get_time_period)
-
+df['time_period'] = TIME_PERIOD_BY_HOUR[df['hour']]
 
 # Сезонность с русскими названиями
-def get_season_ru(month):
-    if month in [12, 1, 2]:
-        return 'Зима'
-    elif month in [3, 4, 5]:
-        return 'Весна'
-    elif month in [6, 7, 8]:
-        return 'Лето'
-    else:
-        return 'Осень'
-
-
-df['season_ru'] = df['starttime'].dt.month.apply(get_season_ru)
+df['season_ru'] = gather(calendar, df['date_key'], 'season_ru')
 
 
 # Возрастные группы с описанием
 def get_age_group_ru(age):
+    if pd.isna(age):
+        return 'Не указан'
     if age < 18:
         return 'До 18 лет'
     elif 18 <= age < 25:
@@ -153,7 +146,7 @@ print("\n2.1. Сезонность по месяцам:")
 
 # Создаем копию для агрегации по месяцам
 monthly_stats = df.copy()
-monthly_stats['month_num'] = monthly_stats['starttime'].dt.month
+monthly_stats['month_num'] = gather(calendar, df['date_key'], 'month')
 
 monthly_aggregate = monthly_stats.groupby(['month_num', 'month_ru', 'season_ru']).agg({
     'trip_id': 'count',
@@ -164,12 +157,20 @@ monthly_aggregate = monthly_stats.groupby(['month_num', 'month_ru', 'season_ru']
 monthly_aggregate.columns = ['total_trips', 'avg_duration', 'subscriber_pct']
 monthly_aggregate = monthly_aggregate.reset_index()
 monthly_aggregate = monthly_aggregate.sort_values('month_num')
+if population is not None:
+    monthly_aggregate = rescale_counts(monthly_aggregate,
+                                       estimate_totals(df, population, monthly_stats['month_num']), on='month_num')
+    monthly_aggregate = rescale_means(monthly_aggregate, df, monthly_stats['month_num'], on='month_num')
+
+# Квантили длительности по скетчам: один проход, скетчи частей данных складываются
+monthly_aggregate = monthly_aggregate.join(
+    segment_quantiles(monthly_stats['month_num'], df['tripduration'], weights=weights), on='month_num')
 
 print("\nСредняя активность по месяцам:")
 for idx, row in monthly_aggregate.iterrows():
     print(f"  {row['month_ru']:10} ({row['season_ru']:6}): {row['total_trips']:6.0f} поездок, "
-          f"длительность: {row['avg_duration'] / 60:5.1f} мин, "
-          f"подписчики: {row['subscriber_pct']:5.1f}%")
+          f"длительность: {row['avg_duration'] / 60:5.1f} мин (медиана {row['p50_duration'] / 60:5.1f}), "
+          f"подписчики: {row['subscriber_pct']:5.1f}%{ci_suffix(row)}")
 
 # 2.2. Сезонность по временам года
 print("\n2.2. Сезонность по временам года:")
@@ -182,20 +183,24 @@ seasonal_summary = df.groupby('season_ru').agg({
 }).round(2)
 
 seasonal_summary.columns = ['total_trips', 'avg_duration', 'subscriber_pct', 'days_in_data']
+if population is not None:
+    seasonal_summary = rescale_counts(seasonal_summary, estimate_totals(df, population, 'season_ru'))
+    seasonal_summary = rescale_means(seasonal_summary, df, 'season_ru')
 seasonal_summary['avg_daily_trips'] = (seasonal_summary['total_trips'] / seasonal_summary['days_in_data']).round(0)
 seasonal_summary = seasonal_summary.sort_values('total_trips', ascending=False)
+seasonal_summary = seasonal_summary.join(segment_quantiles(df['season_ru'], df['tripduration'], weights=weights))
 
 print("\nАктивность по временам года:")
 for season, row in seasonal_summary.iterrows():
     print(f"  {season:6}: {row['total_trips']:8,.0f} поездок, "
           f"среднедневно: {row['avg_daily_trips']:5.0f}, "
-          f"длительность: {row['avg_duration'] / 60:5.1f} мин")
+          f"длительность: {row['avg_duration'] / 60:5.1f} мин{ci_suffix(row)}")
 
 # 2.3. Сезонность по дням недели
 print("\n2.3. Сезонность по дням недели:")
 
 # Добавляем признак будний/выходной
-df['is_weekend'] = df['starttime'].dt.dayofweek.isin([5, 6])
+df['is_weekend'] = gather(calendar, df['date_key'], 'is_weekend')
 
 # Создаем агрегацию по дням недели
 weekday_summary = df.groupby(['day_of_week_ru', 'is_weekend']).agg({
@@ -206,7 +211,13 @@ weekday_summary = df.groupby(['day_of_week_ru', 'is_weekend']).agg({
 
 weekday_summary.columns = ['total_trips', 'avg_duration', 'subscriber_pct']
 weekday_summary = weekday_summary.reset_index()
+if population is not None:
+    weekday_summary = rescale_counts(weekday_summary, estimate_totals(df, population, 'day_of_week_ru'),
+                                     on='day_of_week_ru')
+    weekday_summary = rescale_means(weekday_summary, df, 'day_of_week_ru', on='day_of_week_ru')
 weekday_summary = weekday_summary.sort_values('total_trips', ascending=False)
+weekday_summary = weekday_summary.join(
+    segment_quantiles(df['day_of_week_ru'], df['tripduration'], weights=weights), on='day_of_week_ru')
 
 print("\nАктивность по дням недели:")
 days_order = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
@@ -214,7 +225,7 @@ days_order = ['Понедельник', 'Вторник', 'Среда', 'Чет
 for idx, row in weekday_summary.iterrows():
     is_weekend = "выходной" if row['is_weekend'] else "будний"
     print(f"  {row['day_of_week_ru']:12} ({is_weekend:8}): {row['total_trips']:8,.0f} поездок, "
-          f"длительность: {row['avg_duration'] / 60:5.1f} мин")
+          f"длительность: {row['avg_duration'] / 60:5.1f} мин{ci_suffix(row)}")
 
 # 2.4. Сезонность по времени суток
 print("\n2.4. Сезонность по времени суток:")
@@ -228,14 +239,55 @@ hourly_summary = df.groupby('time_period').agg({
 hourly_summary.columns = ['total_trips', 'avg_duration', 'subscriber_pct']
 
 # Сортируем по логическому порядку
-time_order = ['Утро (5:00-11:59)', 'День (12:00-16:59)', 'Вечер (17:00-21:59)', 'Ночь (22:00-4:59)']
 hourly_summary = hourly_summary.reindex(time_order)
+if population is not None:
+    hourly_summary = rescale_counts(hourly_summary, estimate_totals(df, population, 'time_period'))
+    hourly_summary = rescale_means(hourly_summary, df, 'time_period')
+hourly_summary = hourly_summary.join(segment_quantiles(df['time_period'], df['tripduration'], weights=weights))
 
 print("\nАктивность по времени суток:")
 for time_period, row in hourly_summary.iterrows():
     print(f"  {time_period:20}: {row['total_trips']:8,.0f} поездок, "
           f"длительность: {row['avg_duration'] / 60:5.1f} мин, "
-          f"подписчики: {row['subscriber_pct']:5.1f}%")
+          f"подписчики: {row['subscriber_pct']:5.1f}%{ci_suffix(row)}")
+
+# 2.5. Квантили длительности по типам пользователей
+print("\n2.5. Длительность поездок по типам пользователей (медиана и хвосты):")
+
+usertype_quantiles = segment_quantiles(df['usertype_ru'], df['tripduration'], weights=weights)
+usertype_quantiles.index.name = 'usertype_ru'
+for usertype, row in usertype_quantiles.iterrows():
+    print(f"  {usertype:12}: медиана {row['p50_duration'] / 60:5.1f} мин, "
+          f"p90 {row['p90_duration'] / 60:6.1f} мин, p99 {row['p99_duration'] / 60:6.1f} мин")
+
+# 2.6. Праздничные, выходные и будние дни
+print("\n2.6. Активность в праздничные дни:")
+
+# Поездки по дням (на выборке - с весами), дни без поездок тоже учитываются
+trips_by_day = df.groupby('date_key')['sample_weight'].sum() if population is not None else df.groupby('date_key').size()
+trips_by_day = trips_by_day.reindex(calendar.index, fill_value=0)
+day_type = pd.Series(np.select([calendar['is_holiday'], calendar['is_weekend']], ['Праздник', 'Выходной'], 'Будний'),
+                     index=calendar.index, name='day_type')
+holiday_summary = trips_by_day.groupby(day_type).agg(['size', 'mean']).round(2)
+holiday_summary.columns = ['days', 'avg_daily_trips']
+
+for day_kind, row in holiday_summary.iterrows():
+    print(f"  {day_kind:9}: {row['days']:5.0f} дней, в среднем {row['avg_daily_trips']:7.1f} поездок в день")
+
+# 2.7. Аномалии: сбои, пропущенные дни и всплески спроса, которые сглаживаются в сводках
+print("\n2.7. Аномальные дни (скользящая медиана/MAD):")
+anomalies = None
+if population is not None:
+    # Детектор считает строки без весов: на выборке счетчики занижены в
+    # 1/fraction раз, а пороги MIN_DEVIATION заданы в поездках полного набора
+    print("  Пропущено в режиме выборки")
+else:
+    anomalies = VolumeAnomalyDetector()
+    anomalies.update(df['date_key'], df['from_station_id'].fillna(-1))
+    anomalies.detect()
+    print(f"  Дней: {len(anomalies.daily_flags)}, станция-дней: {len(anomalies.station_flags)}")
+    for row in anomalies.daily_flags.head(5).itertuples(index=False):
+        print(f"  {row.date:%Y-%m-%d} {row.kind:5}: {row.trips:,} поездок (ожидалось ~{row.expected:,.0f})")
 
 # ========== 3. ВИЗУАЛИЗАЦИЯ СЕЗОННОСТИ ==========
 print("\n" + "=" * 70)
@@ -243,7 +295,7 @@ print("3. ВИЗУАЛИЗАЦИЯ СЕЗОННОСТИ")
 print("=" * 70)
 
 # Создаем директорию для графиков
-os.makedirs('seasonality_analysis', exist_ok=True)
+os.makedirs(output_dir, exist_ok=True)
 
 # 3.1. График сезонности по месяцам
 plt.figure(figsize=(14, 8))
@@ -304,13 +356,12 @@ for bar in bars:
              f'{int(height):,}', ha='center', va='bottom')
 
 plt.tight_layout()
-plt.savefig('seasonality_analysis/seasonality_overview.png', dpi=300, bbox_inches='tight')
+plt.savefig(f'{output_dir}/seasonality_overview.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # 3.2. Тепловая карта: день недели × час
 plt.figure(figsize=(14, 8))
-df['hour'] = df['starttime'].dt.hour
-df['weekday_num'] = df['starttime'].dt.dayofweek
+df['weekday_num'] = gather(calendar, df['date_key'], 'weekday')
 
 heatmap_data = df.groupby(['weekday_num', 'hour']).size().unstack(fill_value=0)
 heatmap_data.index = [days_ru[i] for i in range(7)]
@@ -321,11 +372,11 @@ plt.title('Тепловая карта: День недели × Час', fontsi
 plt.xlabel('Час дня')
 plt.ylabel('День недели')
 plt.tight_layout()
-plt.savefig('seasonality_analysis/weekday_hour_heatmap.png', dpi=300, bbox_inches='tight')
+plt.savefig(f'{output_dir}/weekday_hour_heatmap.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # 3.3. График сезонности по годам (если данные за несколько лет)
-if df['starttime'].dt.year.nunique() > 1:
+if calendar['year'].nunique() > 1:
     plt.figure(figsize=(12, 6))
 
     yearly_season = df.groupby(['starttime', 'season_ru']).size().reset_index()
@@ -339,7 +390,7 @@ if df['starttime'].dt.year.nunique() > 1:
     plt.ylabel('Количество поездок')
     plt.legend(title='Сезон')
     plt.tight_layout()
-    plt.savefig('seasonality_analysis/seasonality_by_year.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{output_dir}/seasonality_by_year.png', dpi=300, bbox_inches='tight')
     plt.show()
 
 # ========== 4. СОХРАНЕНИЕ РЕЗУЛЬТАТОВ ==========
@@ -355,28 +406,53 @@ readable_columns = [
     'day_of_week_ru', 'month_ru', 'season_ru', 'time_period', 'year_month'
 ]
 
-readable_df = df[readable_columns].copy()
-readable_df.to_csv('bike_sharing_readable.csv', index=False, encoding='utf-8-sig')
-print(f"✓ Читаемый датасет сохранен: bike_sharing_readable.csv ({len(readable_df):,} записей)")
+# Пишем без копии таблицы: Arrow форматирует CSV в несколько потоков,
+# заодно сохраняем Parquet-версию для дальнейшей обработки
+# (на выборке не пишем - это полный датасет, им пользуются другие скрипты)
+if population is None:
+    readable_rows = export_readable(df, readable_columns, 'bike_sharing_readable.csv',
+                                    parquet_path='bike_sharing_readable.parquet')
+    print(f"✓ Читаемый датасет сохранен: bike_sharing_readable.csv ({readable_rows:,} записей)")
+    print("✓ Parquet-версия сохранена: bike_sharing_readable.parquet")
+else:
+    print("Режим выборки: читаемый датасет не перезаписывается")
 
 # 4.2. Сохраняем аналитические таблицы
-monthly_aggregate.to_csv('seasonality_analysis/monthly_analysis.csv', index=False, encoding='utf-8-sig')
-seasonal_summary.to_csv('seasonality_analysis/seasonal_analysis.csv', encoding='utf-8-sig')
-weekday_summary.to_csv('seasonality_analysis/weekday_analysis.csv', index=False, encoding='utf-8-sig')
-hourly_summary.to_csv('seasonality_analysis/hourly_analysis.csv', encoding='utf-8-sig')
+monthly_aggregate.to_csv(f'{output_dir}/monthly_analysis.csv', index=False, encoding='utf-8-sig')
+seasonal_summary.to_csv(f'{output_dir}/seasonal_analysis.csv', encoding='utf-8-sig')
+weekday_summary.to_csv(f'{output_dir}/weekday_analysis.csv', index=False, encoding='utf-8-sig')
+hourly_summary.to_csv(f'{output_dir}/hourly_analysis.csv', encoding='utf-8-sig')
+usertype_quantiles.to_csv(f'{output_dir}/usertype_duration_quantiles.csv', encoding='utf-8-sig')
+holiday_summary.to_csv(f'{output_dir}/holiday_analysis.csv', encoding='utf-8-sig')
+# Куб для сервиса запросов query_service.py
+build_cube(df, calendar).to_csv(f'{output_dir}/seasonality_cube.csv', index=False, encoding='utf-8-sig')
 
 print("✓ Аналитические таблицы сохранены:")
 print("  - monthly_analysis.csv (анализ по месяцам)")
 print("  - seasonal_analysis.csv (анализ по сезонам)")
 print("  - weekday_analysis.csv (анализ по дням недели)")
 print("  - hourly_analysis.csv (анализ по времени суток)")
+print("  - usertype_duration_quantiles.csv (квантили длительности по типам пользователей)")
+print("  - holiday_analysis.csv (праздничные, выходные и будние дни)")
+print("  - seasonality_cube.csv (куб год × месяц × день × час × тип пользователя)")
+
+if anomalies is not None:
+    station_name_by_id = df.groupby('from_station_id')['from_station_name'].first()
+    anomalies.save('anomalies_2013_2019',
+                   lambda keys: station_name_by_id.reindex(keys).fillna('Станция ' + pd.Series(keys).astype(str)).to_numpy(),
+                   folder=output_dir)
+    print("✓ Аномалии сохранены: anomalies_2013_2019_report.txt, anomalies_2013_2019_daily.csv, "
+          "anomalies_2013_2019_stations.csv")
 
 # 4.3. Создаем сводный отчет по сезонности
-with open('seasonality_analysis/seasonality_report.txt', 'w', encoding='utf-8') as f:
+with open(f'{output_dir}/seasonality_report.txt', 'w', encoding='utf-8') as f:
     f.write("ОТЧЕТ ПО АНАЛИЗУ СЕЗОННОСТИ ПОЕЗДОК\n")
     f.write("=" * 60 + "\n\n")
     f.write(f"Дата анализа: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
     f.write(f"Всего поездок в анализе: {len(df):,}\n")
+    if population is not None:
+        f.write(f"Выборка {fraction:.1%} из {population.sum():,} поездок, "
+                f"число поездок - оценки по совокупности\n")
     f.write(f"Период данных: {df['starttime'].min().date()} - {df['starttime'].max().date()}\n\n")
 
     f.write("1. СЕЗОННОСТЬ ПО МЕСЯЦАМ:\n")
@@ -441,62 +517,70 @@ with open('seasonality_analysis/seasonality_report.txt', 'w', encoding='utf-8')
     f.write("4. Рассмотреть тарифную политику в зависимости от сезона\n")
     f.write("5. Оптимизировать распределение велосипедов между станциями\n")
 
-print("✓ Отчет по сезонности сохранен: seasonality_analysis/seasonality_report.txt")
+print(f"✓ Отчет по сезонности сохранен: {output_dir}/seasonality_report.txt")
 
 # 4.4. Создаем дашборд в Excel
-try:
-    with pd.ExcelWriter('seasonality_analysis/seasonality_dashboard.xlsx', engine='openpyxl') as writer:
-        # Основные сводки
-        summary_stats = pd.DataFrame({
-            'Метрика': [
-                'Всего поездок',
-                'Период анализа',
-                'Самый активный месяц',
-                'Самый активный день недели',
-                'Пиковое время суток',
-                'Средняя длительность поездки',
-                'Процент подписчиков',
-                'Соотношение мужчины/женщины'
-            ],
-            'Значение': [
-                f"{len(df):,}",
-                f"{df['starttime'].min().date()} - {df['starttime'].max().date()}",
-                max_month,
-                max_day,
-                max_time,
-                f"{df['tripduration'].mean() / 60:.1f} минут",
-                f"{(df['usertype'] == 'Subscriber').mean() * 100:.1f}%",
-                f"{df['gender'].value_counts().get('Male', 0) / len(df) * 100:.1f}% / {df['gender'].value_counts().get('Female', 0) / len(df) * 100:.1f}%"
-            ]
-        })
-
-        summary_stats.to_excel(writer, sheet_name='Сводка', index=False)
-        monthly_aggregate.to_excel(writer, sheet_name='По месяцам', index=False)
-        seasonal_summary.to_excel(writer, sheet_name='По сезонам')
-        weekday_summary.to_excel(writer, sheet_name='По дням недели', index=False)
-        hourly_summary.to_excel(writer, sheet_name='По времени суток')
-        readable_df.head(1000).to_excel(writer, sheet_name='Пример данных', index=False)
-
-    print("✓ Excel-дашборд сохранен: seasonality_analysis/seasonality_dashboard.xlsx")
-except Exception as e:
-    print(f"⚠️  Не удалось создать Excel-дашборд: {e}")
+# Основные сводки
+summary_stats = pd.DataFrame({
+    'Метрика': [
+        'Всего поездок',
+        'Период анализа',
+        'Самый активный месяц',
+        'Самый активный день недели',
+        'Пиковое время суток',
+        'Средняя длительность поездки',
+        'Процент подписчиков',
+        'Соотношение мужчины/женщины'
+    ],
+    'Значение': [
+        f"{len(df):,}",
+        f"{df['starttime'].min().date()} - {df['starttime'].max().date()}",
+        max_month,
+        max_day,
+        max_time,
+        f"{np.average(df['tripduration'], weights=weights) / 60:.1f} минут",
+        f"{np.average(df['usertype'] == 'Subscriber', weights=weights) * 100:.1f}%",
+        f"{df['gender'].value_counts().get('Male', 0) / len(df) * 100:.1f}% / {df['gender'].value_counts().get('Female', 0) / len(df) * 100:.1f}%"
+    ]
+})
+
+dashboard_sheets = [
+    ('Сводка', summary_stats, False),
+    ('По месяцам', monthly_aggregate, False),
+    ('По сезонам', seasonal_summary, True),
+    ('По дням недели', weekday_summary, False),
+    ('По времени суток', hourly_summary, True),
+    ('Пример данных', df.head(1000)[readable_columns], False),
+]
+# Экономика велосипедов попадает в дашборд, если economy_till_2019.py уже запускался
+dashboard_sheets += load_economics_sheets()
+
+dashboard_timings = export_dashboard(f'{output_dir}/seasonality_dashboard.xlsx', dashboard_sheets)
+print(f"✓ Excel-дашборд сохранен: {output_dir}/seasonality_dashboard.xlsx")
+print_timings(dashboard_timings)
 
 print("\n" + "=" * 70)
 print("АНАЛИЗ СЕЗОННОСТИ ЗАВЕРШЕН!")
 print("=" * 70)
 print(f"\nСозданные файлы:")
 print("1. bike_sharing_readable.csv - читаемый датасет")
-print("2. seasonality_analysis/ - папка с анализом")
+print("   bike_sharing_readable.parquet - он же в формате Parquet")
+print(f"2. {output_dir}/ - папка с анализом")
 print("   ├── monthly_analysis.csv")
 print("   ├── seasonal_analysis.csv")
 print("   ├── weekday_analysis.csv")
 print("   ├── hourly_analysis.csv")
+print("   ├── usertype_duration_quantiles.csv")
+print("   ├── holiday_analysis.csv")
+print("   ├── seasonality_cube.csv")
 print("   ├── seasonality_report.txt")
+if anomalies is not None:
+    print("   ├── anomalies_2013_2019_report.txt (+ _daily.csv, _stations.csv)")
 print("   ├── seasonality_overview.png")
 print("   ├── weekday_hour_heatmap.png")
 
 # Добавляем информацию о дополнительных графиках если они были созданы
-if df['starttime'].dt.year.nunique() > 1:
+if calendar['year'].nunique() > 1:
     print("   └── seasonality_by_year.png")
 
 print(f"\nКлючевые инсайты по сезонности:")
@@ -506,5 +590,5 @@ if min_season in seasonal_summary.index and max_season in seasonal_summary.index
     diff_ratio = seasonal_summary.loc[max_season, 'total_trips'] / seasonal_summary.loc[min_season, 'total_trips']
     print(f"• Разница активности сезонов: {diff_ratio:.1f}x")
 
-print(f"• Средняя длительность поездки: {df['tripduration'].mean() / 60:.1f} минут")
-print(f"• Процент подписчиков: {(df['usertype'] == 'Subscriber').mean() * 100:.1f}%")
\ No newline at end of file
+print(f"• Средняя длительность поездки: {np.average(df['tripduration'], weights=weights) / 60:.1f} минут")
+print(f"• Процент подписчиков: {np.average(df['usertype'] == 'Subscriber', weights=weights) * 100:.1f}%")
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Справочник станций обеих эпох: 2013-2019 (числовые id) и 2023-2025 (строковые id)
+STATION_FILE = 'stations.csv'
+ERAS = ('legacy', 'modern')
+
+# Ключ для поездок без станции
+MISSING_KEY = -1
+OFF_STATION = 'Вне станции'
+
+
+def _normalize_ids(ids):
+    """id станций как строки: 11.0 -> '11', пропуски -> None"""
+    ids = pd.Series(ids)
+    if pd.api.types.is_numeric_dtype(ids):
+        ids = ids.astype('Int64').astype(str).where(ids.notna())
+    else:
+        ids = ids.astype(str).str.strip().where(ids.notna())
+    return ids
+
+
+def _clean(value):
+    """Название или id без пробелов по краям; пустое значение -> None"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class StationDimension:
+    """Справочник станций: название и id любой эпохи -> постоянный int32 ключ
+
+    Пополняется по ходу загрузки. Переименованная станция сохраняет ключ
+    (находится по id своей эпохи, новое название становится синонимом),
+    а одна и та же станция в двух эпохах связывается по названию.
+    """
+
+    def __init__(self):
+        self.names = []                       # текущее название по ключу
+        self.aliases = []                     # все встречавшиеся названия по ключу
+        self.ids = {era: [] for era in ERAS}  # id по ключу в каждой эпохе
+        self.by_name = {}
+        self.by_id = {era: {} for era in ERAS}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _new_key(self, name):
+        key = len(self.names)
+        self.names.append(name)
+        self.aliases.append([])
+        for era in ERAS:
+            self.ids[era].append([])
+        return key
+
+    def _register(self, key, name, station_id, era):
+        if name is not None:
+            if name not in self.aliases[key]:
+                self.aliases[key].append(name)
+            self.by_name.setdefault(name, key)
+            self.names[key] = name
+        if station_id is not None and station_id not in self.by_id[era]:
+            self.by_id[era][station_id] = key
+            self.ids[era][key].append(station_id)
+
+    def resolve(self, name, station_id, era):
+        """Ключ одной пары (название, id); id надежнее названия"""
+        if name is None and station_id is None:
+            return MISSING_KEY
+        key = self.by_id[era].get(station_id)
+        if key is None:
+            key = self.by_name.get(name)
+        if key is None:
+            key = self._new_key(name if name is not None else f'Станция {station_id}')
+        self._register(key, name, station_id, era)
+        return key
+
+    def encode(self, names, ids, era):
+        """Ключи станций для столбцов порции поездок
+
+        Python-логика выполняется только для различных пар (название, id),
+        которых в порции сотни, а не для миллионов строк.
+        """
+        pairs = pd.DataFrame({'name': pd.Series(names).to_numpy(), 'id': _normalize_ids(ids).to_numpy()})
+        codes = pairs.groupby(['name', 'id'], dropna=False, sort=False).ngroup().to_numpy()
+        keys = np.array([
+            self.resolve(_clean(name), _clean(station_id), era)
+            for name, station_id in pairs.drop_duplicates().itertuples(index=False)
+        ], dtype=np.int32)
+        return keys[codes]
+
+    def station_names(self, keys, missing=OFF_STATION):
+        """Названия станций по ключам - только для отчетов"""
+        lookup = np.array(self.names + [missing], dtype=object)
+        keys = np.asarray(keys)
+        return lookup[np.where(keys >= 0, keys, len(self.names))]
+
+    def to_frame(self):
+        frame = pd.DataFrame({
+            'station_key': np.arange(len(self.names), dtype=np.int32),
+            'name': self.names,
+            'aliases': ['|'.join(a) for a in self.aliases],
+        })
+        for era in ERAS:
+            frame[f'{era}_ids'] = ['|'.join(i) for i in self.ids[era]]
+        return frame
+
+    def save(self, path=STATION_FILE):
+        self.to_frame().to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def load_station_dimension(path=STATION_FILE):
+    """Справочник из файла (или пустой) - ключи стабильны между запусками"""
+    dim = StationDimension()
+    if not os.path.exists(path):
+        return dim
+    frame = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    for row in frame.itertuples(index=False):
+        key = dim._new_key(row.name)
+        for alias in filter(None, row.aliases.split('|')):
+            dim._register(key, alias, None, ERAS[0])
+        for era in ERAS:
+            for station_id in filter(None, getattr(row, f'{era}_ids').split('|')):
+                dim._register(key, None, station_id, era)
+        dim.names[key] = row.name
+    return dim
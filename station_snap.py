@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from station_dim import MISSING_KEY
+
+COORD_FILE = 'station_coordinates.csv'
+
+# Поездка вне станции привязывается к ближайшей станции не дальше радиуса
+SNAP_RADIUS_M = 200
+# Divvy часто округляет координаты поездок вне станций до 2 знаков (~1 км):
+# ближайшая к узлу сетки 0.01° станция - случайная, такие концы не привязываются
+ROUNDED_DECIMALS = 2
+QUERY_BATCH = 65_536
+
+# Метров в градусе широты; для долготы умножается на cos(широты)
+METERS_PER_DEGREE = 111_320
+
+
+class StationCoordinates:
+    """Координаты станций по данным: среднее по поездкам со станции/на станцию
+
+    Накапливается суммами по ключам станций, поэтому считается потоково
+    по помесячным файлам.
+    """
+
+    def __init__(self):
+        self.lat_sum = np.zeros(0)
+        self.lng_sum = np.zeros(0)
+        self.rides = np.zeros(0)
+
+    def update(self, keys, lats, lngs):
+        keys = np.asarray(keys)
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        valid = (keys >= 0) & ~np.isnan(lats) & ~np.isnan(lngs)
+        if not valid.any():
+            return
+        size = max(len(self.rides), int(keys[valid].max()) + 1)
+        self.lat_sum = np.bincount(keys[valid], lats[valid], size) + np.pad(self.lat_sum, (0, size - len(self.lat_sum)))
+        self.lng_sum = np.bincount(keys[valid], lngs[valid], size) + np.pad(self.lng_sum, (0, size - len(self.lng_sum)))
+        self.rides = np.bincount(keys[valid], minlength=size) + np.pad(self.rides, (0, size - len(self.rides)))
+
+    def to_frame(self):
+        known = self.rides > 0
+        return pd.DataFrame({
+            'station_key': np.flatnonzero(known).astype(np.int32),
+            'lat': self.lat_sum[known] / self.rides[known],
+            'lng': self.lng_sum[known] / self.rides[known],
+            'rides': self.rides[known].astype(np.int64),
+        })
+
+    def save(self, path=COORD_FILE):
+        self.to_frame().to_csv(path, index=False)
+
+
+def load_station_coordinates(path=COORD_FILE):
+    """Накопленные координаты из файла (или пустые)"""
+    coords = StationCoordinates()
+    if os.path.exists(path):
+        frame = pd.read_csv(path)
+        keys = frame['station_key'].to_numpy()
+        rides = frame['rides'].to_numpy(dtype=float)
+        size = int(keys.max()) + 1 if len(keys) else 0
+        coords.lat_sum = np.bincount(keys, frame['lat'] * rides, size)
+        coords.lng_sum = np.bincount(keys, frame['lng'] * rides, size)
+        coords.rides = np.bincount(keys, rides, size)
+    return coords
+
+
+class StationGrid:
+    """Сеточный индекс станций: ячейки размером с радиус поиска
+
+    Ближайшая станция в пределах радиуса всегда лежит в ячейке точки или
+    в одной из 8 соседних. Сетка плотная (по охвату станций плюс рамка в
+    две ячейки), станции ячейки - в строке таблицы, так что кандидаты
+    для миллионов точек берутся прямой индексацией, без поиска.
+    """
+
+    def __init__(self, stations, radius_m=SNAP_RADIUS_M):
+        self.radius = radius_m
+        self.keys = stations['station_key'].to_numpy(dtype=np.int32)
+        # Локальная проекция в метры около средней широты города
+        self.lat0 = float(np.radians(stations['lat'].mean())) if len(stations) else 0.0
+        self.x, self.y = self._project(stations['lat'].to_numpy(), stations['lng'].to_numpy())
+
+        if len(self.keys) == 0:
+            self.table = np.full((0, 1), -1, dtype=np.int32)
+            return
+        # Рамка в две ячейки: у точки в пределах радиуса от станции все соседи внутри сетки
+        self.origin = (self.x.min() - 2 * radius_m, self.y.min() - 2 * radius_m)
+        self.shape = (int((self.x.max() - self.origin[0]) // radius_m) + 4,
+                      int((self.y.max() - self.origin[1]) // radius_m) + 4)
+
+        cells = self._cells(self.x, self.y)
+        order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        starts = np.cumsum(counts) - counts
+        # table[cell, j] - j-я станция ячейки (-1 - пусто)
+        self.table = np.full((len(counts), int(counts.max())), -1, dtype=np.int32)
+        rank = np.arange(len(order)) - starts[cells[order]]
+        self.table[cells[order], rank] = order
+        # Расстояния считаем в float32 от начала сетки - вдвое меньше памяти на кандидатов
+        self.sx = (self.x - self.origin[0]).astype(np.float32)
+        self.sy = (self.y - self.origin[1]).astype(np.float32)
+
+    def _project(self, lats, lngs):
+        x = np.asarray(lngs, dtype=float) * METERS_PER_DEGREE * np.cos(self.lat0)
+        y = np.asarray(lats, dtype=float) * METERS_PER_DEGREE
+        return x, y
+
+    def _cells(self, x, y):
+        cx = ((x - self.origin[0]) // self.radius).astype(np.int64)
+        cy = ((y - self.origin[1]) // self.radius).astype(np.int64)
+        return cx * self.shape[1] + cy
+
+    def nearest(self, lats, lngs):
+        """Ключ ближайшей станции в радиусе (MISSING_KEY, если нет) и расстояние в метрах"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        keys = np.full(len(lats), MISSING_KEY, dtype=np.int32)
+        distance = np.full(len(lats), np.nan)
+        if len(self.keys) == 0:
+            return keys, distance
+
+        for start in range(0, len(lats), QUERY_BATCH):
+            batch = slice(start, start + QUERY_BATCH)
+            keys[batch], distance[batch] = self._nearest_batch(lats[batch], lngs[batch])
+        return keys, distance
+
+    def _nearest_batch(self, lats, lngs):
+        x, y = self._project(lats, lngs)
+        x = (x - self.origin[0]).astype(np.float32)
+        y = (y - self.origin[1]).astype(np.float32)
+        cx = x // self.radius
+        cy = y // self.radius
+        # Точки вне охвата станций (и без координат) заведомо дальше радиуса
+        inside = (cx >= 1) & (cx < self.shape[0] - 1) & (cy >= 1) & (cy < self.shape[1] - 1)
+        cell = np.where(inside, cx * self.shape[1] + cy, 0).astype(np.int64)
+
+        # Кандидаты: станции 9 соседних ячеек, (точки × 9 × ширина ячейки)
+        offsets = np.array([dx * self.shape[1] + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        neighbours = np.where(inside[:, None], cell[:, None] + offsets, 0)
+        candidates = self.table[neighbours].reshape(len(x), -1)
+
+        safe = np.maximum(candidates, 0)
+        dist = np.hypot(self.sx[safe] - x[:, None], self.sy[safe] - y[:, None])
+        dist[candidates < 0] = np.inf
+        best = dist.argmin(axis=1)
+        rows = np.arange(len(x))
+        best_dist = dist[rows, best]
+
+        hit = inside & (best_dist <= self.radius)
+        keys = np.where(hit, self.keys[safe[rows, best]], MISSING_KEY)
+        return keys, np.where(hit, best_dist, np.nan)
+
+
+def rounded_coordinates(lats, lngs, decimals=ROUNDED_DECIMALS):
+    """Маска точек, у которых обе координаты округлены до decimals знаков"""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    return (np.round(lats, decimals) == lats) & (np.round(lngs, decimals) == lngs)
+
+
+def snap_off_station(keys, lats, lngs, grid):
+    """Привязываем поездки без станции (ключ -1) к ближайшей станции
+
+    Привязываются только точные координаты: погрешность округленных больше
+    радиуса привязки, и ключ станции у них был бы смещенным.
+    Возвращает (новые ключи, маска привязанных, маска оставленных из-за округления).
+    """
+    keys = np.asarray(keys).copy()
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    off = keys == MISSING_KEY
+    rounded = off & rounded_coordinates(lats, lngs)
+    precise = off & ~rounded
+    snapped_keys, _ = grid.nearest(lats[precise], lngs[precise])
+    keys[precise] = snapped_keys
+    snapped = np.zeros(len(keys), dtype=bool)
+    snapped[precise] = snapped_keys != MISSING_KEY
+    return keys, snapped, rounded
@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import load_validated
+from unit_economics import (
+    BIKE_LIFESPAN,
+    DEFAULT_LIFESPAN,
+    calculate_bike_economics,
+    categories_order,
+    category_prices,
+    classify_bikes,
+)
+
+# Велосипед, ездивший в последние CENSOR_DAYS дней данных, считается
+# еще работающим (цензурированное наблюдение), остальные - списанными
+CENSOR_DAYS = 90
+
+# BIKE_ASSUMED_LIFESPAN=1 - экономика по принятым константам BIKE_LIFESPAN
+# вместо измеренных сроков службы
+ASSUMED_LIFESPAN_ENV = 'BIKE_ASSUMED_LIFESPAN'
+
+
+def bike_lifetimes(df, censor_days=CENSOR_DAYS):
+    """Первая и последняя поездка каждого велосипеда за один групповой проход"""
+    lifetimes = df.groupby('bikeid')['starttime'].agg(first_trip='min', last_trip='max', total_trips='size')
+    lifetimes = lifetimes.reset_index()
+
+    data_end = df['starttime'].max()
+    lifetimes['lifespan_days'] = (lifetimes['last_trip'] - lifetimes['first_trip']).dt.days + 1
+    lifetimes['retired'] = lifetimes['last_trip'] < data_end - pd.Timedelta(days=censor_days)
+    return lifetimes
+
+
+def category_lifetimes(df, bike_categories, censor_days=CENSOR_DAYS):
+    """Сроки жизни велосипедов вместе с категорией из classify_bikes"""
+    lifetimes = bike_lifetimes(df, censor_days).merge(bike_categories[['bikeid', 'category']], on='bikeid', how='left')
+    lifetimes['category'] = lifetimes['category'].fillna('Неизвестно')
+    return lifetimes
+
+
+def kaplan_meier(durations, events):
+    """Оценка Каплана-Мейера: вероятность дожить до каждого момента времени
+
+    durations - срок наблюдения в днях, events - True, если велосипед списан
+    (False - наблюдение цензурировано концом данных).
+    """
+    durations = np.asarray(durations)
+    events = np.asarray(events, dtype=bool)
+
+    times, inverse = np.unique(durations, return_inverse=True)
+    removed = np.bincount(inverse, minlength=len(times))
+    retired = np.bincount(inverse, weights=events, minlength=len(times))
+
+    # В риске на момент t - все, кто наблюдался не меньше t дней
+    at_risk = len(durations) - np.r_[0, np.cumsum(removed)[:-1]]
+    survival = np.cumprod(1 - retired / at_risk)
+
+    return pd.DataFrame({
+        'days': times,
+        'at_risk': at_risk,
+        'retired': retired.astype(int),
+        'survival': survival,
+    })
+
+
+def survival_summary(curve):
+    """Медиана и ограниченное среднее (площадь под кривой) в годах"""
+    below = curve.loc[curve['survival'] <= 0.5, 'days']
+    median_days = below.iloc[0] if len(below) else np.nan
+
+    # Площадь под ступенчатой кривой от 0 до последнего наблюдения
+    steps = np.diff(np.r_[0, curve['days'].to_numpy()])
+    previous_survival = np.r_[1.0, curve['survival'].to_numpy()[:-1]]
+    restricted_mean_days = (steps * previous_survival).sum()
+
+    return {
+        'median_years': median_days / 365.25,
+        'restricted_mean_years': restricted_mean_days / 365.25,
+    }
+
+
+def fit_survival_by_category(lifetimes):
+    """Кривые Каплана-Мейера и итоговые сроки службы по категориям"""
+    curves = []
+    summary = []
+    for category, group in lifetimes.groupby('category'):
+        curve = kaplan_meier(group['lifespan_days'], group['retired'])
+        curve.insert(0, 'category', category)
+        curves.append(curve)
+
+        stats = survival_summary(curve)
+        # Если половина парка категории еще не списана, медиана не достигнута -
+        # берем ограниченное среднее как нижнюю оценку срока службы
+        measured = stats['median_years']
+        if np.isnan(measured):
+            measured = stats['restricted_mean_years']
+
+        summary.append({
+            'category': category,
+            'bikes': len(group),
+            'retired': int(group['retired'].sum()),
+            'assumed_lifespan_years': BIKE_LIFESPAN.get(category, DEFAULT_LIFESPAN),
+            'median_years': stats['median_years'],
+            'restricted_mean_years': stats['restricted_mean_years'],
+            'measured_lifespan_years': measured,
+        })
+
+    return pd.concat(curves, ignore_index=True), pd.DataFrame(summary).round(2)
+
+
+def measured_lifespans(df, bike_categories, censor_days=CENSOR_DAYS):
+    """Измеренный срок службы по категориям {категория: лет} для calculate_bike_economics
+
+    Категории с нулевым после округления сроком (все велосипеды прожили
+    считанные дни) пропускаются - для них остается принятая константа.
+    """
+    _, summary = fit_survival_by_category(category_lifetimes(df, bike_categories, censor_days))
+    measured = summary.set_index('category')['measured_lifespan_years']
+    return measured[measured > 0].to_dict()
+
+
+def apply_measured_lifespans(bike_econ_df, lifespan_summary):
+    """Пересчитываем амортизацию и прибыль по измеренным срокам службы
+
+    Все пересчеты - операции над столбцами сразу для всего парка.
+    """
+    measured = lifespan_summary.set_index('category')['measured_lifespan_years']
+    result = bike_econ_df.copy()
+
+    result['bike_lifespan'] = result['category'].map(measured).fillna(result['bike_lifespan'])
+    years_active = result['active_days'] / 365.25
+    result['depreciation_cost'] = result['bike_price'] / result['bike_lifespan'] * years_active
+
+    result['total_costs'] = result[['depreciation_cost', 'maintenance_cost', 'insurance_cost',
+                                    'storage_cost', 'marketing_cost']].sum(axis=1)
+    result['profit'] = result['total_revenue'] - result['total_costs']
+    result['profit_margin'] = np.where(result['total_revenue'] > 0,
+                                       result['profit'] / result['total_revenue'] * 100, 0)
+    result['roi_percent'] = np.where(result['bike_price'] > 0,
+                                     result['profit'] / result['bike_price'] * 100, 0)
+    return result
+
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    from unit_economics import calculate_trip_revenue_vectorized
+
+    print("=" * 100)
+    print("АНАЛИЗ СРОКА СЛУЖБЫ ВЕЛОСИПЕДОВ (КАПЛАН-МЕЙЕР)")
+    print("=" * 100)
+
+    df = load_validated('2013-2019.csv')
+    df['starttime'] = pd.to_datetime(df['starttime'])
+
+    bike_categories = classify_bikes(df)
+    lifetimes = category_lifetimes(df, bike_categories)
+
+    curves, lifespan_summary = fit_survival_by_category(lifetimes)
+    print(f"\nСписано велосипедов: {lifetimes['retired'].sum():,} из {len(lifetimes):,} "
+          f"(цензура: последние {CENSOR_DAYS} дней данных)")
+    print("\nСрок службы по категориям (лет):")
+    for _, row in lifespan_summary.iterrows():
+        print(f"  {row['category']:30}: принято {row['assumed_lifespan_years']:.1f}, "
+              f"измерено {row['measured_lifespan_years']:.2f}")
+
+    # Экономика парка по принятым срокам службы - для сравнения с измеренными
+    # (таблица economy_till_2019.py уже посчитана по измеренным срокам)
+    df['trip_revenue'] = calculate_trip_revenue_vectorized(df)
+    bike_econ_df = calculate_bike_economics(df, bike_categories, category_prices)
+
+    measured_econ_df = apply_measured_lifespans(bike_econ_df, lifespan_summary)
+    print(f"\nСредняя прибыль на велосипед: ${bike_econ_df['profit'].mean():.2f} (принятый срок) -> "
+          f"${measured_econ_df['profit'].mean():.2f} (измеренный срок)")
+
+    os.makedirs('bike_lifespan', exist_ok=True)
+    lifetimes.to_csv('bike_lifespan/bike_lifetimes.csv', index=False)
+    curves.to_csv('bike_lifespan/kaplan_meier_curves.csv', index=False)
+    lifespan_summary.to_csv('bike_lifespan/lifespan_by_category.csv', index=False)
+    measured_econ_df.to_csv('bike_lifespan/bike_economics_measured_lifespan.csv', index=False)
+
+    plt.figure(figsize=(12, 7))
+    for category in categories_order + ['Неизвестно']:
+        curve = curves[curves['category'] == category]
+        if len(curve):
+            plt.step(curve['days'] / 365.25, curve['survival'], where='post', label=category, linewidth=2)
+    plt.axhline(0.5, color='gray', linestyle='--', alpha=0.7)
+    plt.title('Кривые выживаемости велосипедов (Каплан-Мейер)', fontsize=14, fontweight='bold')
+    plt.xlabel('Срок службы (годы)')
+    plt.ylabel('Доля велосипедов в работе')
+    plt.legend(title='Категории')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig('bike_lifespan/survival_curves.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    print("\n✓ Результаты сохранены в bike_lifespan/")
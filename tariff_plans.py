@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import read_validated
+from unit_economics import calculate_trip_revenue_vectorized
+
+CHUNK_ROWS = 500_000
+OUTPUT_DIR = 'tariff_plans'
+
+USERTYPES = ['Customer', 'Subscriber']
+
+# Тариф для типа пользователя:
+#   base         - разовая плата за поездку (для подписчиков 0)
+#   free_minutes - бесплатные минуты
+#   block_minutes, first_blocks - цены первых блоков сверх бесплатных минут
+#   block_price  - цена каждого следующего блока
+# season_factors - множитель цены по месяцам (остальные месяцы 1.0)
+CURRENT_SEASON_FACTORS = {6: 1.2, 7: 1.2, 8: 1.2, 12: 0.8, 1: 0.8, 2: 0.8}
+
+CANDIDATE_PLANS = [
+    {
+        'name': 'Тариф 2013-2015',
+        'season_factors': CURRENT_SEASON_FACTORS,
+        'Customer': {'base': 7, 'free_minutes': 30, 'block_minutes': 30, 'first_blocks': [2, 4], 'block_price': 8},
+        'Subscriber': {'base': 0, 'free_minutes': 30, 'block_minutes': 30, 'first_blocks': [1.5, 3], 'block_price': 6},
+    },
+    {
+        'name': 'Тариф 2016-2019',
+        'season_factors': CURRENT_SEASON_FACTORS,
+        'Customer': {'base': 9.95, 'free_minutes': 30, 'block_minutes': 30, 'first_blocks': [], 'block_price': 3},
+        'Subscriber': {'base': 0, 'free_minutes': 180, 'block_minutes': 30, 'first_blocks': [], 'block_price': 3},
+    },
+    {
+        'name': '45 бесплатных минут',
+        'season_factors': CURRENT_SEASON_FACTORS,
+        'Customer': {'base': 9.95, 'free_minutes': 45, 'block_minutes': 15, 'first_blocks': [], 'block_price': 2},
+        'Subscriber': {'base': 0, 'free_minutes': 45, 'block_minutes': 15, 'first_blocks': [], 'block_price': 1.5},
+    },
+    {
+        'name': 'Сильная сезонность',
+        'season_factors': {6: 1.35, 7: 1.35, 8: 1.35, 12: 0.65, 1: 0.65, 2: 0.65},
+        'Customer': {'base': 9.95, 'free_minutes': 30, 'block_minutes': 30, 'first_blocks': [], 'block_price': 3},
+        'Subscriber': {'base': 0, 'free_minutes': 180, 'block_minutes': 30, 'first_blocks': [], 'block_price': 3},
+    },
+]
+
+# Эталон - фактические исторические тарифы (разные по периодам)
+HISTORICAL = 'Фактические тарифы'
+
+
+def plan_arrays(plans):
+    """Параметры N тарифов в виде массивов (тип пользователя × тариф) для broadcasting"""
+    n_plans = len(plans)
+    max_blocks = max(len(plan[u]['first_blocks']) for plan in plans for u in USERTYPES)
+
+    arrays = {name: np.zeros((len(USERTYPES), n_plans))
+              for name in ('base', 'free_minutes', 'block_minutes', 'block_price', 'n_first')}
+    # Накопленная стоимость первых блоков: first_cost[u, p, k] - цена k первых блоков
+    first_cost = np.zeros((len(USERTYPES), n_plans, max_blocks + 1))
+    season = np.ones((n_plans, 13))
+
+    for p, plan in enumerate(plans):
+        for month, factor in plan.get('season_factors', {}).items():
+            season[p, int(month)] = factor
+        for u, usertype in enumerate(USERTYPES):
+            tariff = plan[usertype]
+            for name in ('base', 'free_minutes', 'block_minutes', 'block_price'):
+                arrays[name][u, p] = tariff[name]
+            blocks = tariff['first_blocks']
+            arrays['n_first'][u, p] = len(blocks)
+            first_cost[u, p, 1:len(blocks) + 1] = np.cumsum(blocks)
+            first_cost[u, p, len(blocks) + 1:] = first_cost[u, p, len(blocks)]
+
+    arrays['first_cost'] = first_cost
+    arrays['season'] = season
+    return arrays
+
+
+def revenue_matrix(duration_minutes, month, usertype_index, arrays):
+    """Матрица доходов поездки × тарифы за одну операцию broadcasting"""
+    u = usertype_index
+    base = arrays['base'][u]                   # (n, P)
+    free_minutes = arrays['free_minutes'][u]
+    block_minutes = arrays['block_minutes'][u]
+    block_price = arrays['block_price'][u]
+    n_first = arrays['n_first'][u]
+
+    minutes = duration_minutes[:, None]
+    blocks = np.ceil(np.maximum(minutes - free_minutes, 0) / block_minutes)
+
+    # Первые блоки - по своим ценам, остальные - по block_price
+    first = np.nan_to_num(np.minimum(blocks, n_first)).astype(np.int64)
+    n_plans = base.shape[1]
+    first_cost = arrays['first_cost'][u[:, None], np.arange(n_plans)[None, :], first]
+    extra = first_cost + np.maximum(blocks - n_first, 0) * block_price
+
+    return (base + extra) * arrays['season'][:, month].T
+
+
+def compare_plans(csv_path, plans, bike_category=None, chunk_rows=CHUNK_ROWS):
+    """Один проход по поездкам: доход каждого тарифа по типам пользователей,
+    месяцам и категориям велосипедов"""
+    arrays = plan_arrays(plans)
+    names = [HISTORICAL] + [plan['name'] for plan in plans]
+    totals = {'usertype': [], 'month': [], 'category': []}
+    trips = {'usertype': [], 'month': [], 'category': []}
+
+    # Порции проходят те же проверки 'legacy', что и в остальных анализах; время уже разобрано
+    for chunk in read_validated(csv_path, 'legacy', chunk_rows):
+        month = chunk['starttime'].dt.month.to_numpy()
+        # Все, кто не Customer, считаются подписчиками - как в calculate_trip_revenue_improved
+        usertype_index = np.where(chunk['usertype'].to_numpy() == 'Customer', 0, 1)
+
+        matrix = revenue_matrix(chunk['tripduration'].to_numpy(dtype=float) / 60, month, usertype_index, arrays)
+        revenue = pd.DataFrame(matrix, columns=names[1:])
+        revenue.insert(0, HISTORICAL, calculate_trip_revenue_vectorized(chunk).to_numpy())
+
+        if bike_category is not None:
+            category = chunk['bikeid'].map(bike_category).fillna('Неизвестно').to_numpy()
+        else:
+            category = np.full(len(chunk), 'Неизвестно', dtype=object)
+
+        for dim, keys in (('usertype', chunk['usertype'].fillna('Неизвестно').to_numpy()),
+                          ('month', month), ('category', category)):
+            grouped = revenue.groupby(keys)
+            totals[dim].append(grouped.sum())
+            trips[dim].append(grouped.size())
+
+    result = {}
+    for dim in totals:
+        table = pd.concat(totals[dim]).groupby(level=0).sum().round(2)
+        table.insert(0, 'trips', pd.concat(trips[dim]).groupby(level=0).sum())
+        table.index.name = dim
+        result[dim] = table
+    return result
+
+
+def plan_summary(by_usertype):
+    """Итог по каждому тарифу: общий доход и изменение относительно факта"""
+    revenue = by_usertype.drop(columns='trips').sum()
+    summary = pd.DataFrame({
+        'total_revenue': revenue.round(2),
+        'revenue_per_trip': (revenue / by_usertype['trips'].sum()).round(3),
+        'change_vs_actual_pct': ((revenue / revenue[HISTORICAL] - 1) * 100).round(2),
+    })
+    summary.index.name = 'plan'
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сравнение тарифных планов на всей истории поездок')
+    parser.add_argument('--data', default='2013-2019.csv')
+    parser.add_argument('--plans', help='JSON-файл со списком тарифов (по умолчанию CANDIDATE_PLANS)')
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    plans = CANDIDATE_PLANS
+    if args.plans:
+        with open(args.plans, encoding='utf-8') as f:
+            plans = json.load(f)
+
+    print("=" * 100)
+    print("СРАВНЕНИЕ ТАРИФНЫХ ПЛАНОВ")
+    print("=" * 100)
+    print(f"Тарифов: {len(plans)}")
+
+    # Категории велосипедов берем из результатов economy_till_2019.py
+    bike_category = None
+    econ_path = 'unit_economics_enhanced/bike_economics_detailed.csv'
+    if os.path.exists(econ_path):
+        bike_category = pd.read_csv(econ_path, usecols=['bike_id', 'category']).set_index('bike_id')['category']
+    else:
+        print(f"⚠️  {econ_path} не найден - категории велосипедов не учитываются")
+
+    result = compare_plans(args.data, plans, bike_category)
+    summary = plan_summary(result['usertype'])
+
+    print("\nИтоги по тарифам:")
+    for plan, row in summary.iterrows():
+        print(f"  {plan:25}: ${row['total_revenue']:15,.2f}, "
+              f"${row['revenue_per_trip']:6.2f} за поездку, {row['change_vs_actual_pct']:+7.2f}% к факту")
+
+    os.makedirs(args.output, exist_ok=True)
+    summary.to_csv(f'{args.output}/plan_totals.csv')
+    result['usertype'].to_csv(f'{args.output}/plan_by_usertype.csv')
+    result['month'].to_csv(f'{args.output}/plan_by_month.csv')
+    result['category'].to_csv(f'{args.output}/plan_by_category.csv')
+
+    print(f"\n✓ Результаты сохранены в {args.output}/")
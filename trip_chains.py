@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_validation import load_validated
+
+
+def build_trip_chains(df):
+    """Цепочки поездок каждого велосипеда
+
+    Поездки сортируются один раз по (bikeid, starttime); следующая поездка
+    того же велосипеда берется сдвигом массивов, граница велосипеда - маской.
+    Перестановка (ребалансировка) - когда поездка закончилась на одной
+    станции, а следующая началась с другой.
+    """
+    chains = df[['bikeid', 'starttime', 'stoptime', 'tripduration',
+                 'from_station_id', 'to_station_id']].sort_values(
+        ['bikeid', 'starttime'], kind='stable', ignore_index=True)
+
+    bikes = chains['bikeid'].to_numpy()
+    has_next = np.r_[bikes[1:] == bikes[:-1], False]
+
+    next_start = np.roll(chains['starttime'].to_numpy(), -1)
+    next_from = np.roll(chains['from_station_id'].to_numpy(), -1)
+
+    # Простой до следующей поездки; пересекающиеся поездки (сбои данных) дают 0
+    idle = (next_start - chains['stoptime'].to_numpy()) / np.timedelta64(1, 's')
+    chains['idle_seconds'] = np.where(has_next, np.clip(idle, 0, None), np.nan)
+    chains['next_from_station_id'] = np.where(has_next, next_from, np.nan)
+    # Без станции на одном из концов (NaN != NaN) перестановку не определить
+    to_station = chains['to_station_id'].to_numpy()
+    known = has_next & pd.notna(to_station) & pd.notna(next_from)
+    chains['rebalanced'] = known & (to_station != next_from)
+
+    return chains
+
+
+def bike_utilization(chains):
+    """Загрузка каждого велосипеда: время в поездках против простоя
+
+    Для велосипеда с одной поездкой utilization_pct и avg_idle_hours - NaN.
+    """
+    utilization = chains.groupby('bikeid', sort=False).agg(
+        total_trips=('tripduration', 'size'),
+        in_use_seconds=('tripduration', 'sum'),
+        idle_seconds=('idle_seconds', 'sum'),
+        rebalancing_moves=('rebalanced', 'sum'),
+        first_trip=('starttime', 'first'),
+        last_trip=('stoptime', 'last'),
+    )
+    # С одной поездкой простоя еще нет - загрузка и простой не определены (а не 100% и 0 ч)
+    single = utilization['total_trips'] < 2
+    utilization['utilization_pct'] = (
+        utilization['in_use_seconds'] / (utilization['in_use_seconds'] + utilization['idle_seconds']) * 100
+    ).round(2).mask(single)
+    utilization['avg_idle_hours'] = (
+        utilization['idle_seconds'] / (utilization['total_trips'] - 1).clip(lower=1) / 3600
+    ).round(2).mask(single)
+    utilization['rebalancing_pct'] = (utilization['rebalancing_moves'] / utilization['total_trips'] * 100).round(2)
+    return utilization.reset_index()
+
+
+def station_utilization(chains):
+    """Станции: прибытия, отправления, простой у станции и перестановки
+
+    Простой относится к станции прибытия, только если велосипед уехал с нее
+    же; при ребалансировке велосипед учитывается как вывезенный со станции
+    прибытия и завезенный на станцию следующей поездки.
+    """
+    continued = chains['next_from_station_id'].notna() & ~chains['rebalanced']
+
+    arrivals = chains.groupby('to_station_id').size()
+    departures = chains.groupby('from_station_id').size()
+    docked = chains[continued].groupby('to_station_id')['idle_seconds'].agg(['sum', 'size'])
+    moved = chains[chains['rebalanced']]
+    rebalanced_out = moved.groupby('to_station_id').size()
+    rebalanced_in = moved.groupby('next_from_station_id').size()
+    rebalanced_in.index = rebalanced_in.index.astype(chains['from_station_id'].dtype)
+
+    stations = pd.DataFrame({
+        'arrivals': arrivals,
+        'departures': departures,
+        'rebalanced_out': rebalanced_out,
+        'rebalanced_in': rebalanced_in,
+        'docked_idle_hours': docked['sum'] / 3600,
+        'docked_stays': docked['size'],
+    }).fillna(0)
+    stations.index.name = 'station_id'
+
+    stations['avg_idle_hours'] = (stations['docked_idle_hours'] / stations['docked_stays'].clip(lower=1)).round(2)
+    stations['net_rebalancing'] = stations['rebalanced_in'] - stations['rebalanced_out']
+    stations['docked_idle_hours'] = stations['docked_idle_hours'].round(1)
+    return stations.reset_index()
+
+
+if __name__ == '__main__':
+    print("=" * 100)
+    print("ЦЕПОЧКИ ПОЕЗДОК: ЗАГРУЗКА, ПРОСТОЙ И РЕБАЛАНСИРОВКА")
+    print("=" * 100)
+
+    df = load_validated('2013-2019.csv')
+    df['starttime'] = pd.to_datetime(df['starttime'])
+    df['stoptime'] = pd.to_datetime(df['stoptime'])
+
+    chains = build_trip_chains(df)
+    bikes = bike_utilization(chains)
+    stations = station_utilization(chains)
+
+    print(f"\nВелосипедов: {len(bikes):,}, станций: {len(stations):,}")
+    print(f"Средняя загрузка велосипеда: {bikes['utilization_pct'].mean():.2f}% времени в поездках")
+    print(f"Средний простой между поездками: {bikes['avg_idle_hours'].mean():.1f} ч")
+    print(f"Перестановок персоналом: {int(chains['rebalanced'].sum()):,} "
+          f"({chains['rebalanced'].mean() * 100:.1f}% поездок)")
+
+    print("\nСтанции, с которых чаще всего вывозят велосипеды:")
+    for _, row in stations.nsmallest(5, 'net_rebalancing').iterrows():
+        print(f"  Станция {int(row['station_id'])}: вывезено {row['rebalanced_out']:.0f}, "
+              f"завезено {row['rebalanced_in']:.0f}")
+
+    os.makedirs('trip_chains', exist_ok=True)
+    bikes.to_csv('trip_chains/bike_utilization.csv', index=False)
+    stations.to_csv('trip_chains/station_utilization.csv', index=False)
+
+    print("\n✓ Результаты сохранены:")
+    print("  - trip_chains/bike_utilization.csv")
+    print("  - trip_chains/station_utilization.csv")
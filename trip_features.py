@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketches import build_sketches, sketch_quantiles
+from station_snap import rounded_coordinates
+
+EARTH_RADIUS_M = 6_371_000
+OUTPUT_DIR = 'trip_features'
+
+# Пороги правдоподобия поездки. Расстояние - по прямой, т.е. нижняя оценка
+# пути. Но у поездок вне станций Divvy округляет координаты до 2 знаков
+# (до ~1 км на конец поездки), и на коротких поездках это дает десятки км/ч
+# лишней скорости. Поэтому пороги сравниваются с расстоянием за вычетом
+# погрешности каждого такого конца.
+PLAUSIBILITY = {
+    'max_speed_kmh': 45,             # быстрее не едет даже электровелосипед
+    'max_distance_km': 60,           # дальше границ зоны проката
+    'rounded_coordinate_error_m': 1000,  # погрешность конца с округленными координатами
+    'lat_range': (41.0, 43.0),       # Чикаго и пригороды; (0, 0) и т.п. - сбой
+    'lng_range': (-89.0, -87.0),
+}
+
+DISTANCE_QUANTILES = {'p50_distance_m': 0.50, 'p90_distance_m': 0.90}
+GROUP_COLUMNS = ['year', 'rideable_type', 'member_casual']
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Расстояние по дуге большого круга в метрах, сразу для целых столбцов"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def add_trip_features(df):
+    """Расстояние (м) и средняя скорость (км/ч); без координат - NaN"""
+    df = df.copy()
+    distance = haversine_m(df['start_lat'], df['start_lng'], df['end_lat'], df['end_lng'])
+    df['distance_m'] = distance.round(1)
+    df['speed_kmh'] = (distance / df['ride_length_seconds'].to_numpy() * 3.6).round(2)
+    return df
+
+
+def rounded_endpoints(df):
+    """Сколько концов поездки (0-2) вне станции или с координатами, округленными до 2 знаков"""
+    count = np.zeros(len(df), dtype=np.int64)
+    for side in ('start', 'end'):
+        rounded = rounded_coordinates(df[f'{side}_lat'], df[f'{side}_lng'])
+        name = f'{side}_station_name'
+        if name in df.columns:
+            rounded |= df[name].isna().to_numpy()
+        count += rounded
+    return count
+
+
+def implausible_reasons(df, thresholds=PLAUSIBILITY):
+    """Маски неправдоподобных поездок по причинам
+
+    Поездки без координат не отбрасываются - о них судить не по чему.
+    Расстояние уменьшается на погрешность концов с неточными координатами,
+    так что отбрасываются только поездки, невозможные при любой их точности.
+    """
+    lat_low, lat_high = thresholds['lat_range']
+    lng_low, lng_high = thresholds['lng_range']
+    outside = np.zeros(len(df), dtype=bool)
+    for side in ('start', 'end'):
+        lat = df[f'{side}_lat'].to_numpy(dtype=float)
+        lng = df[f'{side}_lng'].to_numpy(dtype=float)
+        outside |= (lat < lat_low) | (lat > lat_high) | (lng < lng_low) | (lng > lng_high)
+
+    error = rounded_endpoints(df) * thresholds['rounded_coordinate_error_m']
+    min_distance = np.maximum(df['distance_m'].to_numpy() - error, 0)
+    min_speed = min_distance / df['ride_length_seconds'].to_numpy() * 3.6
+    return {
+        'bad_coordinates': outside,
+        'too_far': ~outside & (min_distance > thresholds['max_distance_km'] * 1000),
+        'too_fast': ~outside & (min_speed > thresholds['max_speed_kmh']),
+    }
+
+
+def filter_implausible(df, thresholds=PLAUSIBILITY):
+    """Убираем неправдоподобные поездки; возвращает (поездки, удалено по причинам)"""
+    reasons = implausible_reasons(df, thresholds)
+    drop = np.logical_or.reduce(list(reasons.values()))
+    return df[~drop], {reason: int(mask.sum()) for reason, mask in reasons.items()}
+
+
+class DistanceStats:
+    """Агрегаты расстояний и скоростей по группам, накапливаемые по файлам
+
+    Суммы складываются, медианы и p90 - через скетчи квантилей, так что
+    поездки прошлых файлов хранить не нужно.
+    """
+
+    def __init__(self, group_columns=GROUP_COLUMNS):
+        self.group_columns = group_columns
+        self.groups = {}
+
+    def update(self, df):
+        has_distance = df['distance_m'].notna()
+        for group, rows in df[has_distance].groupby(self.group_columns).indices.items():
+            part = df[has_distance].iloc[rows]
+            stats = self.groups.setdefault(group, {'rides': 0, 'distance_sum': 0.0, 'duration_sum': 0.0,
+                                                   'sketch': 0})
+            stats['rides'] += len(part)
+            stats['distance_sum'] += part['distance_m'].sum()
+            stats['duration_sum'] += part['ride_length_seconds'].sum()
+            stats['sketch'] = stats['sketch'] + build_sketches(np.zeros(len(part), dtype=np.int64),
+                                                               part['distance_m'].to_numpy(), 1)
+
+    def summary(self):
+        if not self.groups:
+            return pd.DataFrame()
+        index = pd.MultiIndex.from_tuples(list(self.groups), names=self.group_columns)
+        stats = list(self.groups.values())
+        summary = pd.DataFrame({
+            'rides': [s['rides'] for s in stats],
+            'avg_distance_m': [s['distance_sum'] / s['rides'] for s in stats],
+            # Средняя скорость группы - общее расстояние на общее время
+            'avg_speed_kmh': [s['distance_sum'] / s['duration_sum'] * 3.6 for s in stats],
+        }, index=index)
+        quantiles = sketch_quantiles(np.vstack([s['sketch'] for s in stats]), DISTANCE_QUANTILES)
+        quantiles.index = index
+        return summary.join(quantiles).sort_index().round(2)
+
+    def save(self, folder=OUTPUT_DIR):
+        os.makedirs(folder, exist_ok=True)
+        self.summary().to_csv(f'{folder}/distance_summary.csv')
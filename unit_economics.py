@@ -0,0 +1,390 @@
+import numpy as np
+import pandas as pd
+
+# Тарифы, цены и расходы для юнит-экономики велосипедов 2013-2019.
+# Общие для economy_till_2019.py и отдельных расчетов (окупаемость и др.)
+
+# Берем среднюю цену велосипеда
+BIKE_PRICE_AVERAGE = (210.00 + 899.99) / 2
+
+# Но добавим вариацию в зависимости от категории
+category_prices = {
+    'Премиум (высокая нагрузка)': BIKE_PRICE_AVERAGE * 1.2,  # +20% для премиум
+    'Стандарт (средняя нагрузка)': BIKE_PRICE_AVERAGE,
+    'Эконом (низкая нагрузка)': BIKE_PRICE_AVERAGE * 0.8,  # -20% для эконом
+    'Низкоиспользуемый': BIKE_PRICE_AVERAGE * 0.6  # -40% для низкоиспользуемых
+}
+
+categories_order = ['Премиум (высокая нагрузка)', 'Стандарт (средняя нагрузка)',
+                    'Эконом (низкая нагрузка)', 'Низкоиспользуемый']
+
+# Срок службы в зависимости от нагрузки (года)
+BIKE_LIFESPAN = {
+    'Премиум (высокая нагрузка)': 1.5,
+    'Стандарт (средняя нагрузка)': 2.0,
+}
+DEFAULT_LIFESPAN = 3.0
+
+# Обслуживание: $ за поездку в зависимости от категории
+MAINTENANCE_PER_TRIP = {
+    'Премиум (высокая нагрузка)': 0.20,
+    'Стандарт (средняя нагрузка)': 0.15,
+}
+DEFAULT_MAINTENANCE = 0.10
+
+INSURANCE_PER_MONTH = 5  # $ в месяц
+STORAGE_PER_MONTH = 3  # $ в месяц
+MARKETING_SHARE = 0.10  # доля от дохода
+
+
+def classify_bikes(df):
+    """Классифицируем велосипеды по категориям на основе их использования"""
+
+    # Собираем статистику по каждому велосипеду
+    bike_stats = df.groupby('bikeid').agg({
+        'trip_id': 'count',
+        'tripduration': ['mean', 'sum'],
+        'from_station_id': 'nunique',
+        'usertype': lambda x: (x == 'Subscriber').mean()
+    }).round(2)
+
+    bike_stats.columns = ['total_trips', 'avg_duration', 'total_duration', 'unique_stations', 'subscriber_ratio']
+    bike_stats = bike_stats.reset_index()
+
+    # Определяем категории велосипедов
+    def assign_category(row):
+        trips = row['total_trips']
+        duration = row['avg_duration'] / 60  # в минутах
+        stations = row['unique_stations']
+
+        if trips > bike_stats['total_trips'].quantile(0.75):
+            return 'Премиум (высокая нагрузка)'
+        elif trips > bike_stats['total_trips'].quantile(0.5):
+            return 'Стандарт (средняя нагрузка)'
+        elif trips > bike_stats['total_trips'].quantile(0.25):
+            return 'Эконом (низкая нагрузка)'
+        else:
+            return 'Низкоиспользуемый'
+
+    bike_stats['category'] = bike_stats.apply(assign_category, axis=1)
+
+    # Дополнительная классификация по "ароматам" (специализации)
+    def assign_flavor(row):
+        duration = row['avg_duration'] / 60
+        stations = row['unique_stations']
+
+        if duration > 30:
+            return 'Длинные поездки'
+        elif stations > bike_stats['unique_stations'].quantile(0.75):
+            return 'Межстанционный'
+        elif row['subscriber_ratio'] > 0.7:
+            return 'Подписочный'
+        else:
+            return 'Разнообразный'
+
+    bike_stats['flavor'] = bike_stats.apply(assign_flavor, axis=1)
+
+    return bike_stats
+
+
+def calculate_trip_revenue_improved(row):
+    """Рассчитываем доход от поездки с учетом всех деталей"""
+    year = row['starttime'].year
+    duration_minutes = row['tripduration'] / 60
+    usertype = row['usertype']
+
+    # Определяем сезон для динамического ценообразования
+    month = row['starttime'].month
+    if month in [6, 7, 8]:  # Лето
+        season_factor = 1.2  # +20% летом
+    elif month in [12, 1, 2]:  # Зима
+        season_factor = 0.8  # -20% зимой
+    else:
+        season_factor = 1.0
+
+    # Определяем период
+    if 2013 <= year <= 2015:
+        if usertype == 'Customer':  # Без подписки
+            base_pass = 7
+            if duration_minutes <= 30:
+                extra = 0
+            elif duration_minutes <= 60:
+                extra = 2
+            elif duration_minutes <= 90:
+                extra = 6
+            else:
+                extra_blocks = np.ceil((duration_minutes - 90) / 30)
+                extra = 6 + extra_blocks * 8
+
+            return (base_pass + extra) * season_factor
+
+        else:  # Subscriber
+            # Годовая подписка $75 распределяется на поездки
+            # Базовый доход от подписки считается отдельно
+
+            if duration_minutes <= 30:
+                extra = 0
+            elif duration_minutes <= 60:
+                extra = 1.5
+            elif duration_minutes <= 90:
+                extra = 4.5
+            else:
+                extra_blocks = np.ceil((duration_minutes - 90) / 30)
+                extra = 4.5 + extra_blocks * 6
+
+            return extra * season_factor
+
+    else:  # 2016-2019
+        if usertype == 'Customer':
+            base_pass = 9.95
+            if duration_minutes <= 30:
+                extra = 0
+            else:
+                extra_blocks = np.ceil((duration_minutes - 30) / 30)
+                extra = extra_blocks * 3
+
+            return (base_pass + extra) * season_factor
+
+        else:  # Subscriber
+            # Месячная подписка $9.95 распределяется на поездки
+
+            if duration_minutes <= 180:
+                extra = 0
+            else:
+                extra_blocks = np.ceil((duration_minutes - 180) / 30)
+                extra = extra_blocks * 3
+
+            return extra * season_factor
+
+
+def calculate_trip_revenue_vectorized(df):
+    """Тот же расчет, что calculate_trip_revenue_improved, но сразу по всем поездкам"""
+    year = df['starttime'].dt.year.to_numpy()
+    month = df['starttime'].dt.month.to_numpy()
+    duration_minutes = df['tripduration'].to_numpy(dtype=float) / 60
+    is_customer = (df['usertype'] == 'Customer').to_numpy()
+
+    # Сезонный коэффициент: +20% летом, -20% зимой
+    season_factor = np.select([np.isin(month, [6, 7, 8]), np.isin(month, [12, 1, 2])], [1.2, 0.8], 1.0)
+
+    # 2013-2015: ступени по 30 минут, после 90 минут - блоки по $8 / $6
+    after_90 = np.ceil((duration_minutes - 90) / 30)
+    tiers = [duration_minutes <= 30, duration_minutes <= 60, duration_minutes <= 90]
+    early_customer = 7 + np.select(tiers, [0, 2, 6], 6 + after_90 * 8)
+    early_subscriber = np.select(tiers, [0, 1.5, 4.5], 4.5 + after_90 * 6)
+
+    # 2016-2019: $3 за каждые начатые 30 минут сверх бесплатных
+    late_customer = 9.95 + np.where(duration_minutes <= 30, 0, np.ceil((duration_minutes - 30) / 30) * 3)
+    late_subscriber = np.where(duration_minutes <= 180, 0, np.ceil((duration_minutes - 180) / 30) * 3)
+
+    is_early = (year >= 2013) & (year <= 2015)
+    revenue = np.where(is_early,
+                       np.where(is_customer, early_customer, early_subscriber),
+                       np.where(is_customer, late_customer, late_subscriber))
+
+    return pd.Series(revenue * season_factor, index=df.index)
+
+
+def calculate_bike_economics(df, bike_categories, category_prices, lifespans=None):
+    """Расчет экономики для каждого велосипеда с учетом категорий
+
+    Все метрики велосипеда собираются одним групповым проходом по поездкам,
+    расходы считаются операциями над столбцами сразу для всего парка.
+    lifespans - срок службы по категориям в годах (измеренный, см.
+    survival_analysis.measured_lifespans); для остальных категорий - BIKE_LIFESPAN.
+    """
+    lifespans = {**BIKE_LIFESPAN, **(lifespans or {})}
+
+    # Поездки подписчиков по периодам тарифов: 2013-2015 - годовая плата $75,
+    # 2016-2019 - месячная плата $9.95
+    year = df['starttime'].dt.year
+    is_subscriber = df['usertype'] == 'Subscriber'
+    early = is_subscriber & year.between(2013, 2015)
+    late = is_subscriber & year.between(2016, 2019)
+    trips = pd.DataFrame({
+        'bikeid': df['bikeid'],
+        'starttime': df['starttime'],
+        'trip_revenue': df['trip_revenue'],
+        'early': early,
+        'late': late,
+        'early_year': year.where(early),
+        'late_month': (year * 12 + df['starttime'].dt.month).where(late),
+    })
+
+    # Порядок велосипедов - по первой поездке, как в df['bikeid'].unique()
+    bikes = trips.groupby('bikeid', sort=False).agg(
+        total_trips=('starttime', 'size'),
+        first_trip=('starttime', 'min'),
+        last_trip=('starttime', 'max'),
+        trip_revenue=('trip_revenue', 'sum'),
+        early_trips=('early', 'sum'),
+        late_trips=('late', 'sum'),
+        years_used=('early_year', 'nunique'),
+        months_used=('late_month', 'nunique'),
+    )
+    total_trips = bikes['total_trips']
+    active_days = (bikes['last_trip'] - bikes['first_trip']).dt.days + 1
+
+    # Доходы от подписок (распределяем на велосипеды пропорционально поездкам)
+    subscription_revenue = (75 * bikes['years_used'] * (bikes['early_trips'] / total_trips) +
+                            9.95 * bikes['months_used'] * (bikes['late_trips'] / total_trips))
+    total_revenue = bikes['trip_revenue'] + subscription_revenue
+
+    # Категория велосипеда: первая запись в bike_categories, иначе 'Неизвестно'
+    categories = bike_categories.drop_duplicates('bikeid').set_index('bikeid').reindex(bikes.index)
+    category = categories['category'].fillna('Неизвестно')
+    flavor = categories['flavor'].fillna('Неизвестно')
+    bike_price = category.map(category_prices).fillna(BIKE_PRICE_AVERAGE)
+
+    # Срок службы и обслуживание в зависимости от нагрузки
+    bike_lifespan = category.map(lifespans).fillna(DEFAULT_LIFESPAN)
+    maintenance_per_trip = category.map(MAINTENANCE_PER_TRIP).fillna(DEFAULT_MAINTENANCE)
+
+    # Расходы
+    years_active = active_days / 365.25
+    depreciation_cost = (bike_price / bike_lifespan) * years_active
+    maintenance_cost = total_trips * maintenance_per_trip
+    insurance_cost = INSURANCE_PER_MONTH * (active_days / 30)
+    storage_cost = STORAGE_PER_MONTH * (active_days / 30)
+    marketing_cost = total_revenue * MARKETING_SHARE
+
+    total_costs = (depreciation_cost + maintenance_cost +
+                   insurance_cost + storage_cost + marketing_cost)
+
+    # Прибыль и ROI (Return on Investment)
+    profit = total_revenue - total_costs
+    profit_margin = (profit / total_revenue * 100).where(total_revenue > 0, 0)
+    roi = (profit / bike_price * 100).where(bike_price > 0, 0)
+
+    return pd.DataFrame({
+        'bike_id': bikes.index,
+        'category': category,
+        'flavor': flavor,
+        'total_trips': total_trips,
+        'active_days': active_days,
+        'bike_price': bike_price,
+        'bike_lifespan': bike_lifespan,
+        'trip_revenue': bikes['trip_revenue'],
+        'subscription_revenue': subscription_revenue,
+        'total_revenue': total_revenue,
+        'depreciation_cost': depreciation_cost,
+        'maintenance_cost': maintenance_cost,
+        'insurance_cost': insurance_cost,
+        'storage_cost': storage_cost,
+        'marketing_cost': marketing_cost,
+        'total_costs': total_costs,
+        'profit': profit,
+        'profit_margin': profit_margin,
+        'roi_percent': roi,
+        'trips_per_day': (total_trips / active_days).where(active_days > 0, 0),
+        'revenue_per_trip': total_revenue / total_trips,
+    }).reset_index(drop=True)
+
+
+# Метрики велосипеда, по которым строится модель категорий
+CATEGORY_METRICS = ['total_trips', 'active_days', 'bike_price', 'trip_revenue', 'subscription_revenue',
+                    'total_revenue', 'depreciation_cost', 'maintenance_cost', 'insurance_cost',
+                    'storage_cost', 'marketing_cost', 'total_costs', 'profit', 'profit_margin',
+                    'roi_percent', 'trips_per_day', 'revenue_per_trip']
+
+
+def build_category_metrics(bike_econ_df, metrics=CATEGORY_METRICS):
+    """Модель категорий: describe по каждой категории и нормированные оценки
+
+    Считается один раз за один групповой проход; диаграммы и выводы берут
+    значения отсюда вместо фильтрации bike_econ_df по каждой категории.
+    Столбцы - MultiIndex (метрика, статистика); статистика 'score' -
+    среднее категории, нормированное на глобальные min/max метрики.
+    """
+    model = bike_econ_df.groupby('category')[metrics].describe()
+
+    # Глобальные min/max считаются один раз для всех категорий и метрик
+    low = bike_econ_df[metrics].min()
+    high = bike_econ_df[metrics].max()
+    span = high - low
+    means = model.xs('mean', axis=1, level=1)
+    scores = ((means - low) / span).where(span > 0, 0.5)
+    scores.columns = pd.MultiIndex.from_product([scores.columns, ['score']])
+
+    model = pd.concat([model, scores], axis=1)
+    model[('fleet', 'share_pct')] = model[(metrics[0], 'count')] / model[(metrics[0], 'count')].sum() * 100
+
+    # Порядок: известные категории, затем остальные (если появятся новые)
+    order = [c for c in categories_order if c in model.index]
+    order += [c for c in model.index if c not in order]
+    return model.loc[order]
+
+
+def fleet_means(model, metrics=CATEGORY_METRICS):
+    """Средний велосипед парка из средних по категориям, взвешенных числом велосипедов"""
+    counts = model.xs('count', axis=1, level=1)[metrics]
+    means = model.xs('mean', axis=1, level=1)[metrics]
+    return (means * counts).sum() / counts.sum()
+
+
+def category_box_stats(bike_econ_df, model, metric='profit'):
+    """Статистики для plt.bxp: квартили из модели, усы и выбросы - одним проходом"""
+    q1 = model[(metric, '25%')]
+    q3 = model[(metric, '75%')]
+    iqr = q3 - q1
+
+    values = bike_econ_df[metric]
+    category = bike_econ_df['category']
+    low = category.map(q1 - 1.5 * iqr)
+    high = category.map(q3 + 1.5 * iqr)
+    inside = values.between(low, high)
+
+    # Усы - крайние значения внутри 1.5 IQR, как в plt.boxplot
+    whisker_low = values[inside].groupby(category[inside]).min()
+    whisker_high = values[inside].groupby(category[inside]).max()
+    fliers = values[~inside].groupby(category[~inside]).agg(list)
+
+    return [{
+        'label': cat,
+        'med': model.loc[cat, (metric, '50%')],
+        'q1': q1[cat],
+        'q3': q3[cat],
+        'whislo': whisker_low.get(cat, q1[cat]),
+        'whishi': whisker_high.get(cat, q3[cat]),
+        'fliers': fliers.get(cat, []),
+    } for cat in model.index]
+
+
+def sensitivity_analysis(bike_econ_df):
+    """Анализ чувствительности к ключевым параметрам"""
+
+    results = []
+
+    # Вариации ключевых параметров
+    price_variations = [BIKE_PRICE_AVERAGE * 0.7, BIKE_PRICE_AVERAGE, BIKE_PRICE_AVERAGE * 1.3]
+    trips_variations = [0.7, 1.0, 1.3]  # Коэффициент нагрузки
+    maintenance_variations = [0.10, 0.15, 0.20]  # Стоимость обслуживания за поездку
+
+    for price in price_variations:
+        for trips_factor in trips_variations:
+            for maintenance in maintenance_variations:
+                # Упрощенный расчет для анализа чувствительности
+                avg_trips = bike_econ_df['total_trips'].mean() * trips_factor
+                avg_revenue = bike_econ_df['revenue_per_trip'].mean() * avg_trips
+
+                # Предполагаемый срок службы
+                lifespan = 2.0  # года
+
+                # Расходы
+                depreciation = price / lifespan
+                maintenance_cost = avg_trips * maintenance
+                other_costs = 12 * (5 + 3)  # Страховка + хранение ($ в месяц)
+
+                total_costs = depreciation + maintenance_cost + other_costs
+                profit = avg_revenue - total_costs
+                roi = (profit / price) * 100 if price > 0 else 0
+
+                results.append({
+                    'price': price,
+                    'trips_factor': trips_factor,
+                    'maintenance_cost_per_trip': maintenance,
+                    'profit': profit,
+                    'roi': roi
+                })
+
+    return pd.DataFrame(results)